@@ -49,10 +49,72 @@ if not cp.has_option("server", "port"):
 else:
     port = cp.getint("server", "port")
 
+if not cp.has_option("server", "backend"):
+    backend = "select"
+else:
+    backend = cp.get("server", "backend")
+
+if not cp.has_option("server", "websocket_port"):
+    websocket_port = None
+else:
+    websocket_port = cp.getint("server", "websocket_port")
+
+if not cp.has_option("server", "tls_port"):
+    tls_port = None
+    tls_certfile = None
+    tls_keyfile = None
+else:
+    tls_port = cp.getint("server", "tls_port")
+    tls_certfile = cp.get("server", "tls_certfile")
+    if not cp.has_option("server", "tls_keyfile"):
+        tls_keyfile = None
+    else:
+        tls_keyfile = cp.get("server", "tls_keyfile")
+
+if not cp.has_option("server", "listen_backlog"):
+    backlog = None
+else:
+    backlog = cp.getint("server", "listen_backlog")
+
+if not cp.has_option("server", "max_connections_per_ip"):
+    max_per_ip = None
+else:
+    max_per_ip = cp.getint("server", "max_connections_per_ip")
+
+if not cp.has_option("server", "connect_rate"):
+    connect_rate = None
+else:
+    connect_rate = cp.getfloat("server", "connect_rate")
+
+if not cp.has_option("server", "connect_burst"):
+    connect_burst = None
+else:
+    connect_burst = cp.getint("server", "connect_burst")
+
+if not cp.has_option("server", "command_queue"):
+    command_queue = None
+else:
+    command_queue = cp.getint("server", "command_queue")
+
+if not cp.has_option("server", "flood_policy"):
+    flood_disconnect = False
+else:
+    flood_disconnect = (cp.get("server", "flood_policy").lower() == "disconnect")
+
+if not cp.has_option("server", "io_workers"):
+    io_workers = 0
+else:
+    io_workers = cp.getint("server", "io_workers")
+
 # No need to keep the config parser around now that we're done with it.
 del cp
 
 server = giles.server.Server(name, source_url, admin_password, config_filename)
 
-server.instantiate(port)
+server.instantiate(port, backend=backend, websocket_port=websocket_port,
+                   tls_port=tls_port, tls_certfile=tls_certfile,
+                   tls_keyfile=tls_keyfile, backlog=backlog,
+                   max_per_ip=max_per_ip, connect_rate=connect_rate,
+                   connect_burst=connect_burst, command_queue=command_queue,
+                   flood_disconnect=flood_disconnect, io_workers=io_workers)
 server.loop()
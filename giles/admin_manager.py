@@ -277,6 +277,26 @@ class AdminManager(object):
             player.tell_cc("Invalid admin reload command.\n")
             self.log("%s attempted an invalid admin reload command." % player)
 
+    def clients(self, player):
+
+        # Connection statistics for everyone on the server, including how
+        # well (and how expensively) their output is compressing.
+        player.tell_cc("\nClient connections:\n\n")
+        for other in self.server.players:
+            client = other.client
+            ratio = client.compression_ratio()
+            if ratio:
+                compress_str = "^G%.1f:1^~, ^Y%dms^~ CPU" % (ratio, client.compress_time * 1000)
+            else:
+                compress_str = "^Runcompressed^~"
+            player.tell_cc("   ^!%s^. (%s, %s): ^C%d^~ sent, ^C%d^~ received, %s\n" % (other, client.addrport(), client.protocol, client.bytes_sent, client.bytes_received, compress_str))
+        stats = self.server.telnet.admission_stats()
+        player.tell_cc("\nConnections: ^C%d^~ accepted from ^C%d^~ addresses now connected; turned away ^R%d^~ (server full), ^R%d^~ (too many from one address), ^R%d^~ (too fast).\n" % (stats["accepted"], stats["addresses"], stats["full"], stats["per_ip"], stats["rate"]))
+        if self.server.telnet.tls_context:
+            stats = self.server.telnet.tls_stats()
+            player.tell_cc("\nTLS: ^C%d^~ handshakes (^C%d^~ resumed), ^R%d^~ failed, ^R%d^~ timed out, ^Y%d^~ pending.\n" % (stats["handshakes"], stats["resumed"], stats["failures"], stats["timeouts"], stats["pending"]))
+        player.tell("\n")
+
     def shutdown(self, player):
 
         self.log("%s shut down the server." % player)
@@ -338,6 +358,10 @@ class AdminManager(object):
                     self.reload_by_name(player, other_bits[0])
                 handled = True
 
+            elif primary in ("clients",):
+                self.clients(player)
+                handled = True
+
             elif primary in ("shutdown",):
                 self.shutdown(player)
                 handled = True
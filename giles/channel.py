@@ -68,6 +68,13 @@ class Channel(object):
         else:
             self.listeners.remove(player)
 
+            # If this is a game's channel and that game holds the player's
+            # live board, they won't be seeing any more of it; give them
+            # their screen back.
+            if (self.gameable and player.live_owner and
+               player.live_owner.channel is self):
+                player.release_live_board()
+
             if self.notifications:
                 self.broadcast_cc("^Y%s^~ has disconnected from channel ^G%s^~.\n" % (player, self))
 
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from giles.command import Command, CommandTable, TAKES_PLAYER, TAKES_REST
 from giles.state import State
 from giles.utils import name_is_valid
 
@@ -98,128 +99,27 @@ class Chat(object):
 
     def parse(self, command, player):
 
-        did_quit = False
-
         # First, handle the weird cases: starting characters with text
         # immediately after.  These are shortcuts for longer commands.
-        # Everything else is either a token of its own or will be
-        # tokenized further by another handler.
-
-        if command[0] in ('"', "'"):
-            # It's a say.  Handle it that way.
-            self.say(command[1:].strip(), player)
-
-        elif command[0] in ('-', ','):
-            # It's an emote.
-            self.emote(command[1:].strip(), player)
-
-        elif command[0] in (':',):
-            # It's a send to a channel.
-            self.send(command[1:].strip(), player)
-
-        elif command[0] in (';',):
-            # It's a send to the last channel.
-            self.last_send(command[1:].strip(), player)
-
-        elif command[0] in ('>',):
-            # It's a tell.
-            self.tell(command[1:].strip(), player)
-
-        elif command[0] in ('/',):
-            # It's a command for a game table.
-            self.table(command[1:].strip(), player)
-
-        elif command[0] in ('\\',):
-            # It's a command for the last game table.
-            self.last_table(command[1:].strip(), player)
+        # Everything else is tokenized once and looked up by its first
+        # word (or an unambiguous abbreviation of it).
 
+        state = player.state
+        entry = COMMANDS.find_glued(command)
+        if entry:
+            command = Command(command, glued=True)
         else:
-            # All right, now we're into actual commands.  Split into components,
-            # lowercase the first one, and pass the rest off as necessary.
-
-            command_elements = command.split()
-            primary = command_elements[0].lower()
-
-            if len(command_elements) > 1:
-                secondary = " ".join(command_elements[1:])
-            else:
-                secondary = None
-
-            if primary in ('say',):
-                self.say(secondary, player)
-
-            elif primary in ('emote', 'me', 'em'):
-                self.emote(secondary, player)
-
-            elif primary in ('connect', 'co'):
-                self.connect(secondary, player)
-
-            elif primary in ('disconnect', 'dc'):
-                self.disconnect(secondary, player)
-
-            elif primary in ('channels', 'chan'):
-                self.channels(player)
-
-            elif primary in ('invite', 'inv'):
-                self.invite(secondary, player)
-
-            elif primary in ('send',):
-                self.send(secondary, player)
-
-            elif primary in ('tell', 't'):
-                self.tell(secondary, player)
-
-            elif primary in ('move', 'm'):
-                self.move(secondary, player)
-
-            elif primary in ('who', 'w'):
-                self.who(player)
-
-            elif primary in ('game', 'games', 'g'):
-                self.game(secondary, player)
+            command = Command(command)
+            entry = COMMANDS.find(command.primary)
 
-            elif primary in ('table', 'tab'):
-                self.table(secondary, player)
-
-            elif primary in ('roll', 'r'):
-                self.roll(secondary, player, secret=False)
-
-            elif primary in ('sroll', 'sr'):
-                self.roll(secondary, player, secret=True)
-
-            elif primary in ('set',):
-                self.config(secondary, player)
-
-            elif primary in ('alias',):
-                self.alias(secondary, player)
-
-            elif primary in ('become',):
-                self.become(secondary, player)
-
-            elif primary in ('help', 'h', '?'):
-                self.show_help(player)
-
-            elif primary in ('admin',):
-                self.admin(secondary, player)
-
-            elif primary in ('focus', 'f'):
-                self.focus(secondary, player)
-
-            elif primary in ('unfocus', 'defocus', 'unf'):
-                self.unfocus(player)
-
-            elif primary in ('uptime',):
-                self.uptime(player)
-
-            elif primary in ('quit', 'exit',):
-                self.quit(player)
-                did_quit = True
-
-            else:
-                player.tell_cc("Unknown command.  Type ^!help^. for help.\n")
+        if entry:
+            COMMANDS.call(self, entry, player, command)
+        else:
+            player.tell_cc("Unknown command.  Type ^!help^. for help.\n")
 
-        # Unless the player quit, we'll want to go back to the prompt.
-        if not did_quit:
+        # Unless the player quit (which swaps their state out), we'll want
+        # to go back to the prompt.
+        if player.state is state:
             player.state.set_sub("prompt")
 
     def say(self, message, player):
@@ -362,6 +262,9 @@ class Chat(object):
             if not channel_name:
                 return
 
+            if not self.rate_ok(player, player.channel_limit):
+                return
+
             success = self.server.channel_manager.send(player, " ".join(send_str_bits[1:]),
                channel_name)
             if not success:
@@ -378,6 +281,8 @@ class Chat(object):
 
         to_send = " ".join(send_str.split())
         if to_send:
+            if not self.rate_ok(player, player.channel_limit):
+                return
             self.server.channel_manager.send(player, to_send, channel_name)
         else:
             player.tell("You must actually send some text.\n")
@@ -404,6 +309,8 @@ class Chat(object):
             if other == player:
                 player.tell("Talking to yourself?\n")
             elif other:
+                if not self.rate_ok(player, player.tell_limit):
+                    return
                 msg = " ".join(elements[1:])
                 other.tell_cc("^R%s^~ tells you: %s\n" % (player, msg))
                 player.tell_cc("You tell ^R%s^~: %s\n" % (other, msg))
@@ -413,6 +320,15 @@ class Chat(object):
         else:
             player.tell("You must give a player and a message.\n")
 
+    def rate_ok(self, player, limit):
+
+        # Messages that go out to other players are rate-limited, so that
+        # one client can't flood everyone else.
+        if limit.take():
+            return True
+        player.tell("You're sending messages too quickly; slow down.\n")
+        return False
+
     def list_players_in_space(self, location, player):
 
         player.tell_cc("Players in ^Y%s^~:\n" % location.name)
@@ -581,16 +497,16 @@ class Chat(object):
         if table_string:
 
             # There must be at least two bits: the table name and a command.
-            string_bits = table_string.split()
-            if len(string_bits) > 1:
+            table_command = Command(table_string)
+            if table_command.rest:
 
                 # De-alias the table name and bail if it fails.
-                table_name = self.de_alias(player, string_bits[0], TABLE)
+                table_name = self.de_alias(player, table_command.bits[0], TABLE)
                 if not table_name:
                     return
 
                 self.server.game_master.handle(player, table_name,
-                   " ".join(string_bits[1:]))
+                   Command(table_command.rest))
                 player.config["last_table"] = table_name
                 valid = True
 
@@ -610,7 +526,7 @@ class Chat(object):
 
         # Pass it on.
         self.server.game_master.handle(player, table_name,
-           " ".join(command_string.split()))
+           Command(command_string))
 
     def focus(self, table_name, player):
 
@@ -754,35 +670,8 @@ class Chat(object):
 
     def show_help(self, player):
 
-        player.tell("\n\nCOMMUNICATION:\n")
-        player.tell_cc("               ^!'^.<message>, ^!\"^.      Say <message>.\n")
-        player.tell_cc("                 ^!-^.<emote>, ^!,^.      Emote <emote>.\n")
-        player.tell_cc("   ^!tell^. <player> <msg>, ^!t^., ^!>^.      Tell <player> <msg> privately.\n")
-        player.tell_cc(" ^!connect^. <channel> [<k>], ^!co^.      Connect to <channel> [with key <k>].\n")
-        player.tell_cc("    ^!disconnect^. <channel>, ^!dc^.      Disconnect from <channel>.\n")
-        player.tell_cc("   ^!invite^. <player> <channel>      Invite <player> to <channel>.\n")
-        player.tell_cc(" ^!send^. <channel> <message>, ^!:^.      Send <channel> <message>.\n")
-        player.tell_cc("                  ^!;^.<message>      Send the last channel used <message>.\n")
-        player.tell("\nWORLD INTERACTION:\n")
-        player.tell_cc("             ^!move^. <space>, ^!m^.      Move to space <space>.\n")
-        player.tell_cc("                      ^!who^., ^!w^.      List players in your space/elsewhere.\n")
-        player.tell("\nGAMING:\n")
-        player.tell_cc("             ^!game^. list, ^!g^. ls      List available games.\n")
-        player.tell_cc("           ^!game^. active, ^!g^. ac      List active tables.\n")
-        player.tell_cc(" ^!game^. new <game> <tablename>      New table of <game> named <tablename>.\n")
-        player.tell_cc("      ^!table^. <table> <cmd>, ^!/^.      Send <table> <cmd>.\n")
-        player.tell_cc("                      ^!\\^.<cmd>      Send the last table played <cmd>.\n")
-        player.tell_cc("   ^!roll^. [X]d<Y>[+/-/*<Z>], ^!r^.      Roll [X] Y-sided/F/% dice [modified].\n")
-        player.tell_cc(" ^!sroll^. [X]d<Y>[+/-/*<Z>], ^!sr^.      Secret roll.\n")
-        player.tell("\nCONFIGURATION:\n")
-        player.tell_cc("^!set timestamp^. on|off, ^!set ts^.      Enable/disable timestamps.\n")
-        player.tell_cc("     ^!set color^. on|off, ^!set c^.      Enable/disable color.\n")
-        player.tell("\nMETA:\n")
-        player.tell_cc("            ^!become^. <newname>      Set name to <newname>.\n")
-        player.tell_cc("   ^!alias^. <type> <name> <num>      Alias table/channel <name> to <num>.\n")
-        player.tell_cc("                      ^!uptime^.      See server start time and uptime.\n")
-        player.tell_cc("                     ^!help^., ^!?^.      Print this help.\n")
-        player.tell_cc("                        ^!quit^.      Disconnect.\n")
+        player.tell("\n")
+        COMMANDS.show_help(player)
 
         self.server.log.log("%s asked for general help." % player)
 
@@ -800,3 +689,70 @@ class Chat(object):
         player.state = State("logout")
 
         self.server.log.log("%s logged out." % player)
+
+COMMANDS = CommandTable(abbreviate=True, help_width=28, help_gap=6,
+                        help_header="\n%s:\n")
+
+COMMANDS.add(("'", '"', "say"), "say", TAKES_REST, "<message>",
+             "Say <message>.", "COMMUNICATION", glued=("'", '"'))
+COMMANDS.add(("-", ",", "emote", "me", "em"), "emote", TAKES_REST, "<emote>",
+             "Emote <emote>.", "COMMUNICATION", shown=("-", ","),
+             glued=("-", ","))
+COMMANDS.add(("tell", "t", ">"), "tell", TAKES_REST, "<player> <msg>",
+             "Tell <player> <msg> privately.", "COMMUNICATION", glued=(">",))
+COMMANDS.add(("connect", "co"), "connect", TAKES_REST, "<channel> [<k>]",
+             "Connect to <channel> [with key <k>].", "COMMUNICATION")
+COMMANDS.add(("disconnect", "dc"), "disconnect", TAKES_REST, "<channel>",
+             "Disconnect from <channel>.", "COMMUNICATION")
+COMMANDS.add(("channels", "chan"), "channels", TAKES_PLAYER, None,
+             "List the channels you're connected to.", "COMMUNICATION")
+COMMANDS.add(("invite", "inv"), "invite", TAKES_REST, "<player> <channel>",
+             "Invite <player> to <channel>.", "COMMUNICATION",
+             shown=("invite",))
+COMMANDS.add(("send", ":"), "send", TAKES_REST, "<channel> <message>",
+             "Send <channel> <message>.", "COMMUNICATION", glued=(":",))
+COMMANDS.add((";",), "last_send", TAKES_REST, "<message>",
+             "Send the last channel used <message>.", "COMMUNICATION",
+             glued=(";",))
+
+COMMANDS.add(("move", "m"), "move", TAKES_REST, "<space>",
+             "Move to space <space>.", "WORLD INTERACTION")
+COMMANDS.add(("who", "w"), "who", TAKES_PLAYER, None,
+             "List players in your space/elsewhere.", "WORLD INTERACTION")
+
+COMMANDS.add(("game", "games", "g"), "game", TAKES_REST, section="GAMING",
+             rows=(("^!game^. list, ^!g^. ls", "List available games."),
+                   ("^!game^. active, ^!g^. ac", "List active tables."),
+                   ("^!game^. new <game> <tablename>", "New table of <game> named <tablename>.")))
+COMMANDS.add(("table", "tab", "/"), "table", TAKES_REST, "<table> <cmd>",
+             "Send <table> <cmd>.", "GAMING", shown=("table", "/"),
+             glued=("/",))
+COMMANDS.add(("\\",), "last_table", TAKES_REST, "<cmd>",
+             "Send the last table played <cmd>.", "GAMING", glued=("\\",))
+COMMANDS.add(("focus", "f"), "focus", TAKES_REST, "<table>",
+             "Send <table> everything not starting with /.", "GAMING")
+COMMANDS.add(("unfocus", "defocus", "unf"), "unfocus", TAKES_PLAYER, None,
+             "Stop focusing on a table.", "GAMING", shown=("unfocus",))
+COMMANDS.add(("roll", "r"), "roll", TAKES_REST, "[X]d<Y>[+/-/*<Z>]",
+             "Roll [X] Y-sided/F/% dice [modified].", "GAMING",
+             rows=(("^!roll^. 4d6k3+d4!-1, 2d20kl1", "Keep/drop (k/kl/dh/dl), explode (!), reroll (rN)."),),
+             secret=False)
+COMMANDS.add(("sroll", "sr"), "roll", TAKES_REST, "[X]d<Y>[+/-/*<Z>]",
+             "Secret roll.", "GAMING", secret=True)
+
+COMMANDS.add(("set",), "config", TAKES_REST, section="CONFIGURATION",
+             rows=(("^!set timestamp^. on|off, ^!set ts^.", "Enable/disable timestamps."),
+                   ("^!set color^. on|off, ^!set c^.", "Enable/disable color."),
+                   ("^!set live^. on|off, ^!set lb^.", "Enable/disable live boards.")))
+
+COMMANDS.add(("become",), "become", TAKES_REST, "<newname>",
+             "Set name to <newname>.", "META")
+COMMANDS.add(("alias",), "alias", TAKES_REST, "<type> <name> <num>",
+             "Alias table/channel <name> to <num>.", "META")
+COMMANDS.add(("uptime",), "uptime", TAKES_PLAYER, None,
+             "See server start time and uptime.", "META")
+COMMANDS.add(("help", "h", "?"), "show_help", TAKES_PLAYER, None,
+             "Print this help.", "META", shown=("help", "?"))
+COMMANDS.add(("admin",), "admin", TAKES_REST, abbreviate=False)
+COMMANDS.add(("quit", "exit"), "quit", TAKES_PLAYER, None, "Disconnect.",
+             "META", shown=("quit",), abbreviate=False)
@@ -0,0 +1,267 @@
+# Giles: command.py
+# Copyright 2012 Phil Bordelon
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from bisect import bisect_left
+
+from miniboa.xterm import strip_caret_codes
+
+# How a command's handler wants to be called:
+# - TAKES_PLAYER: handler(player)
+# - TAKES_REST: handler(rest, player), where rest is everything after the
+#   command word (or None if there wasn't anything).
+# - TAKES_ARGS: handler(player, args), with the list of arguments.
+# - TAKES_COMMAND: handler(player, command), with the whole Command.
+TAKES_PLAYER = "player"
+TAKES_REST = "rest"
+TAKES_ARGS = "args"
+TAKES_COMMAND = "command"
+
+class Command(str):
+    """A line of input, tokenized once.  It is still a string (with
+    whitespace collapsed), so handlers that want the raw text can treat
+    it as one, but it also carries the bits everything else wants:
+
+    - bits: the whitespace-separated tokens.
+    - primary: the first token, lowercased.
+    - args: every token after the first.
+    - rest: the args joined back up by single spaces, or None if empty.
+    """
+
+    def __new__(cls, text, glued=False):
+
+        if isinstance(text, Command):
+            return text
+
+        # Glued commands are a single character followed immediately by
+        # their argument, which is passed along untouched.
+        if glued:
+            self = str.__new__(cls, text)
+            self.primary = text[0]
+            self.rest = text[1:].strip() or None
+            self.args = text[1:].split()
+            self.bits = [self.primary] + self.args
+            return self
+
+        bits = text.split()
+        self = str.__new__(cls, " ".join(bits))
+        self.bits = bits
+        self.args = bits[1:]
+        if bits:
+            self.primary = bits[0].lower()
+        else:
+            self.primary = ""
+        if self.args:
+            self.rest = " ".join(self.args)
+        else:
+            self.rest = None
+        return self
+
+class CommandEntry(object):
+
+    def __init__(self, names, handler, takes, usage, desc, section, rows,
+                 shown, glued, abbreviate, debug, states, kwargs):
+
+        self.names = names
+        self.handler = handler
+        self.takes = takes
+        self.usage = usage
+        self.desc = desc
+        self.section = section
+        self.rows = rows
+        self.shown = shown
+        self.glued = glued
+        self.abbreviate = abbreviate
+        self.debug = debug
+        self.states = states
+        self.kwargs = kwargs
+
+class CommandTable(object):
+    """A table of commands, mapping each of their names to a handler.
+
+    Handlers are stored as method names and looked up on whatever object
+    is dispatching, so a table can be built once per class and shared by
+    every instance (and every subclass that overrides a handler).  Tables
+    can extend a parent table; the child gets copies of all its commands.
+
+    Names are matched exactly first.  If the table allows abbreviations,
+    anything that is a prefix of exactly one command's names matches that
+    command.  "Glued" names are single characters that may be followed
+    immediately by their argument, like '"hello' for say.
+
+    Commands can be limited to certain states (of a game, say).  They are
+    kept apart from the rest, and are only found by looking up a word in
+    one of their states, so the same name can mean different things in
+    different states.  They are never abbreviated.
+
+    Help is generated from the commands' usage and description, grouped
+    by section in the order the sections were first used.
+    """
+
+    def __init__(self, parent=None, abbreviate=False, help_width=29,
+                 help_gap=5, help_header="\n%s:\n\n"):
+
+        self.abbreviate = abbreviate
+        self.help_width = help_width
+        self.help_gap = help_gap
+        self.help_header = help_header
+
+        self.entries = []
+        self.names = {}
+        self.glued = {}
+        self.sorted_names = []
+        self.prefixes = {}
+        self.state_names = {}
+
+        if parent:
+            for entry in parent.entries:
+                self.add_entry(entry)
+
+    def add(self, names, handler, takes=TAKES_PLAYER, usage=None, desc=None,
+            section=None, rows=(), shown=None, glued=(), abbreviate=True,
+            debug=False, states=(), **kwargs):
+
+        if shown is None:
+            shown = names
+        self.add_entry(CommandEntry(names, handler, takes, usage, desc,
+                                    section, rows, shown, glued, abbreviate,
+                                    debug, states, kwargs))
+
+    def add_entry(self, entry):
+
+        self.entries.append(entry)
+        if entry.states:
+            for state in entry.states:
+                state_names = self.state_names.setdefault(state, {})
+                for name in entry.names:
+                    state_names[name] = entry
+            return
+
+        for name in entry.names:
+            self.names[name] = entry
+        for char in entry.glued:
+            self.glued[char] = entry
+        self.sorted_names = sorted(self.names)
+        self.prefixes = {}
+
+    def find(self, word, state=None):
+
+        # In a state, only the commands for that state count, and only
+        # exactly.
+        if state is not None:
+            return self.state_names.get(state, {}).get(word)
+
+        # Exact matches (including aliases) are a straight dictionary hit.
+        if word in self.names:
+            return self.names[word]
+
+        if not self.abbreviate or not word:
+            return None
+
+        # Prefixes are remembered once found; since they are all prefixes
+        # of real names, there are only so many of them.  Everything else
+        # falls through the binary search every time, but that's cheap.
+        if word in self.prefixes:
+            return self.prefixes[word]
+
+        found = None
+        i = bisect_left(self.sorted_names, word)
+        while i < len(self.sorted_names) and self.sorted_names[i].startswith(word):
+            entry = self.names[self.sorted_names[i]]
+            if entry.abbreviate and entry is not found:
+                if found:
+
+                    # Ambiguous.
+                    return None
+                found = entry
+            i += 1
+
+        if found:
+            self.prefixes[word] = found
+        return found
+
+    def find_glued(self, text):
+
+        # Returns the glued command the text starts with, if any.
+        if text and text[0] in self.glued:
+            return self.glued[text[0]]
+        return None
+
+    def call(self, obj, entry, player, command):
+
+        # Calls the entry's handler on obj.  Returns whatever the handler
+        # did, so handlers can decline a command by returning False.
+        handler = getattr(obj, entry.handler)
+        if entry.takes == TAKES_REST:
+            return handler(command.rest, player, **entry.kwargs)
+        elif entry.takes == TAKES_ARGS:
+            return handler(player, command.args, **entry.kwargs)
+        elif entry.takes == TAKES_COMMAND:
+            return handler(player, command, **entry.kwargs)
+        return handler(player, **entry.kwargs)
+
+    def dispatch(self, obj, player, command, state=None):
+
+        # Finds and runs the command (among those for state, if given);
+        # returns whether it was handled.
+        entry = self.find(command.primary, state)
+        if not entry:
+            return False
+        return self.call(obj, entry, player, command) is not False
+
+    def get_help_left(self, entry):
+
+        first = entry.shown[0]
+        left = "^!%s^." % first
+        if entry.usage:
+            if first not in entry.glued:
+                left += " "
+            left += entry.usage
+        for name in entry.shown[1:]:
+            left += ", ^!%s^." % name
+        return left
+
+    def get_help_lines(self, debug=False):
+
+        sections = []
+        section_rows = {}
+        for entry in self.entries:
+            if entry.debug and not debug:
+                continue
+            rows = []
+            if entry.desc:
+                rows.append((self.get_help_left(entry), entry.desc))
+            rows.extend(entry.rows)
+            if not rows:
+                continue
+            if entry.section not in section_rows:
+                sections.append(entry.section)
+                section_rows[entry.section] = []
+            section_rows[entry.section].extend(rows)
+
+        lines = []
+        gap = " " * self.help_gap
+        for section in sections:
+            if section:
+                lines.append(self.help_header % section)
+            for left, desc in section_rows[section]:
+                padding = " " * max(0, self.help_width - len(strip_caret_codes(left)))
+                lines.append("%s%s%s%s\n" % (padding, left, gap, desc))
+        return lines
+
+    def show_help(self, player, debug=False):
+
+        for line in self.get_help_lines(debug):
+            player.tell_cc(line)
@@ -58,6 +58,11 @@ class Configurator(object):
                         is_valid = False
                     else:
                         is_valid = self.set_color(config_bits[1], player)
+                elif primary in ('liveboard', 'live', 'lb'):
+                    if len(config_bits) != 2:
+                        is_valid = False
+                    else:
+                        is_valid = self.set_live_board(config_bits[1], player)
 
         if not is_valid:
             player.tell("Invalid configuration.\n")
@@ -94,7 +99,26 @@ class Configurator(object):
             player.server.log.log("%s turned color on." % player)
         else:
             player.config["color"] = False
+            player.release_live_board()
             player.client.use_ansi = False
             player.server.log.log("%s turned color off." % player)
 
         return True
+
+    def set_live_board(self, msg, player):
+
+        # Returns whether or not it was successful, not the value set.
+
+        action = booleanize(msg)
+        if not action:
+            return False
+
+        if action > 0:
+            player.config["live_board"] = True
+            player.server.log.log("%s turned live boards on." % player)
+        else:
+            player.config["live_board"] = False
+            player.release_live_board()
+            player.server.log.log("%s turned live boards off." % player)
+
+        return True
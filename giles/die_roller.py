@@ -15,172 +15,312 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import random
+import re
+
+# Rolls are sums of terms, each of which is either a number or a handful of
+# dice, optionally multiplied by a number:
+#
+#   [+|-] ( [X]d(Y|%|%%|F)[modifiers] | Z ) [*M]
+#
+# where the dice modifiers, in any order, are:
+#
+#   khN, kN   keep the highest N dice      klN   keep the lowest N dice
+#   dhN       drop the highest N dice      dlN   drop the lowest N dice
+#   !         explode: roll again and add on the highest face
+#   rN        reroll (once) any die showing N or less
+TERM_RE = re.compile(r"([+-]?)(?:(\d*)d(%%|%|f|\d+)((?:kh\d+|kl\d+|k\d+|dh\d+|dl\d+|r\d+|!)*)|(\d+))(?:\*(\d+))?")
+MODIFIER_RE = re.compile(r"(kh|kl|k|dh|dl|r)(\d+)|(!)")
+
+# Hard limits, so that no roll can tie up the server.  Rerolls count
+# against the dice limit; explosions are capped per die instead.
+MAX_TERMS = 20
+MAX_DICE = 10000
+MAX_SIDES = 10000
+MAX_NUMBER = 100000
+MAX_MULTIPLIER = 1000
+MAX_EXPLOSIONS = 100
+
+# Above this many dice, results are summarized rather than listed.  This
+# was once the most dice a roll could have, so no roll that used to work
+# loses its list of dice.
+MAX_LISTED_DICE = 100
+
+# Parsed rolls, keyed by the (lowercased, spaceless) roll string.
+MAX_CACHED_ROLLS = 256
+
+FUDGE = "F"
+
+def roll_dice(count, sides):
+
+    # Rolls count dice of the given number of sides, returning a list.
+    # Rather than randint() per die, pull just enough random bits for each
+    # and throw away (the rare) values that are out of range.
+    if sides == 1:
+        return [1] * count
+    getrandbits = random.getrandbits
+    bits = (sides - 1).bit_length()
+    to_return = []
+    while len(to_return) < count:
+        value = getrandbits(bits)
+        if value < sides:
+            to_return.append(value + 1)
+    return to_return
+
+class RollError(Exception):
+    pass
+
+class DiceTerm(object):
+    """A handful of dice, with whatever modifiers were asked for."""
+
+    def __init__(self, count, sides):
+
+        self.count = count
+        self.sides = sides      # Or FUDGE.
+        self.keep = None        # ("high" or "low", N) if keeping some.
+        self.explode = False
+        self.reroll = 0
+
+    def add_modifier(self, kind, value):
+
+        if kind in ("k", "kh", "kl", "dh", "dl"):
+            if self.keep:
+                raise RollError("Only one keep or drop per set of dice.")
+            if value > self.count or (value == self.count and kind in ("dh", "dl")):
+                raise RollError("Can't keep or drop more dice than are rolled.")
+            if kind in ("k", "kh"):
+                self.keep = ("high", value)
+            elif kind == "kl":
+                self.keep = ("low", value)
+            elif kind == "dh":
+                self.keep = ("low", self.count - value)
+            else:
+                self.keep = ("high", self.count - value)
+
+        elif kind == "!":
+            if self.sides == FUDGE or self.sides < 2:
+                raise RollError("Those dice can't explode.")
+            self.explode = True
+
+        elif kind == "r":
+            if self.sides == FUDGE or value >= self.sides:
+                raise RollError("That reroll would never stop.")
+            self.reroll = value
+
+    def max_dice(self):
+
+        # The most dice this term could roll, not counting explosions.
+        count = self.count
+        if self.reroll:
+            count *= 2
+        return count
+
+    def roll(self):
+
+        # Returns the total and a printable list of the dice.
+        if self.sides == FUDGE:
+            values = [x - 2 for x in roll_dice(self.count, 3)]
+        else:
+            values = roll_dice(self.count, self.sides)
+
+        if self.reroll:
+            rerolls = [i for i, x in enumerate(values) if x <= self.reroll]
+            for i, new_value in zip(rerolls, roll_dice(len(rerolls), self.sides)):
+                values[i] = new_value
+
+        exploded = set()
+        if self.explode:
+            for i, value in enumerate(values):
+                this_roll = value
+                explosions = 0
+                while this_roll == self.sides and explosions < MAX_EXPLOSIONS:
+                    this_roll = roll_dice(1, self.sides)[0]
+                    values[i] += this_roll
+                    explosions += 1
+                if explosions:
+                    exploded.add(i)
+
+        kept = range(len(values))
+        if self.keep:
+            direction, keep_count = self.keep
+            kept.sort(key=lambda x: values[x], reverse=(direction == "high"))
+            kept = set(kept[:keep_count])
+        else:
+            kept = set(kept)
+
+        total = sum([values[i] for i in kept])
+        return total, self.describe(values, kept, exploded)
+
+    def describe(self, values, kept, exploded):
+
+        if len(values) > MAX_LISTED_DICE:
+
+            # Too many to list; summarize them instead.  Few enough faces
+            # get a count of each; otherwise, just the range.
+            kept_values = [values[i] for i in kept]
+            if not kept_values:
+                return "%d dice, none kept" % len(values)
+            faces = {}
+            for value in kept_values:
+                faces[value] = faces.get(value, 0) + 1
+            summary = "%d dice" % len(values)
+            if len(kept_values) != len(values):
+                summary += ", %d kept" % len(kept_values)
+            if len(faces) <= 20:
+                return summary + ": " + " ".join(["%sx%d" % (self.face_str(x), faces[x]) for x in sorted(faces)])
+            return summary + ", %s to %s" % (self.face_str(min(kept_values)), self.face_str(max(kept_values)))
+
+        die_list = []
+        for i, value in enumerate(values):
+            die_str = self.face_str(value)
+            if i in exploded:
+                die_str += "!"
+            if i not in kept:
+                die_str = "[%s]" % die_str
+            die_list.append(die_str)
+        return " ".join(die_list)
+
+    def face_str(self, value):
+
+        if self.sides == FUDGE:
+            if value < 0:
+                return "-"
+            elif value > 0:
+                return "+"
+            return "o"
+        return str(value)
+
+class Roll(object):
+    """A parsed roll: a list of (sign, term, multiplier) triples, where
+    the term is either a DiceTerm or a plain number.
+    """
+
+    def __init__(self, terms):
+
+        self.terms = terms
+
+    def roll(self):
+
+        # Returns the total and the printable description of the dice.
+        total = 0
+        descriptions = []
+        for sign, term, multiplier in self.terms:
+            if isinstance(term, DiceTerm):
+                value, description = term.roll()
+                descriptions.append(description)
+            else:
+                value = term
+            total += sign * value * multiplier
+        return total, " / ".join(descriptions)
+
+def parse_roll(roll_str):
+
+    # Turns a roll string into a Roll, raising RollError if it isn't one.
+    pos = 0
+    terms = []
+    dice_total = 0
+    while pos < len(roll_str):
+        match = TERM_RE.match(roll_str, pos)
+        if not match or match.end() == pos or (terms and not match.group(1)):
+            raise RollError("Invalid die roll.")
+        sign_str, count_str, sides_str, modifier_str, number_str, multiplier_str = match.groups()
+        pos = match.end()
+
+        sign = 1
+        if sign_str == "-":
+            sign = -1
+
+        multiplier = 1
+        if multiplier_str:
+            multiplier = int(multiplier_str)
+            if not multiplier or multiplier > MAX_MULTIPLIER:
+                raise RollError("Multipliers must be between 1 and %d." % MAX_MULTIPLIER)
+
+        if number_str:
+            term = int(number_str)
+            if term > MAX_NUMBER:
+                raise RollError("Numbers can be at most %d." % MAX_NUMBER)
+
+        else:
+
+            # If we didn't get a count of dice, that's just 1dX (i.e. d6).
+            # Otherwise someone actually put zeroes, and that's not valid.
+            count = 1
+            if count_str:
+                count = int(count_str)
+                if not count:
+                    raise RollError("Invalid die roll.")
+
+            if sides_str == "f":
+                sides = FUDGE
+            elif sides_str == "%":
+                sides = 100
+            elif sides_str == "%%":
+                sides = 1000
+            else:
+                sides = int(sides_str)
+                if not sides:
+                    raise RollError("Invalid die roll.")
+                elif sides > MAX_SIDES:
+                    raise RollError("Dice can have at most %d sides." % MAX_SIDES)
+
+            term = DiceTerm(count, sides)
+            for kind, value, explode in MODIFIER_RE.findall(modifier_str):
+                if explode:
+                    term.add_modifier(explode, 0)
+                else:
+                    term.add_modifier(kind, int(value))
+
+            dice_total += term.max_dice()
+            if dice_total > MAX_DICE:
+                raise RollError("That's too many dice; the limit is %d per roll." % MAX_DICE)
+
+        terms.append((sign, term, multiplier))
+        if len(terms) > MAX_TERMS:
+            raise RollError("That's too many terms; the limit is %d per roll." % MAX_TERMS)
+
+    if not [x for x in terms if isinstance(x[1], DiceTerm)]:
+        raise RollError("You have to roll at least one die.")
+
+    return Roll(terms)
 
 class DieRoller(object):
 
     def __init__(self):
-        pass
+
+        # Parsed rolls (or the error for invalid ones), so that people
+        # rolling the same thing over and over only pay for parsing once.
+        self.cache = {}
+
+    def get_roll(self, message):
+
+        # Lowercase it to make parsing easier.  Remove all spaces.
+        roll_str = "".join(message.lower().split())
+        if roll_str not in self.cache:
+            if len(self.cache) >= MAX_CACHED_ROLLS:
+                self.cache = {}
+            try:
+                self.cache[roll_str] = parse_roll(roll_str)
+            except RollError, e:
+                self.cache[roll_str] = e
+        return self.cache[roll_str]
 
     def roll(self, message, player, secret=False):
 
-        # Die rolls are of the format XdY, possibly with a +- bit after.
-        # They may also be secret, in which case we just message the
-        # player rather than everyone in the space.
+        # Die rolls are sums of dice and numbers; see TERM_RE.  They may
+        # also be secret, in which case we just message the player rather
+        # than everyone in the space.
 
         if message:
 
-            # Lowercase it to make parsing easier.  Remove all spaces.
-            chomp_str = "".join(message.lower().split())
-
-            is_valid = True
-            count = 0
-            got_count = False
-            die_type = None
-            die_sides = 0
-            modifier_type = None
-            modifier_value = 0
-
-            # We're gonna use a FSM, but no need for substates.
-
-            state = "count"
-
-            while state != "done":
-
-                if len(chomp_str) == 0:
-                    # Done.
-                    state = "done"
-                    continue
-
-                curr_char = chomp_str[0]
-                chomp_str = chomp_str[1:]
-
-                if state == "count":
-                    if curr_char.isdigit():
-                        count *= 10
-                        count += int(curr_char)
-                        got_count = True
-                    elif curr_char == "d":
-                        # Done with the count, next is type.
-                        state = "type"
-                    else:
-                        # Huh?  Invalid.
-                        is_valid = False
-                        state = "done"
-
-                elif state == "type":
-                    if curr_char.isdigit():
-                        # Ah, a multisided die.  Replace digit and change state.
-                        chomp_str = curr_char + chomp_str
-                        state = "die_sides"
-                    elif curr_char == "f":
-                        # Fudge dice; no modifiers allowed.
-                        die_type = "Fudge"
-                        state = "done"
-                    elif curr_char == "%":
-                        # d100.  No need to chomp sides; go straight to mods.
-                        die_sides = 100
-                        state = "subtype"
-                    else:
-                        # Huh?  Invalid.
-                        is_valid = False
-                        state = "done"
-
-                elif state == "subtype":
-                    # Just need to check some final details...
-                    if die_sides == 100:
-                        if curr_char == "%":
-                            # So, you want a d1000 instead?
-                            die_sides = 1000
-                            state = "modifier_type"
-                        else:
-                            # Not meant for us, so replace and change state
-                            chomp_str = curr_char + chomp_str
-                            state = "modifier_type"
-
-                elif state == "die_sides":
-                    if curr_char.isdigit():
-                        die_sides *= 10
-                        die_sides += int(curr_char)
-                    else:
-                        # Pop this character back on and see if it's a mod.
-                        chomp_str = curr_char + chomp_str
-                        state = "modifier_type"
-
-                elif state == "modifier_type":
-                    if curr_char == "+":
-                        modifier_type = "+"
-                        state = "modifier_value"
-                    elif curr_char == "-":
-                        modifier_type = "-"
-                        state = "modifier_value"
-                    elif curr_char == "*":
-                        modifier_type = "*"
-                        state = "modifier_value"
-                    else:
-                        # Huh?  Unknown modifier.
-                        is_valid = False
-                        state = "done"
-
-                elif state == "modifier_value":
-                    if curr_char.isdigit():
-                        modifier_value *= 10
-                        modifier_value += int(curr_char)
-                    else:
-                        # Huh?  Should be nothing but numbers here.
-                        is_valid = False
-                        state = "done"
-
-            # If we didn't get a count of dice, but we also didn't
-            # get a number, that's just 1dX.  (i.e. d6) Otherwise someone
-            # actually put zeroes, and that's not valid.
-            if count == 0:
-                if not got_count:
-                    count = 1
-                else:
-                    is_valid = False
-
-            # If we already know it's invalid, bail.  Also bail:
-            # - if we have a modifier type but not a value
-            # - if count is > 100
-            # - if sides or abs(modifier) are > 1000
-            # - if die side count is 0 and we don't have a die type.
-            if ((not is_valid) or
-               (modifier_type and not modifier_value) or
-               (count > 100) or (die_sides > 1000) or (abs(modifier_value) > 1000)
-               or (not die_sides and not die_type)):
-                player.tell("Invalid die roll.\n")
+            parsed = self.get_roll(message)
+            if isinstance(parsed, RollError):
+                player.tell("%s\n" % parsed)
+                return
+
+            roll_result, die_str = parsed.roll()
 
+            # Whew.  Done!  Send it to the right people.
+            if secret:
+                player.tell_cc("You rolled ^G%s^~ in ^Csecret^~; the result is ^Y%s^~. (^M%s^~)\n" % (message, str(roll_result), die_str))
             else:
-                # Okay, we have a legit roll.  Let's do it.
-                die_list = []
-                roll_result = 0
-
-                for die in range(count):
-                    if die_type == "Fudge":
-                        val = random.randint(-1, 1)
-                        roll_result += val
-                        if val == -1:
-                            die_list.append("-")
-                        elif val == 1:
-                            die_list.append("+")
-                        else:
-                            die_list.append("o")
-                    else:
-                        val = random.randint(1, die_sides)
-                        roll_result += val
-                        die_list.append(str(val))
-
-                # Dice are rolled.  Add modifiers, if any.
-                if modifier_type:
-                    if modifier_type == "+":
-                        roll_result += modifier_value
-                    elif modifier_type == "-":
-                        roll_result -= modifier_value
-                    elif modifier_type == "*":
-                        roll_result *= modifier_value
-
-                # Whew.  Done!  Send it to the right people.
-                if secret:
-                    player.tell_cc("You rolled ^G%s^~ in ^Csecret^~; the result is ^Y%s^~. (^M%s^~)\n" % (message, str(roll_result), " ".join(die_list)))
-                else:
-                    player.location.notify_cc("^Y%s^~ rolled ^G%s^~; the result is ^Y%s^~. (^R%s^~)\n" % (player, message, str(roll_result), " ".join(die_list)))
+                player.location.notify_cc("^Y%s^~ rolled ^G%s^~; the result is ^Y%s^~. (^R%s^~)\n" % (player, message, str(roll_result), die_str))
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from giles.command import Command
 from giles.game_handle import GameHandle
 from giles.utils import name_is_valid
 
@@ -129,13 +130,13 @@ class GameMaster(object):
 
     def handle(self, player, table_name, command_str):
 
-        if table_name and command_str and type(command_str) == str:
+        if table_name and command_str and isinstance(command_str, str):
 
             # Check our list of tables to see if this game ID is in it.
             table = self.get_table(table_name)
             if table:
                 try:
-                    table.handle(player, command_str)
+                    table.handle(player, Command(command_str))
                 except Exception as e:
                     table.channel.broadcast_cc("This table just crashed on a command! ^RAlert the admin^~.\n")
                     self.log("%scrashed on command |%s|.\n%s" % (table.log_prefix, command_str, traceback.format_exc()))
@@ -14,10 +14,12 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from giles.command import CommandTable, TAKES_ARGS
 from giles.state import State
-from giles.games.seated_game import SeatedGame
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
-from giles.utils import demangle_move
+from giles.games.printable_board import PrintableBoard
+from giles.utils import Struct, demangle_move
 
 MIN_SIZE = 5
 MAX_SIZE = 26
@@ -30,6 +32,53 @@ PIT = "pit"
 
 COLS = "abcdefghijklmnopqrstuvwxyz"
 
+SIDES = (RED, BLUE, GREEN, YELLOW)
+
+# Bitboard masks for each board size, made as needed; see get_masks().
+BOARD_MASKS = {}
+
+def get_masks(size):
+
+    # Cell (r, c) of a board is bit r * size + c of a bitboard.  For every
+    # board size we keep a mask of the whole board, masks that drop the
+    # leftmost and rightmost columns (for shifting sideways without wrapping
+    # onto the next row), and, for every cell, the mask of cells a piece
+    # there could clone to (the eight around it) and jump to (the sixteen
+    # two away).
+    if size in BOARD_MASKS:
+        return BOARD_MASKS[size]
+
+    masks = Struct()
+    masks.full = (1 << (size * size)) - 1
+    left_col = 0
+    for r in range(size):
+        left_col |= 1 << (r * size)
+    masks.not_left = masks.full & ~left_col
+    masks.not_right = masks.full & ~(left_col << (size - 1))
+    masks.clone = []
+    masks.jump = []
+    for r in range(size):
+        for c in range(size):
+            clone = 0
+            jump = 0
+            for r_d in range(-2, 3):
+                for c_d in range(-2, 3):
+                    if ((r_d or c_d) and 0 <= r + r_d < size and
+                       0 <= c + c_d < size):
+                        bit = 1 << ((r + r_d) * size + c + c_d)
+                        if abs(r_d) < 2 and abs(c_d) < 2:
+                            clone |= bit
+                        else:
+                            jump |= bit
+            masks.clone.append(clone)
+            masks.jump.append(jump)
+
+    BOARD_MASKS[size] = masks
+    return masks
+
+def popcount(bits):
+    return bin(bits).count("1")
+
 TAGS = ["abstract", "capture", "square", "2p", "4p"]
 
 CONFIG_PARAMS = (
@@ -59,8 +108,13 @@ class Ataxx(SeatedGame):
         self.log_prefix = "%s/%s: " % (self.table_display_name, self.game_display_name)
         self.config_params = CONFIG_PARAMS
 
-        # Ataxx-specific stuff.
+        # Ataxx-specific stuff.  The board is kept both as a grid (for
+        # drawing) and as a bitboard per side plus one for the pits (for
+        # everything else); set_cell() keeps the two in step.
         self.board = None
+        self.bitboards = None
+        self.pits = 0
+        self.masks = None
         self.printable_board = None
         self.sides = {}
         self.size = 7
@@ -77,6 +131,9 @@ class Ataxx(SeatedGame):
         self.board = []
         for r in range(self.size):
             self.board.append([None] * self.size)
+        self.bitboards = dict([(x, 0) for x in SIDES])
+        self.pits = 0
+        self.masks = get_masks(self.size)
 
         # Place starting pieces, depending on the number of players.
         bottom_left = BLUE
@@ -85,10 +142,10 @@ class Ataxx(SeatedGame):
             bottom_left = YELLOW
             bottom_right = GREEN
 
-        self.board[0][0] = RED
-        self.board[0][self.size - 1] = BLUE
-        self.board[self.size - 1][0] = bottom_left
-        self.board[self.size - 1][self.size - 1] = bottom_right
+        self.set_cell(0, 0, RED)
+        self.set_cell(0, self.size - 1, BLUE)
+        self.set_cell(self.size - 1, 0, bottom_left)
+        self.set_cell(self.size - 1, self.size - 1, bottom_right)
 
         self.update_printable_board()
 
@@ -153,34 +210,82 @@ class Ataxx(SeatedGame):
         # ...and reinitialize the board.
         self.init_board()
 
+    def set_cell(self, row, col, thing):
+
+        # Put a side's piece, a pit, or nothing (None) on a cell.
+        bit = 1 << (row * self.size + col)
+        old_thing = self.board[row][col]
+        if old_thing == PIT:
+            self.pits &= ~bit
+        elif old_thing:
+            self.bitboards[old_thing] &= ~bit
+
+        self.board[row][col] = thing
+        if thing == PIT:
+            self.pits |= bit
+        elif thing:
+            self.bitboards[thing] |= bit
+
+    def get_empty(self):
+
+        occupied = self.pits
+        for side in SIDES:
+            occupied |= self.bitboards[side]
+        return self.masks.full & ~occupied
+
+    def grow(self, bits):
+
+        # Returns the given cells plus every cell touching them.
+        masks = self.masks
+        bits |= ((bits << 1) & masks.not_left) | ((bits >> 1) & masks.not_right)
+        bits |= (bits << self.size) | (bits >> self.size)
+        return bits & masks.full
+
     def update_printable_board(self):
 
-        self.printable_board = []
-        col_str = "    " + "".join([" " + COLS[i] for i in range(self.size)])
-        self.printable_board.append(col_str + "\n")
-        self.printable_board.append("   ^m.=" + "".join(["=="] * self.size) + ".^~\n")
+        # Only rows whose contents (or last-move highlight) have changed
+        # since the last render are rebuilt; see PrintableBoard.
+        if not self.printable_board:
+            self.printable_board = PrintableBoard()
+        board = self.printable_board
+        board.resize(self.size + 4)
+
+        if board.is_stale(0, self.size):
+            col_str = "    " + "".join([" " + COLS[i] for i in range(self.size)]) + "\n"
+            board.set_line(0, col_str, self.size)
+            board.set_line(1, "   ^m.=" + "".join(["=="] * self.size) + ".^~\n", self.size)
+            board.set_line(self.size + 2, "   ^m`=" + "".join(["=="] * self.size) + "'^~\n", self.size)
+            board.set_line(self.size + 3, col_str, self.size)
+
         for r in range(self.size):
-            this_str = "%2d ^m|^~ " % (r + 1)
-            for c in range(self.size):
-                if r == self.last_r and c == self.last_c:
-                    this_str += "^I"
-                loc = self.board[r][c]
+            if r == self.last_r:
+                highlight = self.last_c
+            else:
+                highlight = None
+            row_key = (tuple(self.board[r]), highlight)
+            if not board.is_stale(r + 2, row_key):
+                continue
+
+            bits = ["%2d ^m|^~ " % (r + 1)]
+            for c, loc in enumerate(self.board[r]):
+                if c == highlight:
+                    bits.append("^I")
                 if loc == RED:
-                    this_str += "^RR^~ "
+                    bits.append("^RR^~ ")
                 elif loc == BLUE:
-                    this_str += "^BB^~ "
+                    bits.append("^BB^~ ")
                 elif loc == GREEN:
-                    this_str += "^GG^~ "
+                    bits.append("^GG^~ ")
                 elif loc == YELLOW:
-                    this_str += "^YY^~ "
+                    bits.append("^YY^~ ")
                 elif loc == PIT:
-                    this_str += "^Ko^~ "
+                    bits.append("^Ko^~ ")
                 else:
-                    this_str += "^M.^~ "
-            this_str += "^m|^~ %d" % (r + 1)
-            self.printable_board.append(this_str + "\n")
-        self.printable_board.append("   ^m`=" + "".join(["=="] * self.size) + "'^~\n")
-        self.printable_board.append(col_str + "\n")
+                    bits.append("^M.^~ ")
+            bits.append("^m|^~ %d\n" % (r + 1))
+            board.set_line(r + 2, "".join(bits), row_key)
+
+        board.update()
 
     def get_info_str(self):
 
@@ -207,18 +312,19 @@ class Ataxx(SeatedGame):
         info_str += "\n"
         return(info_str)
 
-    def show(self, player):
+    def get_public_view(self):
 
         if not self.printable_board:
             self.update_printable_board()
-        for line in self.printable_board:
-            player.tell_cc(line)
-        player.tell_cc(self.get_info_str())
+        return [self.printable_board, self.get_info_str()]
+
+    def show(self, player):
+
+        self.send_view(player)
 
     def send_board(self):
 
-        for listener in self.channel.listeners:
-            self.show(listener)
+        self.broadcast_view()
 
     def is_valid(self, row, col):
 
@@ -228,24 +334,22 @@ class Ataxx(SeatedGame):
             return False
         return True
 
-    def piece_has_move(self, row, col):
-
-        # Returns whether or not a given piece has a potential move.
+    def piece_moves(self, row, col):
 
-        # Bail on dud data.
+        # Returns the cells a given piece can move to, as a pair of
+        # bitboards: clones first, then jumps.  Dud data has no moves.
         if not self.is_valid(row, col) or not self.board[row][col]:
-            return False
+            return (0, 0)
+
+        index = row * self.size + col
+        empty = self.get_empty()
+        return (self.masks.clone[index] & empty, self.masks.jump[index] & empty)
 
-        # Okay.  A piece can potentially move anywhere in a 5x5 area centered
-        # on its location.
-        found_move = False
-        for r_d in range(-2, 3): # <--- why I hate range syntax.
-            for c_d in range(-2, 3):
-                if not found_move and self.is_valid(row + r_d, col + c_d) and not self.board[row + r_d][col + c_d]:
-                    found_move = True
+    def piece_has_move(self, row, col):
 
-        # Return whether we found a move or not.
-        return found_move
+        # Returns whether or not a given piece has a potential move.
+        clones, jumps = self.piece_moves(row, col)
+        return bool(clones or jumps)
 
     def color_has_move(self, color):
 
@@ -262,14 +366,9 @@ class Ataxx(SeatedGame):
            (color == YELLOW and self.seats[3].data.resigned)):
             return False
 
-        # Okay.  Scan the board for pieces...
-        for r in range(self.size):
-            for c in range(self.size):
-                if self.board[r][c] == color and self.piece_has_move(r, c):
-                    return True
-
-        # Found no moves.  This color has no valid moves.
-        return False
+        # A side can move if anywhere within two cells of its pieces is
+        # empty; growing its bitboard twice covers exactly those cells.
+        return bool(self.grow(self.grow(self.bitboards[color])) & self.get_empty())
 
     def loc_to_str(self, row, col):
         return "%s%s" % (COLS[col], row + 1)
@@ -323,31 +422,40 @@ class Ataxx(SeatedGame):
 
             # Split.  Add a new piece, increase the count.
             action_str = "^Mgrew^~ into"
-            self.board[dst_r][dst_c] = color
+            self.set_cell(dst_r, dst_c, color)
             seat.data.count += 1
         else:
 
             # Leap.  Move the piece, don't increase the count.
             action_str = "^Cjumped^~ to"
-            self.board[src_r][src_c] = None
-            self.board[dst_r][dst_c] = color
+            self.set_cell(src_r, src_c, None)
+            self.set_cell(dst_r, dst_c, color)
 
         # Whichever action occurred, check all cells surrounding the
         # destination.  If they are opponents, transform them.
         change_count = 0
         change_str = ""
-        for r_d in range(-1, 2):
-            for c_d in range(-1, 2):
-                if self.is_valid(dst_r + r_d, dst_c + c_d):
-                    occupier = self.board[dst_r + r_d][dst_c + c_d]
-                    if occupier and occupier != color and occupier != PIT:
-
-                        # Another player.  Uh oh!  Flip it and decrement that
-                        # player's count.
-                        self.board[dst_r + r_d][dst_c + c_d] = color
-                        seat.data.count += 1
-                        self.sides[occupier].data.count -= 1
-                        change_count += 1
+        neighbors = self.masks.clone[dst_r * self.size + dst_c]
+        for occupier in SIDES:
+            flipped = self.bitboards[occupier] & neighbors
+            if occupier == color or not flipped:
+                continue
+
+            # Another player.  Uh oh!  Flip them and decrement that player's
+            # count.
+            flip_count = popcount(flipped)
+            self.bitboards[occupier] &= ~flipped
+            self.bitboards[color] |= flipped
+            seat.data.count += flip_count
+            self.sides[occupier].data.count -= flip_count
+            change_count += flip_count
+
+            # The grid needs the same changes, cell by cell.
+            while flipped:
+                low_bit = flipped & -flipped
+                index = low_bit.bit_length() - 1
+                self.board[index / self.size][index % self.size] = color
+                flipped ^= low_bit
 
         if change_count:
             change_str = ", ^!converting %d piece" % change_count
@@ -390,14 +498,14 @@ class Ataxx(SeatedGame):
                 action_str = "^Cadded^~"
 
             # Tentative place the thing.
-            self.board[row][col] = new_thing
+            self.set_cell(row, col, new_thing)
 
             # Does it keep red or blue (which, in a 4p game, is equivalent to
             # all four players) from being able to make a move?  If so, it's
             # invalid.  Put the board back the way it was.
             if not self.color_has_move(RED) or not self.color_has_move(BLUE):
                 player.tell_cc(self.prefix + "Players must have a valid move.\n")
-                self.board[row][col] = thing_there
+                self.set_cell(row, col, thing_there)
                 return
 
             loc_list = [(row, col)]
@@ -408,17 +516,17 @@ class Ataxx(SeatedGame):
             # but not if that's the same location as the one we just placed
             # (on the center line on odd-sized boards).
             if (edge - row) != row:
-                self.board[edge - row][col] = new_thing
+                self.set_cell(edge - row, col, new_thing)
                 loc_list.append((edge - row, col))
 
                 # Handle the 4p down-reflection if necessary.
                 if self.player_mode == 4 and (edge - col) != col:
-                    self.board[edge - row][edge - col] = new_thing
+                    self.set_cell(edge - row, edge - col, new_thing)
                     loc_list.append((edge - row, edge - col))
 
             # Handle the 4p right-reflection if necessary.
             if self.player_mode == 4 and (edge - col) != col:
-                self.board[row][edge - col] = new_thing
+                self.set_cell(row, edge - col, new_thing)
                 loc_list.append((row, edge - col))
 
             # Generate the list of locations.
@@ -500,125 +608,76 @@ class Ataxx(SeatedGame):
             self.turn = RED
             self.send_board()
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.split()
-            primary = command_bits[0].lower()
-
-            if state == "setup":
-
-                if primary in ("size", "sz",):
-
-                    if len(command_bits) == 2:
-                        self.set_size(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid size command.\n")
-                    handled = True
-
-                elif primary in ("players", "player", "pl",):
-                    if len(command_bits) == 2:
-                        self.set_player_mode(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid player mode command.\n")
-                    handled = True
+    def handle_pits(self, player, pit_bits):
 
-                elif primary in ("pit", "hole",):
-                    loc_list = demangle_move(command_bits[1:])
-                    if loc_list:
-                        self.toggle_pits(player, loc_list)
-                    else:
-                        player.tell_cc(self.prefix + "Invalid pit command.\n")
-                    handled = True
-
-                elif primary in ("ready", "done", "r", "d",):
-                    self.channel.broadcast_cc(self.prefix + "The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
+        loc_list = demangle_move(pit_bits)
+        if loc_list:
+            self.toggle_pits(player, loc_list)
+        else:
+            player.tell_cc(self.prefix + "Invalid pit command.\n")
 
-            elif state == "need_players":
+    def handle_move(self, player, move_bits):
 
-                if primary in ("config", "setup", "conf",):
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 2:
+            if self.move(player, move_bits[0], move_bits[1]):
+                self.end_turn()
+        else:
+            player.tell_cc(self.prefix + "Invalid move command.\n")
 
-                    self.state.set("setup")
-                    self.channel.broadcast_cc(self.prefix + "^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
+    def handle_resign(self, player):
 
-            elif state == "playing":
+        self.resign(player)
+        self.end_turn()
 
-                made_move = False
+    def end_turn(self):
 
-                if primary in ("move", "play", "mv", "pl",):
+        # Did someone win?
+        winner = self.find_winner()
+        if winner:
+            self.resolve(winner)
+            self.finish()
 
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 2:
-                        made_move = self.move(player, move_bits[0], move_bits[1])
+        else:
+            # Okay, well, let's see whose turn it is.  If it comes
+            # back around to us, the game is over anyway.
+            curr_turn = self.turn
+            done = False
+            while not done:
+                if self.turn == RED:
+                    self.turn = BLUE
+                elif self.turn == BLUE:
+
+                    # The only tough one; switch depending on mode.
+                    if self.player_mode == 2:
+                        self.turn = RED
                     else:
-                        player.tell_cc(self.prefix + "Invalid move command.\n")
-                    handled = True
-
-                elif primary in ("resign",):
+                        self.turn = GREEN
+                elif self.turn == GREEN:
+                    self.turn = YELLOW
+                elif self.turn == YELLOW:
+                    self.turn = RED
 
-                    self.resign(player)
-                    made_move = True
-                    handled = True
+                # Now see if this player even has a move.
+                if self.color_has_move(self.turn):
+                    done = True
+                elif self.turn == curr_turn:
 
-                if made_move:
+                    # If we've wrapped back around to the current
+                    # turn, no one had a move.  Bail as well.
+                    done = True
 
-                    # Did someone win?
-                    winner = self.find_winner()
-                    if winner:
-                        self.resolve(winner)
-                        self.finish()
+            # Check to see if we're back at the mover.
+            if curr_turn == self.turn:
 
-                    else:
-                        # Okay, well, let's see whose turn it is.  If it comes
-                        # back around to us, the game is over anyway.
-                        curr_turn = self.turn
-                        done = False
-                        while not done:
-                            if self.turn == RED:
-                                self.turn = BLUE
-                            elif self.turn == BLUE:
-
-                                # The only tough one; switch depending on mode.
-                                if self.player_mode == 2:
-                                    self.turn = RED
-                                else:
-                                    self.turn = GREEN
-                            elif self.turn == GREEN:
-                                self.turn = YELLOW
-                            elif self.turn == YELLOW:
-                                self.turn = RED
-
-                            # Now see if this player even has a move.
-                            if self.color_has_move(self.turn):
-                                done = True
-                            elif self.turn == curr_turn:
-
-                                # If we've wrapped back around to the current
-                                # turn, no one had a move.  Bail as well.
-                                done = True
-
-                        # Check to see if we're back at the mover.
-                        if curr_turn == self.turn:
-
-                            # No one had a valid move.  Game's over.
-                            self.no_move_resolve()
-                            self.finish()
-
-                        else:
+                # No one had a valid move.  Game's over.
+                self.no_move_resolve()
+                self.finish()
 
-                            # Otherwise it's some other player's turn; game on.
-                            self.send_board()
+            else:
 
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+                # Otherwise it's some other player's turn; game on.
+                self.send_board()
 
     def find_winner(self):
 
@@ -657,16 +716,28 @@ class Ataxx(SeatedGame):
         else:
             self.channel.broadcast_cc(self.prefix + "These players ^Rtied^~ for first with ^Y%d^~ pieces: %s\n" % (", ".join(high_list)))
 
-    def show_help(self, player):
-
-        super(Ataxx, self).show_help(player)
-        player.tell_cc("\nATAXX SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("             ^!size^. <size>,  ^!sz^.     Set board to <size>.\n")
-        player.tell_cc("             ^!players^. 2|4,  ^!pl^.     Set number of players.\n")
-        player.tell_cc("                     ^!pit^. <ln>     Add or remove pit at <ln>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nATAXX PLAY:\n\n")
-        player.tell_cc("          ^!move^. <ln> <ln2>, ^!mv^.     Move from <ln> to <ln2> (letter number).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
-
+# Ataxx's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="ATAXX SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "handle_one_arg", TAKES_ARGS, "<size>",
+             "Set board to <size>.", "ATAXX SETUP PHASE", states=("setup",),
+             setter="set_size", what="size")
+COMMANDS.add(("players", "player", "pl"), "handle_one_arg", TAKES_ARGS,
+             "2|4", "Set number of players.", "ATAXX SETUP PHASE",
+             shown=("players", "pl"), states=("setup",),
+             setter="set_player_mode", what="player mode")
+COMMANDS.add(("pit", "hole"), "handle_pits", TAKES_ARGS, "<ln>",
+             "Add or remove pit at <ln>.", "ATAXX SETUP PHASE",
+             shown=("pit",), states=("setup",))
+COMMANDS.add(("ready", "done", "r", "d"), "finish_setup",
+             desc="End setup phase.", section="ATAXX SETUP PHASE",
+             states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS,
+             "<ln> <ln2>", "Move from <ln> to <ln2> (letter number).",
+             "ATAXX PLAY", shown=("move", "mv"), states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="ATAXX PLAY", states=("playing",))
+
+Ataxx.commands = COMMANDS
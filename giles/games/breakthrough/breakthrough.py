@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.piece import Piece
 from giles.games.seat import Seat
 from giles.games.square_grid_layout import SquareGridLayout, COLS
@@ -97,15 +98,17 @@ class Breakthrough(SeatedGame):
         self.black.data.piece_count = self.width * self.rows
         self.layout.update()
 
+    def get_public_view(self):
+
+        return [self.layout, self.get_turn_str() + "\n"]
+
     def show(self, player):
 
-        player.tell_cc(self.layout)
-        player.tell_cc(self.get_turn_str() + "\n")
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def get_turn_str(self):
 
@@ -278,83 +281,34 @@ class Breakthrough(SeatedGame):
         self.bc_pre("^R%s^~ is resigning from the game.\n" % player)
         return True
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("rows", "ro",):
-                    self.set_rows(player, command_bits[1:])
-                    handled = True
-
-                if primary in ("size", "sz",):
-
-                    self.set_size(player, command_bits[1:])
-                    handled = True
-
-                if primary in ("done", "ready", "d", "r",):
-
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
+    def handle_move(self, player, move_bits):
 
-                if primary in ("config", "setup", "conf",):
-
-                    self.state.set("setup")
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
-
-                if primary in ("move", "play", "mv", "pl",):
-
-                    invalid = False
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 2:
-                        made_move = self.move(player, move_bits[0], move_bits[1])
-                    else:
-                        invalid = True
-
-                    if invalid:
-                        self.tell_pre(player, "Invalid move command.\n")
-                    handled = True
-
-                elif primary in ("resign",):
-
-                    if self.resign(player):
-                        made_move = True
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 2:
+            if self.move(player, move_bits[0], move_bits[1]):
+                self.end_turn()
+        else:
+            self.tell_pre(player, "Invalid move command.\n")
 
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_turn()
 
-                    # Did someone win?
-                    winner = self.find_winner()
-                    if winner:
-                        self.resolve(winner)
-                        self.finish()
-                    else:
+    def end_turn(self):
 
-                        # Nope.  Switch turns...
-                        self.turn = self.next_seat(self.turn)
+        # Did someone win?
+        winner = self.find_winner()
+        if winner:
+            self.resolve(winner)
+            self.finish()
+        else:
 
-                        # ...show everyone the board, and keep on.
-                        self.send_board()
+            # Nope.  Switch turns...
+            self.turn = self.next_seat(self.turn)
 
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+            # ...show everyone the board, and keep on.
+            self.send_board()
 
     def find_winner(self):
 
@@ -379,14 +333,24 @@ class Breakthrough(SeatedGame):
         self.send_board()
         self.bc_pre("^C%s^~ wins!\n" % winner)
 
-    def show_help(self, player):
-
-        super(Breakthrough, self).show_help(player)
-        player.tell_cc("\nBREAKTHROUGH SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("    ^!rows^. <count>, ^!ro^.     Set piece row count to <count>.\n")
-        player.tell_cc("    ^!size^. <size> | <w> <h>, ^!sz^.     Set board to <size>x<size>/<w>x<h>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nBREAKTHROUGH PLAY:\n\n")
-        player.tell_cc("          ^!move^. <ln> <ln2>, ^!mv^.     Move from <ln> to <ln2> (letter number).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Breakthrough's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="BREAKTHROUGH SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("rows", "ro"), "set_rows", TAKES_ARGS, "<count>",
+             "Set piece row count to <count>.", "BREAKTHROUGH SETUP PHASE",
+             states=("setup",))
+COMMANDS.add(("size", "sz"), "set_size", TAKES_ARGS, "<size> | <w> <h>",
+             "Set board to <size>x<size>/<w>x<h>.",
+             "BREAKTHROUGH SETUP PHASE", states=("setup",))
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="BREAKTHROUGH SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS,
+             "<ln> <ln2>", "Move from <ln> to <ln2> (letter number).",
+             "BREAKTHROUGH PLAY", shown=("move", "mv"), states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="BREAKTHROUGH PLAY", states=("playing",))
+
+Breakthrough.commands = COMMANDS
@@ -17,8 +17,10 @@
 # TODO: Reimplement the skew for even boards as a shift by one half-cell
 # to reduce the racing element.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
+from giles.games.printable_board import PrintableBoard
 from giles.state import State
 from giles.utils import booleanize
 from giles.utils import demangle_move
@@ -101,16 +103,37 @@ class Crossway(SeatedGame):
 
     def update_printable_board(self):
 
-        self.printable_board = []
-        if self.is_skewed:
-            half_edge_str = "".join("==") * (self.size / 2)
-        col_str = "    " + "".join([" " + COLS[i] for i in range(self.size)])
-        self.printable_board.append(col_str + "\n")
-        if self.is_skewed:
-            self.printable_board.append("   ^W." + half_edge_str + "=^R=^K" + half_edge_str + ".^~\n")
-        else:
-            self.printable_board.append("   ^m.=" + "".join(["=="] * self.size) + ".^~\n")
+        # Only rows whose contents (or last-move highlight) have changed
+        # since the last render are rebuilt; see PrintableBoard.
+        if not self.printable_board:
+            self.printable_board = PrintableBoard()
+        board = self.printable_board
+        board.resize(self.size + 4)
+
+        frame_key = (self.size, self.is_skewed)
+        if board.is_stale(0, frame_key):
+            col_str = "    " + "".join([" " + COLS[i] for i in range(self.size)]) + "\n"
+            if self.is_skewed:
+                half_edge_str = "".join("==") * (self.size / 2)
+                top_str = "   ^W." + half_edge_str + "=^R=^K" + half_edge_str + ".^~\n"
+                bottom_str = "   ^K." + half_edge_str + "=^R=^W" + half_edge_str + ".^~\n"
+            else:
+                top_str = "   ^m.=" + "".join(["=="] * self.size) + ".^~\n"
+                bottom_str = "   ^m`=" + "".join(["=="] * self.size) + "'^~\n"
+            board.set_line(0, col_str, frame_key)
+            board.set_line(1, top_str, frame_key)
+            board.set_line(self.size + 2, bottom_str, frame_key)
+            board.set_line(self.size + 3, col_str, frame_key)
+
         for r in range(self.size):
+            if r == self.last_r:
+                highlight = self.last_c
+            else:
+                highlight = None
+            row_key = (tuple(self.board[r]), highlight, self.is_skewed)
+            if not board.is_stale(r + 2, row_key):
+                continue
+
             if self.is_skewed:
                 if r < (self.size / 2):
                     left_edge_color = "^W"
@@ -122,37 +145,34 @@ class Crossway(SeatedGame):
                     right_edge_color = "^W"
             else:
                 left_edge_color = right_edge_color = "^m"
-            this_str = "%2d %s|^~ " % (r + 1, left_edge_color)
-            for c in range(self.size):
-                if r == self.last_r and c == self.last_c:
-                    this_str += "^5"
-                loc = self.board[r][c]
+            bits = ["%2d %s|^~ " % (r + 1, left_edge_color)]
+            for c, loc in enumerate(self.board[r]):
+                if c == highlight:
+                    bits.append("^5")
                 if loc == WHITE:
-                    this_str += "^Wo^~ "
+                    bits.append("^Wo^~ ")
                 elif loc == BLACK:
-                    this_str += "^Kx^~ "
+                    bits.append("^Kx^~ ")
                 else:
-                    this_str += "^M.^~ "
-            this_str += "%s|^~ %d" % (right_edge_color, r + 1)
-            self.printable_board.append(this_str + "\n")
-        if self.is_skewed:
-            self.printable_board.append("   ^K." + half_edge_str + "=^R=^W" + half_edge_str + ".^~\n")
-        else:
-            self.printable_board.append("   ^m`=" + "".join(["=="] * self.size) + "'^~\n")
-        self.printable_board.append(col_str + "\n")
+                    bits.append("^M.^~ ")
+            bits.append("%s|^~ %d\n" % (right_edge_color, r + 1))
+            board.set_line(r + 2, "".join(bits), row_key)
 
-    def show(self, player):
+        board.update()
+
+    def get_public_view(self):
 
         if not self.printable_board:
             self.update_printable_board()
-        for line in self.printable_board:
-            player.tell_cc(line)
-        player.tell_cc(self.get_turn_str() + "\n")
+        return [self.printable_board, self.get_turn_str() + "\n"]
+
+    def show(self, player):
+
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def get_turn_str(self):
 
@@ -333,105 +353,48 @@ class Crossway(SeatedGame):
         self.channel.broadcast_cc("^Y%s^~ has swapped ^KBlack^~'s first move.\n" % (player))
         self.turn_number += 1
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.lower().split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("size", "sz",):
-
-                    if len(command_bits) == 2:
-                        self.set_size(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid size command.\n")
-                    handled = True
+    def handle_move(self, player, move_bits):
 
-                elif primary in ("skew", "sk",):
-
-                    if len(command_bits) == 2:
-                        self.set_skew(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid skew command.\n")
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
-
-                    self.channel.broadcast_cc(self.prefix + "The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
-
-                    self.state.set("setup")
-                    self.channel.broadcast_cc(self.prefix + "^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
-
-                if primary in ("move", "play", "mv", "pl",):
-
-                    invalid = False
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.move(player, move_bits[0])
-                    else:
-                        invalid = True
-
-                    if invalid:
-                        player.tell_cc(self.prefix + "Invalid move command.\n")
-                    handled = True
-
-                elif primary in ("swap",):
-
-                    if self.seats[1].player == player and self.turn_number == 2:
-                        self.swap(player)
-                        made_move = True
-                    else:
-                        player.tell_cc(self.prefix + "Invalid swap command.\n")
-                    handled = True
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.move(player, move_bits[0]):
+                self.end_turn()
+        else:
+            player.tell_cc(self.prefix + "Invalid move command.\n")
 
-                elif primary in ("resign",):
+    def handle_swap(self, player):
 
-                    if self.resign(player):
-                        made_move = True
+        if self.seats[1].player == player and self.turn_number == 2:
+            self.swap(player)
+            self.end_turn()
+        else:
+            player.tell_cc(self.prefix + "Invalid swap command.\n")
 
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_turn()
 
-                    # Okay, something happened on the board.  Update.
-                    self.update_printable_board()
+    def end_turn(self):
 
-                    # Did someone win?
-                    winner = self.find_winner()
-                    if winner:
-                        self.resolve(winner)
-                        self.finish()
-                    else:
+        # Okay, something happened on the board.  Update.
+        self.update_printable_board()
 
-                        # Nope.  Switch turns...
-                        if self.turn == BLACK:
-                            self.turn = WHITE
-                        else:
-                            self.turn = BLACK
+        # Did someone win?
+        winner = self.find_winner()
+        if winner:
+            self.resolve(winner)
+            self.finish()
+        else:
 
-                        # ...show everyone the board, and keep on.
-                        self.send_board()
+            # Nope.  Switch turns...
+            if self.turn == BLACK:
+                self.turn = WHITE
+            else:
+                self.turn = BLACK
 
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+            # ...show everyone the board, and keep on.
+            self.send_board()
 
     def find_winner(self):
 
@@ -525,15 +488,27 @@ class Crossway(SeatedGame):
         self.send_board()
         self.channel.broadcast_cc(self.prefix + "^C%s^~ wins!\n" % winner)
 
-    def show_help(self, player):
-
-        super(Crossway, self).show_help(player)
-        player.tell_cc("\nCROSSWAY SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("             ^!size^. <size>,  ^!sz^.     Set board to <size>.\n")
-        player.tell_cc("             ^!skew^. on|off,  ^!sk^.     Enable skewed goals.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nCROSSWAY PLAY:\n\n")
-        player.tell_cc("      ^!move^. <ln>, ^!play^., ^!mv^., ^!pl^.     Make move <ln> (letter number).\n")
-        player.tell_cc("                         ^!swap^.     Swap the first move (only White, only their first).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Crossway's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="CROSSWAY SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "handle_one_arg", TAKES_ARGS, "<size>",
+             "Set board to <size>.", "CROSSWAY SETUP PHASE",
+             states=("setup",), setter="set_size", what="size")
+COMMANDS.add(("skew", "sk"), "handle_one_arg", TAKES_ARGS, "on|off",
+             "Enable skewed goals.", "CROSSWAY SETUP PHASE",
+             states=("setup",), setter="set_skew", what="skew")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="CROSSWAY SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Make move <ln> (letter number).", "CROSSWAY PLAY",
+             states=("playing",))
+COMMANDS.add(("swap",), "handle_swap",
+             desc="Swap the first move (only White, only their first).",
+             section="CROSSWAY PLAY", states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="CROSSWAY PLAY", states=("playing",))
+
+Crossway.commands = COMMANDS
@@ -0,0 +1,76 @@
+# Giles: deck.py
+# Copyright 2012 Phil Bordelon
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+
+class Deck(object):
+    """A deck of cards to deal from.
+
+    The cards are kept in a single list that is shuffled in place but never
+    sliced or popped; a cursor marks the next card to be dealt, so draw() is
+    O(1) no matter how big the deck is.  The deck holds references to the
+    cards it was given rather than copies, so games can build their decks
+    out of shared card objects and reset() the deck to deal them again.
+
+    Methods of note: draw(), show(), add(), shuffle(), and reset().
+    """
+
+    def __init__(self, cards=None):
+        self.cards = []
+        if cards:
+            self.cards.extend(cards)
+        self.cursor = 0     # Index of the next card to be dealt.
+
+    def __len__(self):
+        return len(self.cards) - self.cursor
+
+    def __iter__(self):
+        for i in xrange(self.cursor, len(self.cards)):
+            yield self.cards[i]
+
+    def draw(self):
+        """Deal the next card from the deck, or None if it's empty."""
+        if self.cursor >= len(self.cards):
+            return None
+        card = self.cards[self.cursor]
+        self.cursor += 1
+        return card
+
+    def show(self):
+        """Returns the next card to be dealt, or None if empty.  The deck is
+        unchanged."""
+        if self.cursor >= len(self.cards):
+            return None
+        return self.cards[self.cursor]
+
+    def add(self, c):
+        """Add the provided card to the bottom of the deck.  As with Hand,
+        refuses anything that evaluates to False."""
+        if c:
+            self.cards.append(c)
+            return True
+        return False
+
+    def shuffle(self):
+        """Shuffle the cards that have yet to be dealt."""
+        cards = self.cards
+        for i in xrange(len(cards) - 1, self.cursor, -1):
+            j = random.randint(self.cursor, i)
+            cards[i], cards[j] = cards[j], cards[i]
+
+    def reset(self):
+        """Put every card back in the deck, in the order they were dealt."""
+        self.cursor = 0
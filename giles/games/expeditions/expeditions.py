@@ -14,13 +14,15 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.games.deck import Deck
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.hand import Hand
 from giles.games.seat import Seat
 from giles.state import State
 from giles.utils import Struct, get_plural_str
 
-from giles.games.expeditions.expeditions_card import ExpeditionsCard
+from giles.games.expeditions.expeditions_card import get_card
 from giles.games.expeditions.expeditions_card import card_to_str, get_color_code, hand_to_str, value_to_str, sorted_hand, str_to_card, str_to_suit
 from giles.games.expeditions.expeditions_card import DEFAULT_SUITS, YELLOW, BLUE, WHITE, GREEN, RED, CYAN, MAGENTA
 from giles.games.expeditions.expeditions_card import AGREEMENT, SHORT, LONG
@@ -144,14 +146,14 @@ class Expeditions(SeatedGame):
 
         # We'll do a separate loop for generating the deck to minimize
         # confusion.
-        self.draw_pile = Hand()
+        self.draw_pile = Deck()
         for suit in suit_list:
             for rank in NUMERICAL_RANKS:
-                self.draw_pile.add(ExpeditionsCard(rank, suit))
+                self.draw_pile.add(get_card(rank, suit))
 
             # Add as many agreements as requested.
             for agreement in range(self.agreement_count):
-                self.draw_pile.add(ExpeditionsCard(AGREEMENT, suit))
+                self.draw_pile.add(get_card(AGREEMENT, suit))
 
         # Lastly, shuffle the draw deck and initialize hands.
         self.draw_pile.shuffle()
@@ -224,44 +226,54 @@ class Expeditions(SeatedGame):
 
         return to_return
 
-    def show(self, player, show_metadata=True):
+    def get_public_view(self, show_metadata=True):
 
         if not self.printable_layout:
             self.update_printable_layout()
-        player.tell_cc("%s         %s\n" % (self.get_sp_str(self.left).rjust(21), self.get_sp_str(self.right)))
-        for line in self.printable_layout:
-            player.tell_cc(line)
+        view = ["%s         %s\n" % (self.get_sp_str(self.left).rjust(21), self.get_sp_str(self.right)),
+                "".join(self.printable_layout)]
         if show_metadata:
-            player.tell_cc("\n" + self.get_metadata_str())
+            view.append("\n" + self.get_metadata_str())
+        return view
 
-    def show_hand(self, player):
+    def show(self, player, show_metadata=True):
+
+        self.send_view(player, self.get_public_view(show_metadata))
+
+    def get_private_view(self, player):
 
         seat = self.get_seat_of_player(player)
 
         if not seat:
-            self.tell_pre(player, "You're not playing!\n")
-            return
+            return None
 
         print_str = "Your current hand:\n   "
         print_str += hand_to_str(seat.data.hand)
         print_str += "\n"
-        self.tell_pre(player, print_str)
+        return self.prefix + print_str
+
+    def show_hand(self, player):
+
+        private = self.get_private_view(player)
+
+        if not private:
+            self.tell_pre(player, "You're not playing!\n")
+            return
+
+        player.tell_cc(private)
 
     def send_layout(self, show_metadata=True):
 
-        for player in self.channel.listeners:
-            self.show(player, show_metadata)
-        for seat in self.seats:
-            if seat.player:
-                self.show_hand(seat.player)
+        # Everyone sees the same table, and the players their own hands.
+        self.broadcast_view(self.get_public_view(show_metadata))
 
     def deal(self):
 
         # Deal cards until each player has hand_size cards.
         self.bc_pre("A fresh hand is dealt to both players.\n")
         for i in range(self.hand_size):
-            self.left.data.hand.add(self.draw_pile.discard())
-            self.right.data.hand.add(self.draw_pile.discard())
+            self.left.data.hand.add(self.draw_pile.draw())
+            self.right.data.hand.add(self.draw_pile.draw())
 
         # Sort hands.
         self.left.data.hand = sorted_hand(self.left.data.hand)
@@ -553,7 +565,7 @@ class Expeditions(SeatedGame):
             return False
 
         # Draw a card.  This one's easy!
-        draw_card = self.draw_pile.discard()
+        draw_card = self.draw_pile.draw()
         seat.data.hand.add(draw_card)
 
         # Resort the hand.
@@ -626,177 +638,96 @@ class Expeditions(SeatedGame):
         self.bc_pre("%s is resigning from the game.\n" % self.get_sp_str(seat))
         return True
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.lower().split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("suits",):
-
-                    if len(command_bits) == 2:
-                        self.set_suits(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid suits command.\n")
-                    handled = True
-
-                elif primary in ("agreements", "agree",):
-
-                    if len(command_bits) == 2:
-                        self.set_agreements(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid agree command.\n")
-                    handled = True
-
-                elif primary in ("hand",):
-
-                    if len(command_bits) == 2:
-                        self.set_hand(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid hand command.\n")
-                    handled = True
+    def handle_bonus(self, player, bonus_bits):
 
-                elif primary in ("penalty",):
-
-                    if len(command_bits) == 2:
-                        self.set_penalty(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid penalty command.\n")
-                    handled = True
-
-                elif primary in ("bonus",):
-
-                    if len(command_bits) >= 2:
-                        self.set_bonus(player, command_bits[1:])
-                    else:
-                        self.tell_pre(player, "Invalid bonus command.\n")
-                    handled = True
-
-                elif primary in ("goal", "score",):
-
-                    if len(command_bits) == 2:
-                        self.set_goal(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid goal command.\n")
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
-
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
-
-                    self.state.set("setup")
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
+        if bonus_bits:
+            self.set_bonus(player, bonus_bits)
+        else:
+            self.tell_pre(player, "Invalid bonus command.\n")
 
-                if primary in ("hand", "inventory", "inv", "i",):
-                    self.show_hand(player)
-                    handled = True
+    def handle_play(self, player, play_bits):
 
-                elif primary in ("evaluate", "eval", "score", "e", "s",):
-                    self.evaluate(player)
-                    handled = True
+        if len(play_bits) == 1:
+            if self.play(player, play_bits[0]):
+                self.end_move()
+        else:
+            self.tell_pre(player, "Invalid play command.\n")
 
-                elif primary in ("move", "play", "mv", "pl",):
+    def handle_discard(self, player, discard_bits):
 
-                    if len(command_bits) == 2:
-                        made_move = self.play(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid play command.\n")
-                    handled = True
+        if len(discard_bits) == 1:
+            if self.discard(player, discard_bits[0]):
+                self.end_move()
+        else:
+            self.tell_pre(player, "Invalid discard command.\n")
 
-                elif primary in ("discard", "toss", "dc", "di", "to",):
-                    if len(command_bits) == 2:
-                        made_move = self.discard(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid discard command.\n")
-                    handled = True
+    def handle_draw(self, player):
 
-                elif primary in ("draw", "dr",):
-                    made_move = self.draw(player)
-                    handled = True
+        if self.draw(player):
+            self.end_move()
 
-                elif primary in ("retrieve", "re",):
-                    if len(command_bits) == 2:
-                        made_move = self.retrieve(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid retrieve command.\n")
-                    handled = True
+    def handle_retrieve(self, player, retrieve_bits):
 
-                elif primary in ("resign",):
+        if len(retrieve_bits) == 1:
+            if self.retrieve(player, retrieve_bits[0]):
+                self.end_move()
+        else:
+            self.tell_pre(player, "Invalid retrieve command.\n")
 
-                    if self.resign(player):
-                        made_move = True
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_move()
 
-                    substate = self.state.get_sub()
+    def end_move(self):
 
-                    # Okay, something happened on the layout.  Update scores
-                    # and the layout.
-                    self.update_scores()
-                    self.update_printable_layout()
+        substate = self.state.get_sub()
 
-                    # Is the game over?
-                    if not len(self.draw_pile) or self.resigner:
+        # Okay, something happened on the layout.  Update scores
+        # and the layout.
+        self.update_scores()
+        self.update_printable_layout()
 
-                        # Yup.  Resolve the game.
-                        self.resolve_hand()
+        # Is the game over?
+        if not len(self.draw_pile) or self.resigner:
 
-                        # Is there an overall winner?
-                        winner = self.find_winner()
+            # Yup.  Resolve the game.
+            self.resolve_hand()
 
-                        if winner:
-                            self.resolve(winner)
-                            self.finish()
+            # Is there an overall winner?
+            winner = self.find_winner()
 
-                        else:
+            if winner:
+                self.resolve(winner)
+                self.finish()
 
-                            # Hand over, but not the game itself.  New deal.
-                            self.bc_pre("The cards are collected for another hand.\n")
-                            self.init_hand()
+            else:
 
-                            # Switch dealers.
-                            self.first_player = self.next_seat(self.first_player)
-                            self.turn = self.first_player
-                            self.state.set("playing")
-                            self.state.set_sub("play")
-                            self.deal()
-                            self.update_printable_layout()
-                            self.send_layout()
+                # Hand over, but not the game itself.  New deal.
+                self.bc_pre("The cards are collected for another hand.\n")
+                self.init_hand()
 
-                    else:
+                # Switch dealers.
+                self.first_player = self.next_seat(self.first_player)
+                self.turn = self.first_player
+                self.state.set("playing")
+                self.state.set_sub("play")
+                self.deal()
+                self.update_printable_layout()
+                self.send_layout()
 
-                        # If we're in the play substate, switch to the draw.
-                        if substate == "play":
-                            self.state.set_sub("draw")
+        else:
 
-                        else:
+            # If we're in the play substate, switch to the draw.
+            if substate == "play":
+                self.state.set_sub("draw")
 
-                            # After draw, switch turns and resend the board.
-                            self.state.set_sub("play")
-                            self.turn = self.next_seat(self.turn)
-                            self.send_layout(show_metadata=False)
+            else:
 
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+                # After draw, switch turns and resend the board.
+                self.state.set_sub("play")
+                self.turn = self.next_seat(self.turn)
+                self.send_layout(show_metadata=False)
 
     def update_scores(self):
 
@@ -893,23 +824,53 @@ class Expeditions(SeatedGame):
     def resolve(self, winner):
         self.bc_pre("%s wins!\n" % self.get_sp_str(winner))
 
-    def show_help(self, player):
-
-        super(Expeditions, self).show_help(player)
-        player.tell_cc("\nEXPEDITIONS SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("                  ^!suits^. <num>     Play with <num> suits.\n")
-        player.tell_cc("                  ^!agree^. <num>     Suits have <num> agreements.\n")
-        player.tell_cc("                   ^!hand^. <num>     Hands have <num> cards.\n")
-        player.tell_cc("                ^!penalty^. <num>     Expeditions start down <num> points.\n")
-        player.tell_cc("     ^!bonus^. <pts> <len> | none     Bonus is <pts> at length <len>/none.\n")
-        player.tell_cc("            ^!goal^. <num>, ^!score^.     Play until <num> points.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nEXPEDITIONS PLAY:\n\n")
-        player.tell_cc("              ^!play^. <card>, ^!pl^.     Play <card> from your hand.\n")
-        player.tell_cc("         ^!discard^. <card>, ^!toss^.     Discard <card> from your hand.\n")
-        player.tell_cc("                     ^!draw^., ^!dr^.     Draw from the draw pile.\n")
-        player.tell_cc("          ^!retrieve^. <suit>, ^!re^.     Retrieve top discard of <suit>.\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
-        player.tell_cc("                 ^!hand^., ^!inv^., ^!i^.     Look at the cards in your hand.\n")
-        player.tell_cc("               ^!evaluate^., ^!eval^.     Evaluate the current scores.\n")
+# Expeditions' own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="EXPEDITIONS SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("suits",), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Play with <num> suits.", "EXPEDITIONS SETUP PHASE",
+             states=("setup",), setter="set_suits", what="suits")
+COMMANDS.add(("agreements", "agree"), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Suits have <num> agreements.", "EXPEDITIONS SETUP PHASE",
+             shown=("agree",), states=("setup",), setter="set_agreements",
+             what="agree")
+COMMANDS.add(("hand",), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Hands have <num> cards.", "EXPEDITIONS SETUP PHASE",
+             states=("setup",), setter="set_hand", what="hand")
+COMMANDS.add(("penalty",), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Expeditions start down <num> points.",
+             "EXPEDITIONS SETUP PHASE", states=("setup",),
+             setter="set_penalty", what="penalty")
+COMMANDS.add(("bonus",), "handle_bonus", TAKES_ARGS, "<pts> <len> | none",
+             "Bonus is <pts> at length <len>/none.",
+             "EXPEDITIONS SETUP PHASE", states=("setup",))
+COMMANDS.add(("goal", "score"), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Play until <num> points.", "EXPEDITIONS SETUP PHASE",
+             states=("setup",), setter="set_goal", what="goal")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="EXPEDITIONS SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("play", "move", "pl", "mv"), "handle_play", TAKES_ARGS,
+             "<card>", "Play <card> from your hand.", "EXPEDITIONS PLAY",
+             shown=("play", "pl"), states=("playing",))
+COMMANDS.add(("discard", "toss", "dc", "di", "to"), "handle_discard",
+             TAKES_ARGS, "<card>", "Discard <card> from your hand.",
+             "EXPEDITIONS PLAY", shown=("discard", "toss"),
+             states=("playing",))
+COMMANDS.add(("draw", "dr"), "handle_draw", desc="Draw from the draw pile.",
+             section="EXPEDITIONS PLAY", states=("playing",))
+COMMANDS.add(("retrieve", "re"), "handle_retrieve", TAKES_ARGS, "<suit>",
+             "Retrieve top discard of <suit>.", "EXPEDITIONS PLAY",
+             states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="EXPEDITIONS PLAY", states=("playing",))
+COMMANDS.add(("hand", "inventory", "inv", "i"), "show_hand",
+             desc="Look at the cards in your hand.", section="EXPEDITIONS PLAY",
+             shown=("hand", "inv", "i"), states=("playing",))
+COMMANDS.add(("evaluate", "eval", "score", "e", "s"), "evaluate",
+             desc="Evaluate the current scores.", section="EXPEDITIONS PLAY",
+             shown=("evaluate", "eval"), states=("playing",))
+
+Expeditions.commands = COMMANDS
@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.hand import Hand
+from giles.games.deck import Deck
 from giles.games.playing_card import PlayingCard
 
 # trick.py's implementation of sorted_hand() is perfectly servicable for
@@ -52,30 +52,47 @@ class ExpeditionsCard(PlayingCard):
     creation.
     """
 
-    def __init__(self, r=None, s=None):
+    __slots__ = ()
 
-        super(ExpeditionsCard, self).__init__(r, s)
+    SUIT_ORDER = [YELLOW, BLUE, WHITE, GREEN, RED, CYAN, MAGENTA]
 
-    def __repr__(self):
-        if self.rank == AGREEMENT:
-            return ("a %s Agreement" % (self.suit))
-        else:
-            return ("a %s %s" % (self.suit, self.rank))
+    def __new__(cls, r=None, s=None):
+
+        return super(ExpeditionsCard, cls).__new__(cls, r, s)
+
+    def __reduce__(self):
+        return (self.__class__, (self.rank, self.suit))
 
-    def value(self):
+    def rank_value(self):
         r = self.rank
         if r == AGREEMENT:
             return 1
-        if type(r) == int:
-            return r
-        if r.isdigit():
+        if r and r.isdigit():
             return int(r)
 
+    def make_short_str(self):
+        if not self.suit:
+            return "  "
+        return "%s%s" % (self.suit[0].upper(), value_to_str(self.ordinal))
+
+    def make_long_str(self):
+        if self.rank == AGREEMENT:
+            return ("a %s Agreement" % (self.suit))
+        else:
+            return ("a %s %s" % (self.suit, self.rank))
+
 SUIT_SHORTHANDS = ['y', 'b', 'w', 'g', 'r', 'c', 'm', 'p']
 AGREEMENT_SHORTHANDS = ['a', 'h', 'i', '1']
 
+def get_card(r, s):
+
+    # Returns the (shared) card of a given rank and suit.  As with playing
+    # cards, every deck deals from the same card objects, and the three
+    # Agreements of a suit are all the same object, too.
+    return ExpeditionsCard(r, s)
+
 def new_standard_deck():
-    deck = Hand()
+    deck = Deck()
 
     # Add two more agreements to the list of ranks for a total of 3.
     ranks = [AGREEMENT, AGREEMENT]
@@ -83,7 +100,7 @@ def new_standard_deck():
 
     for r in ranks:
         for s in DEFAULT_SUITS:
-            deck.add(ExpeditionsCard(r, s))
+            deck.add(get_card(r, s))
     return deck
 
 def str_to_card(card_str):
@@ -100,6 +117,15 @@ def str_to_card(card_str):
     if not card_str or type(card_str) != str or len(card_str) < 2:
         return None
 
+    # The usual spellings of every card are in CARD_STRS; only anything
+    # unusual needs parsing.
+    card = CARD_STRS.get(card_str.lower())
+    if card:
+        return card
+    return parse_card_str(card_str)
+
+def parse_card_str(card_str):
+
     # Unlike with playing cards, we really do need to use a simple state machine
     # here, as either the rank or the suit can come first.
     card_str = card_str.lower()
@@ -248,19 +274,17 @@ def card_to_str(card, mode=SHORT, colored=True):
 
         if not card:
             return "  "
-        short_suit = card.suit[0].upper()
-        short_rank = value_to_str(card.value())
 
         if colored:
-            return "%s%s%s^~" % (color_code, short_suit, short_rank)
+            return "%s%s^~" % (color_code, card.short_str)
         else:
-            return "%s%s" % (short_suit, short_rank)
+            return card.short_str
 
     elif mode == LONG:
         if colored:
-            return "%s%s^~" % (color_code, repr(card))
+            return "%s%s^~" % (color_code, card.long_str)
         else:
-            return repr(card)
+            return card.long_str
 
 def hand_to_str(hand, colored=True, is_sorted=True):
 
@@ -290,3 +314,24 @@ def value_to_str(value):
         return "a"
     else:
         return "?"
+
+
+def build_card_strs():
+
+    # Every spelling of every card that str_to_card() is likely to see, in
+    # lowercase, rank first or suit first.
+    rank_strs = {"t": "10", "10": "10"}
+    for agreement_str in AGREEMENT_SHORTHANDS:
+        rank_strs[agreement_str] = AGREEMENT
+    for rank in range(2, 10):
+        rank_strs[str(rank)] = str(rank)
+
+    card_strs = {}
+    for rank_str in rank_strs:
+        for suit_str in SUIT_SHORTHANDS:
+            card = ExpeditionsCard(rank_strs[rank_str], str_to_suit(suit_str))
+            card_strs[rank_str + suit_str] = card
+            card_strs[suit_str + rank_str] = card
+    return card_strs
+
+CARD_STRS = build_card_strs()
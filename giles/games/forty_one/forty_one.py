@@ -15,7 +15,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from giles.games.four_player_card_game_layout import FourPlayerCardGameLayout, NORTH, SOUTH, EAST, WEST
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.hand import Hand
 from giles.games.playing_card import new_deck, str_to_card, card_to_str, hand_to_str, LONG, HEARTS
 from giles.games.seat import Seat
@@ -101,27 +102,6 @@ class FortyOne(SeatedGame):
         for seat in self.seats:
             seat.data.score = 0
 
-    def show_help(self, player):
-
-        super(FortyOne, self).show_help(player)
-        player.tell_cc("\nFORTY-ONE SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("            ^!decay^. on|off, ^!dec^.     Enable bid decay on toss-ins.\n")
-        player.tell_cc("            ^!goal^. <num>, ^!score^.     Set the goal score to <num>.\n")
-        player.tell_cc("           ^!double^. <num>, ^!doub^.     Set the lowest doubling to <num>.\n")
-        player.tell_cc("           ^!minimum^. <num>, ^!min^.     Set the minimum deal bid to <num>.\n")
-        player.tell_cc("         ^!positive^. on|off, ^!pos^.     Require positive partners for wins.\n")
-        player.tell_cc("             ^!whist^. on|off, ^!wh^.     Enable whist mode for trumps.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nFORTY-ONE PLAY:\n\n")
-        player.tell_cc("                 ^!bid^. <num>, ^!b^.     Bid to win <num> tricks.\n")
-        player.tell_cc("              ^!play^. <card>, ^!pl^.     Play <card> from your hand.\n")
-        player.tell_cc("                 ^!hand^., ^!inv^., ^!i^.     Look at the cards in your hand.\n")
-
-    def display(self, player):
-
-        player.tell_cc("%s" % self.layout)
-
     def get_color_code(self, seat):
         if seat == self.north or seat == self.south:
             return "^R"
@@ -188,9 +168,11 @@ class FortyOne(SeatedGame):
 
         return to_return
 
+    def get_public_view(self):
+        return [self.layout, self.get_metadata()]
+
     def show(self, player):
-        self.display(player)
-        player.tell_cc(self.get_metadata())
+        self.send_view(player)
 
     def set_goal(self, player, goal_str):
 
@@ -322,7 +304,7 @@ class FortyOne(SeatedGame):
             seat.data.hand = Hand()
         for _ in range(13):
             for seat in self.seats:
-                seat.data.hand.add(deck.discard())
+                seat.data.hand.add(deck.draw())
 
         # If we're in whist mode, flip the dealer's last card to determine
         # trumps.
@@ -335,29 +317,37 @@ class FortyOne(SeatedGame):
             # Hearts forever.
             self.trump_suit = HEARTS
 
-        # Sort everyone's hands and show them to everyone.
+        # Sort everyone's hands.  The callers show them once the first
+        # bidder is set, so that the table they go out with is current.
         for seat in self.seats:
             seat.data.hand = sorted_hand(seat.data.hand, self.trump_suit)
-        self.show_hands()
 
-    def show_hand(self, player):
+    def get_private_view(self, player):
 
         seat = self.get_seat_of_player(player)
 
         if not seat:
-            self.tell_pre(player, "You're not playing!\n")
-            return
+            return None
 
         print_str = "Your current hand:\n   "
         print_str += hand_to_str(seat.data.hand, self.trump_suit)
         print_str += "\n"
-        self.tell_pre(player, print_str)
+        return self.prefix + print_str
+
+    def show_hand(self, player):
+
+        private = self.get_private_view(player)
+
+        if not private:
+            self.tell_pre(player, "You're not playing!\n")
+            return
+
+        player.tell_cc(private)
 
     def show_hands(self):
 
-        for seat in self.seats:
-            if seat.player:
-                self.show_hand(seat.player)
+        # Show everyone the fresh table, and the players their new hands.
+        self.broadcast_view()
 
     def bid(self, player, bid_str):
 
@@ -460,211 +450,131 @@ class FortyOne(SeatedGame):
             # Eldest opens bidding, per usual.
             self.turn = self.next_seat(self.dealer)
             self.layout.change_turn(self.turn.data.who)
+            self.show_hands()
             if self.turn.player:
                 self.tell_pre(self.turn.player, "It is your turn to bid.\n")
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-
-            command_bits = command_str.split()
-            primary = command_bits[0].lower()
-
-            if state == "setup":
-
-                if primary in ("goal", "score", "sc", "g",):
-                    if len(command_bits) == 2:
-                        self.set_goal(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid goal command.\n")
-                    handled = True
-
-                elif primary in ("positive", "pos", "po", "p",):
-                    if len(command_bits) == 2:
-                        self.set_positive(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid positive command.\n")
-                    handled = True
-
-                elif primary in ("decay", "dec",):
-                    if len(command_bits) == 2:
-                        self.set_decay(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid decay command.\n")
-                    handled = True
-
-                elif primary in ("double", "doub",):
-                    if len(command_bits) == 2:
-                        self.set_double(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid double command.\n")
-                    handled = True
-
-                elif primary in ("minimum", "min",):
-                    if len(command_bits) == 2:
-                        self.set_minimum(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid minimum command.\n")
-                    handled = True
-
-                elif primary in ("whist", "wh",):
-                    if len(command_bits) == 2:
-                        self.set_whist(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid whist command.\n")
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
-                    self.state.set("setup")
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "bidding":
-
-                bid_made = False
-
-                if primary in ("hand", "inventory", "inv", "i",):
-                    self.show_hand(player)
-                    handled = True
-
-                elif primary in ("bid", "b",):
-                    if len(command_bits) == 2:
-                        bid_made = self.bid(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid bid command.\n")
-                    handled = True
-
-                if bid_made:
-
-                    bid_list = [x for x in self.seats if x.data.bid]
-                    if len(bid_list) == 4:
-
-                        # Bidding is complete.  Are enough tricks bid?
-                        bid_total = 0
-                        point_total = 0
-                        for seat in self.seats:
-                            bid = seat.data.bid
-                            bid_total += bid
-                            point_total += bid
-
-                            # Bids of self.double or more count double, if set.
-                            if self.double:
-                                if bid >= self.double:
-                                    point_total += bid
-
-                        bid_str = get_plural_str(bid_total, "trick")
-                        point_str = get_plural_str(point_total, "point")
-                        if point_total >= self.current_minimum:
-
-                            # Enough indeed.  Start the game proper.
-                            self.bc_pre("With ^W%s^~ bid for a total of ^C%s^~, play begins!\n" % (bid_str, point_str))
-                            self.state.set("playing")
-                            self.turn = self.next_seat(self.turn)
-                            if self.turn.player:
-                                self.show_hand(self.turn.player)
-
-                            # If this game has decay turned on, may as well un-decay now.
-                            if self.decay:
-                                self.current_minimum = self.minimum
-                        else:
-
-                            # Not enough.  Throw hands in and deal fresh.
-                            self.bc_pre("With only ^R%s^~ bid, everyone throws in their hand.\n" % bid_str)
-                            self.dealer = self.next_seat(self.dealer)
-
-                            # If decay is enabled and it makes sense, decay.
-                            if self.decay and self.current_minimum > 4:
-                                self.current_minimum -= 1
-                                self.bc_pre("The minimum bid temporarily decays to ^Y%s^~.\n" % self.current_minimum)
-
-                            # Deal and set up the first player to bid.
-                            self.new_deal()
-                            self.turn = self.next_seat(self.dealer)
-                            if self.turn.player:
-                                self.tell_pre(self.turn.player, "It is your turn to bid.\n")
-
-                    else:
-
-                        # Still need more bids.
-                        self.turn = self.next_seat(self.turn)
-                        if self.turn.player:
-                            self.tell_pre(self.turn.player, "It is your turn to bid.\n")
-                            self.show_hand(self.turn.player)
-
-                    # No matter what happened, update the layout.
-                    self.layout.change_turn(self.turn.data.who)
+    def handle_bid(self, player, bid_bits):
 
-            elif state == "playing":
+        if len(bid_bits) == 1:
+            if self.bid(player, bid_bits[0]):
+                self.end_bid()
+        else:
+            self.tell_pre(player, "Invalid bid command.\n")
 
-                card_played = False
-                if primary in ("hand", "inventory", "inv", "i",):
-                    self.show_hand(player)
-                    handled = True
+    def end_bid(self):
 
-                elif primary in ("play", "move", "pl", "mv",):
-                    if len(command_bits) == 2:
-                        card_played = self.play(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid play command.\n")
-                    handled = True
+        bid_list = [x for x in self.seats if x.data.bid]
+        if len(bid_list) == 4:
 
-                if card_played:
+            # Bidding is complete.  Are enough tricks bid?
+            bid_total = 0
+            point_total = 0
+            for seat in self.seats:
+                bid = seat.data.bid
+                bid_total += bid
+                point_total += bid
+
+                # Bids of self.double or more count double, if set.
+                if self.double:
+                    if bid >= self.double:
+                        point_total += bid
+
+            bid_str = get_plural_str(bid_total, "trick")
+            point_str = get_plural_str(point_total, "point")
+            if point_total >= self.current_minimum:
+
+                # Enough indeed.  Start the game proper.
+                self.bc_pre("With ^W%s^~ bid for a total of ^C%s^~, play begins!\n" % (bid_str, point_str))
+                self.state.set("playing")
+                self.turn = self.next_seat(self.turn)
+                if self.turn.player:
+                    self.show_hand(self.turn.player)
+
+                # If this game has decay turned on, may as well un-decay now.
+                if self.decay:
+                    self.current_minimum = self.minimum
+            else:
+
+                # Not enough.  Throw hands in and deal fresh.
+                self.bc_pre("With only ^R%s^~ bid, everyone throws in their hand.\n" % bid_str)
+                self.dealer = self.next_seat(self.dealer)
+
+                # If decay is enabled and it makes sense, decay.
+                if self.decay and self.current_minimum > 4:
+                    self.current_minimum -= 1
+                    self.bc_pre("The minimum bid temporarily decays to ^Y%s^~.\n" % self.current_minimum)
+
+                # Deal and set up the first player to bid.
+                self.new_deal()
+                self.turn = self.next_seat(self.dealer)
+                self.layout.change_turn(self.turn.data.who)
+                self.show_hands()
+                if self.turn.player:
+                    self.tell_pre(self.turn.player, "It is your turn to bid.\n")
+
+        else:
 
-                    # A card hit the table.  We need to do stuff.
-                    if len(self.trick) == 4:
+            # Still need more bids.
+            self.turn = self.next_seat(self.turn)
+            if self.turn.player:
+                self.tell_pre(self.turn.player, "It is your turn to bid.\n")
+                self.show_hand(self.turn.player)
 
-                        # Finish the trick up.
-                        self.finish_trick()
+        # No matter what happened, update the layout.
+        self.layout.change_turn(self.turn.data.who)
 
-                        # Is that the last trick?
-                        if self.north.data.tricks + self.west.data.tricks + self.south.data.tricks + self.east.data.tricks == 13:
+    def handle_play(self, player, play_bits):
 
-                            # Resolve the hand...
-                            self.resolve_hand()
+        if len(play_bits) == 1:
+            if self.play(player, play_bits[0]):
+                self.end_play()
+        else:
+            self.tell_pre(player, "Invalid play command.\n")
 
-                            # And look for a winner.
-                            winner = self.find_winner()
-                            if winner:
+    def end_play(self):
 
-                                # Found a winner.  Finish.
-                                self.resolve(winner)
-                                self.finish()
+        # A card hit the table.  We need to do stuff.
+        if len(self.trick) == 4:
 
-                            else:
+            # Finish the trick up.
+            self.finish_trick()
 
-                                # No winner.  Pass the deal to the next player...
-                                self.dealer = self.next_seat(self.dealer)
+            # Is that the last trick?
+            if self.north.data.tricks + self.west.data.tricks + self.south.data.tricks + self.east.data.tricks == 13:
 
-                                # Deal and set up the first player to bid.
-                                self.new_deal()
-                                self.turn = self.next_seat(self.dealer)
-                                self.layout.change_turn(self.turn.data.who)
-                                self.state.set("bidding")
-                                if self.turn.player:
-                                    self.tell_pre(self.turn.player, "It is your turn to bid.\n")
+                # Resolve the hand...
+                self.resolve_hand()
 
-                    else:
+                # And look for a winner.
+                winner = self.find_winner()
+                if winner:
 
-                        # Trick not over.  Rotate.
-                        self.turn = self.next_seat(self.turn)
-                        self.layout.change_turn(self.turn.data.who)
-                        if self.turn.player:
-                            self.show_hand(self.turn.player)
+                    # Found a winner.  Finish.
+                    self.resolve(winner)
+                    self.finish()
 
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+                else:
+
+                    # No winner.  Pass the deal to the next player...
+                    self.dealer = self.next_seat(self.dealer)
+
+                    # Deal and set up the first player to bid.
+                    self.new_deal()
+                    self.turn = self.next_seat(self.dealer)
+                    self.layout.change_turn(self.turn.data.who)
+                    self.state.set("bidding")
+                    self.show_hands()
+                    if self.turn.player:
+                        self.tell_pre(self.turn.player, "It is your turn to bid.\n")
+
+        else:
+
+            # Trick not over.  Rotate.
+            self.turn = self.next_seat(self.turn)
+            self.layout.change_turn(self.turn.data.who)
+            if self.turn.player:
+                self.show_hand(self.turn.player)
 
     def finish_trick(self):
 
@@ -773,3 +683,43 @@ class FortyOne(SeatedGame):
             name_two = self.east.player_name
 
         self.bc_pre("^G%s^~ and ^G%s^~ win!\n" % (name_one, name_two))
+
+# Forty-One's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="FORTY-ONE SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("decay", "dec"), "handle_one_arg", TAKES_ARGS, "on|off",
+             "Enable bid decay on toss-ins.", "FORTY-ONE SETUP PHASE",
+             states=("setup",), setter="set_decay", what="decay")
+COMMANDS.add(("goal", "score", "sc", "g"), "handle_one_arg", TAKES_ARGS,
+             "<num>", "Set the goal score to <num>.", "FORTY-ONE SETUP PHASE",
+             shown=("goal", "score"), states=("setup",), setter="set_goal",
+             what="goal")
+COMMANDS.add(("double", "doub"), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Set the lowest doubling to <num>.", "FORTY-ONE SETUP PHASE",
+             states=("setup",), setter="set_double", what="double")
+COMMANDS.add(("minimum", "min"), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Set the minimum deal bid to <num>.", "FORTY-ONE SETUP PHASE",
+             states=("setup",), setter="set_minimum", what="minimum")
+COMMANDS.add(("positive", "pos", "po", "p"), "handle_one_arg", TAKES_ARGS,
+             "on|off", "Require positive partners for wins.",
+             "FORTY-ONE SETUP PHASE", shown=("positive", "pos"),
+             states=("setup",), setter="set_positive", what="positive")
+COMMANDS.add(("whist", "wh"), "handle_one_arg", TAKES_ARGS, "on|off",
+             "Enable whist mode for trumps.", "FORTY-ONE SETUP PHASE",
+             states=("setup",), setter="set_whist", what="whist")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="FORTY-ONE SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("bid", "b"), "handle_bid", TAKES_ARGS, "<num>",
+             "Bid to win <num> tricks.", "FORTY-ONE PLAY",
+             states=("bidding",))
+COMMANDS.add(("play", "move", "pl", "mv"), "handle_play", TAKES_ARGS,
+             "<card>", "Play <card> from your hand.", "FORTY-ONE PLAY",
+             shown=("play", "pl"), states=("playing",))
+COMMANDS.add(("hand", "inventory", "inv", "i"), "show_hand",
+             desc="Look at the cards in your hand.", section="FORTY-ONE PLAY",
+             shown=("hand", "inv", "i"), states=("bidding", "playing"))
+
+FortyOne.commands = COMMANDS
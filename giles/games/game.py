@@ -14,8 +14,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from giles.command import Command, CommandTable, TAKES_ARGS
+from giles.games.layout import Layout
 from giles.state import State
 from giles.utils import rgetattr
+from miniboa.xterm import colorize
 
 class Game(object):
     """The base Game class.  Does a lot of the boring footwork that all
@@ -50,6 +53,12 @@ class Game(object):
         # done debugging them.
         self.debug = False
 
+        # The rendered public view, keyed by (use_ansi, timestamp); see
+        # get_view_buffer().  view_version is whatever the view was last
+        # rendered from, and the cache is dropped when that changes.
+        self.view_version = None
+        self.view_buffers = {}
+
     def __repr__(self):
         return ("%s (%s)" % (self.table_display_name, self.game_display_name))
 
@@ -80,21 +89,95 @@ class Game(object):
 
     def show_help(self, player):
         self.log_pre("%s asked for help with the game." % player)
-        player.tell_cc("\nVIEWING:\n\n")
-        player.tell_cc("                ^!kibitz^., ^!watch^.     Watch the game as it happens.\n")
-        player.tell_cc("                ^!show^., ^!look^., ^!l^.     Look at the game itself.\n")
-        player.tell_cc("        ^!show_config^., ^!showconf^.     Show the game's configuration.\n")
-        player.tell_cc("\nPARTICIPATING:\n\n")
-        player.tell_cc("            ^!terminate^., ^!finish^.     Terminate game.\n")
-        if self.debug:
-            player.tell_cc("\nDEBUG:\n\n")
-            player.tell_cc("         ^!change_state^. <state>     Change game state to <state>.\n")
+        self.commands.show_help(player, self.debug)
 
     def show(self, player):
 
         # This function should /absolutely/ be overridden by any games.
         self.tell_pre(player, "This is the default game class; nothing to show.\n")
 
+    def get_public_view(self):
+
+        # Override this function to return the bits of the game that every
+        # watcher sees identically (the board, whose turn it is, and so on)
+        # as a list of caret-coded strings and Layouts.  If you do, you get
+        # send_view() and broadcast_view() for free, which render the view
+        # once and hand the same buffer to everyone.  The default of None
+        # means that broadcast_view() just calls show() for everyone.
+        return None
+
+    def get_private_view(self, player):
+
+        # Override this function to return caret-coded text that only this
+        # player should see when the view is broadcast (their hand, say),
+        # or None if there isn't any.
+        return None
+
+    def get_view_buffer(self, player, view):
+
+        # The view is re-rendered only if what it's built from has changed;
+        # Layouts contribute their representation, so a board that hasn't
+        # moved costs nothing.
+        version = tuple([x.representation if isinstance(x, Layout) else x
+                         for x in view])
+        if version != self.view_version:
+            self.view_version = version
+            self.view_buffers = {}
+
+        ansi = player.client.use_ansi
+        timestamp = None
+        if player.config["timestamps"]:
+            timestamp = player.server.timestamp
+
+        key = (ansi, timestamp)
+        if key not in self.view_buffers:
+            bits = []
+            if timestamp:
+                bits.append(colorize("(^C%s^~) " % timestamp, ansi))
+            for part in view:
+                if isinstance(part, Layout):
+                    bits.append(part.get_colorized(ansi))
+                else:
+                    bits.append(colorize(part, ansi, optimize=True))
+            self.view_buffers[key] = "".join(bits)
+        return self.view_buffers[key]
+
+    def send_view(self, player, view=None):
+
+        # Send the (cached) public view to a single player.  Players with a
+        # live board get the board drawn in place at the top of their
+        # screen, and only the rest of the view as ordinary output.
+        if view is None:
+            view = self.get_public_view()
+
+        if player.wants_live_board():
+            boards = [x for x in view if isinstance(x, Layout)]
+            if boards and player.draw_live_board(self, boards[0]):
+                rest = [x for x in view if x is not boards[0]]
+                for part in rest:
+                    if isinstance(part, Layout):
+                        player.tell_layout(part)
+                    elif part:
+                        player.tell_cc(part)
+                return
+
+        player.client.send(self.get_view_buffer(player, view))
+
+    def broadcast_view(self, view=None):
+
+        # Render the public view once and send it to every listener, along
+        # with whatever private bits each of them should see.
+        if view is None:
+            view = self.get_public_view()
+        for listener in self.channel.listeners:
+            if view is None:
+                self.show(listener)
+            else:
+                self.send_view(listener, view)
+            private = self.get_private_view(listener)
+            if private:
+                listener.tell_cc(private)
+
     def show_config(self, player):
 
         if getattr(self, "config_params", None):
@@ -113,6 +196,8 @@ class Game(object):
         # done, override this function.
         self.log_pre("This game has been marked as finished.")
         self.channel.persistent = False
+        for listener in self.channel.listeners:
+            listener.release_live_board(self)
         self.state.set("finished")
 
     def terminate(self, player):
@@ -142,76 +227,73 @@ class Game(object):
 
         # You will almost certainly want to override this if you're
         # writing a new subclass of Game().  Existing subclasses
-        # may or may not have useful implementations extant.
-        pass
+        # may or may not have useful implementations extant.  Whatever
+        # you do, let go of the player's live board if we hold it.
+        player.release_live_board(self)
 
     def handle_common_commands(self, player, command_str):
 
-        # This handles certain command bits common to all games.
-        # - If the game is finished, reject commands.
-        # - At any point, take these generic commands:
-        #   * help (print help in regards to the game)
-        #   * kibitz (watch the game)
-        #   * show (show the game itself)
-        #   * show_config (show the configuration of the game)
-        #   * terminate (end the game immediately)
-        #   * private (make private)
-        #   * public (make public)
-        # - In addition, if we're in debug mode, allow people to
-        #   forcibly switch states via change_state.
-        #
-        # We also return whether or not we handled the command, which may
-        # be useful to games that call us.
-
-        handled = False
-        # Pull out the command bits.
-        command_bits = command_str.split()
-        primary = command_bits[0].lower()
-
-        # You can always ask for help...
-        if primary in ('help', 'h', '?'):
-            self.show_help(player)
-            handled = True
+        # This handles certain command bits common to all games; see
+        # COMMANDS below.  We return whether or not we handled the
+        # command, which may be useful to games that call us.  Note that
+        # this always uses the base game commands, even for subclasses
+        # that extend them; they handle their own additions.
 
-        # You can always add yourself as a kibitzer...
-        elif primary in ('kibitz', 'watch'):
-            if not self.channel.is_connected(player):
-                self.channel.connect(player)
-                self.show(player)
-            else:
-                self.tell_pre(player, "You're already watching this game!\n")
-            handled = True
+        return COMMANDS.dispatch(self, player, Command(command_str))
+
+    def kibitz(self, player):
 
-        elif primary in ('show', 'look', 'l'):
+        # You can always add yourself as a kibitzer...
+        if not self.channel.is_connected(player):
+            self.channel.connect(player)
             self.show(player)
-            handled = True
-
-        elif primary in ('show_config', 'showconf'):
-            self.show_config(player)
-            handled = True
-
-        elif primary in ('terminate', 'finish', 'flip'):
-            self.terminate(player)
-            handled = True
-
-        elif primary in ('private',):
-            self.bc_pre("^R%s^~ has turned the game ^cprivate^~.\n" % (player))
-            self.private = True
-            handled = True
-
-        elif primary in ('public',):
-            self.bc_pre("^R%s^~ has turned the game ^Cpublic^~.\n" % (player))
-            self.private = False
-            handled = True
-
-        elif primary in ('change_state',):
-            if not self.debug:
-                self.tell_pre(player, "No switching states in production!\n")
-            elif len(command_bits) != 2:
-                self.tell_pre(player, "Invalid state to switch to.\n")
-            else:
-                self.state.set(command_bits[1].lower())
-                self.bc_pre("^R%s^~ forced a state change to ^C%s^~.\n" % (player, self.state.get()))
-            handled = True
+        else:
+            self.tell_pre(player, "You're already watching this game!\n")
+
+    def look(self, player):
+
+        player.redraw_live_board()
+        self.show(player)
+
+    def make_private(self, player):
+
+        self.bc_pre("^R%s^~ has turned the game ^cprivate^~.\n" % (player))
+        self.private = True
 
-        return handled
+    def make_public(self, player):
+
+        self.bc_pre("^R%s^~ has turned the game ^Cpublic^~.\n" % (player))
+        self.private = False
+
+    def change_state(self, player, args):
+
+        if not self.debug:
+            self.tell_pre(player, "No switching states in production!\n")
+        elif len(args) != 1:
+            self.tell_pre(player, "Invalid state to switch to.\n")
+        else:
+            self.state.set(args[0].lower())
+            self.bc_pre("^R%s^~ forced a state change to ^C%s^~.\n" % (player, self.state.get()))
+
+# The commands every game takes, at any point.  Subclasses that add more
+# of their own should build a table with this one as its parent and set
+# it as their class's commands, so that help covers everything.
+COMMANDS = CommandTable()
+COMMANDS.add(("help", "h", "?"), "show_help")
+COMMANDS.add(("kibitz", "watch"), "kibitz", desc="Watch the game as it happens.",
+             section="VIEWING")
+COMMANDS.add(("show", "look", "l"), "look", desc="Look at the game itself.",
+             section="VIEWING")
+COMMANDS.add(("show_config", "showconf"), "show_config",
+             desc="Show the game's configuration.", section="VIEWING")
+COMMANDS.add(("terminate", "finish", "flip"), "terminate",
+             desc="Terminate game.", section="PARTICIPATING",
+             shown=("terminate", "finish"))
+COMMANDS.add(("private",), "make_private", desc="Make the game private.",
+             section="PARTICIPATING")
+COMMANDS.add(("public",), "make_public", desc="Make the game public.",
+             section="PARTICIPATING")
+COMMANDS.add(("change_state",), "change_state", TAKES_ARGS, "<state>",
+             "Change game state to <state>.", "DEBUG", debug=True)
+
+Game.commands = COMMANDS
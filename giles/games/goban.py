@@ -31,6 +31,7 @@ NONE_BITS = "00"
 BLACK_BITS = "01"
 WHITE_BITS = "10"
 
+from giles.games.printable_board import PrintableBoard
 from giles.utils import LETTERS
 
 class Goban(object):
@@ -64,26 +65,44 @@ class Goban(object):
 
     def update_printable_board(self):
 
-        self.printable_board = []
-        col_str = "    " + "".join([" " + LETTERS[i] for i in range(self.width)])
-        self.printable_board.append(col_str + "\n")
-        self.printable_board.append("   ^m.=" + "".join(["=="] * self.width) + ".^~\n")
+        # Only rows whose contents (or last-move highlight) have changed
+        # since the last render are rebuilt; see PrintableBoard.
+        if not self.printable_board:
+            self.printable_board = PrintableBoard()
+        board = self.printable_board
+        board.resize(self.height + 4)
+
+        frame_key = (self.width, self.height)
+        if board.is_stale(0, frame_key):
+            col_str = "    " + "".join([" " + LETTERS[i] for i in range(self.width)]) + "\n"
+            board.set_line(0, col_str, frame_key)
+            board.set_line(1, "   ^m.=" + "".join(["=="] * self.width) + ".^~\n", frame_key)
+            board.set_line(self.height + 2, "   ^m`=" + "".join(["=="] * self.width) + "'^~\n", frame_key)
+            board.set_line(self.height + 3, col_str, frame_key)
+
         for r in range(self.height):
-            this_str = "%2d ^m|^~ " % (r + 1)
-            for c in range(self.width):
-                if r == self.last_row and c == self.last_col:
-                    this_str += "^5"
-                loc = self.board[r][c]
+            if r == self.last_row:
+                highlight = self.last_col
+            else:
+                highlight = None
+            row_key = (tuple(self.board[r]), highlight)
+            if not board.is_stale(r + 2, row_key):
+                continue
+
+            bits = ["%2d ^m|^~ " % (r + 1)]
+            for c, loc in enumerate(self.board[r]):
+                if c == highlight:
+                    bits.append("^5")
                 if loc == WHITE:
-                    this_str += "^Wo^~ "
+                    bits.append("^Wo^~ ")
                 elif loc == BLACK:
-                    this_str += "^Kx^~ "
+                    bits.append("^Kx^~ ")
                 else:
-                    this_str += "^M.^~ "
-            this_str += "^m|^~ %d" % (r + 1)
-            self.printable_board.append(this_str + "\n")
-        self.printable_board.append("   ^m`=" + "".join(["=="] * self.width) + "'^~\n")
-        self.printable_board.append(col_str + "\n")
+                    bits.append("^M.^~ ")
+            bits.append("^m|^~ %d\n" % (r + 1))
+            board.set_line(r + 2, "".join(bits), row_key)
+
+        board.update()
 
     def resize(self, width, height):
 
@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
 from giles.state import State
 from giles.utils import booleanize
@@ -82,18 +83,19 @@ class Gonnect(SeatedGame):
         # A traditional Gonnect board is 13x13.
         self.goban.resize(13, 13)
 
-    def show(self, player):
+    def get_public_view(self):
 
         if not self.goban.printable_board:
             self.goban.update_printable_board()
-        for line in self.goban.printable_board:
-            player.tell_cc(line)
-        player.tell_cc(self.get_supplemental_str())
+        return [self.goban.printable_board, self.get_supplemental_str()]
+
+    def show(self, player):
+
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def get_stone_str(self, count):
 
@@ -272,92 +274,43 @@ class Gonnect(SeatedGame):
         self.channel.broadcast_cc(self.prefix + "^Y%s^~ has swapped ^KBlack^~'s first move.\n" % (player))
         self.turn_number += 1
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("size", "sz",):
-
-                    self.set_size(player, command_bits[1:])
-                    handled = True
-
-                if primary in ("directional", "goals", "dir", "goal",):
-                    self.set_directional(player, command_bits[1])
-                    handled = True
-
-                if primary in ("done", "ready", "d", "r",):
-
-                    self.channel.broadcast_cc(self.prefix + "The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
+    def handle_move(self, player, move_bits):
 
-                if primary in ("config", "setup", "conf",):
-
-                    self.state.set("setup")
-                    self.channel.broadcast_cc(self.prefix + "^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
-
-                if primary in ("move", "play", "mv", "pl",):
-
-                    invalid = False
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.move(player, move_bits[0])
-                    else:
-                        invalid = True
-
-                    if invalid:
-                        player.tell_cc(self.prefix + "Invalid move command.\n")
-                    handled = True
-
-                elif primary in ("swap",):
-                    if self.turn_number == 2 and self.seats[1].player == player:
-                        self.swap(player)
-                        made_move = True
-                    else:
-                        player.tell_cc(self.prefix + "Unsuccessful swap.\n")
-                    handled = True
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.move(player, move_bits[0]):
+                self.end_turn()
+        else:
+            player.tell_cc(self.prefix + "Invalid move command.\n")
 
-                elif primary in ("resign",):
+    def handle_swap(self, player):
 
-                    if self.resign(player):
-                        made_move = True
+        if self.turn_number == 2 and self.seats[1].player == player:
+            self.swap(player)
+            self.end_turn()
+        else:
+            player.tell_cc(self.prefix + "Unsuccessful swap.\n")
 
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_turn()
 
-                    if self.turn == BLACK:
-                        self.turn = WHITE
-                    else:
-                        self.turn = BLACK
+    def end_turn(self):
 
-                    # Did someone win?
-                    winner = self.find_winner()
-                    if winner:
-                        self.resolve(winner)
-                        self.finish()
-                    else:
-                        # Nope.  show everyone the board, and keep on.
-                        self.send_board()
+        if self.turn == BLACK:
+            self.turn = WHITE
+        else:
+            self.turn = BLACK
 
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+        # Did someone win?
+        winner = self.find_winner()
+        if winner:
+            self.resolve(winner)
+            self.finish()
+        else:
+            # Nope.  show everyone the board, and keep on.
+            self.send_board()
 
     def reset_adjacency(self):
 
@@ -463,15 +416,28 @@ class Gonnect(SeatedGame):
         self.send_board()
         self.channel.broadcast_cc(self.prefix + "^C%s^~ wins!\n" % winner)
 
-    def show_help(self, player):
-
-        super(Gonnect, self).show_help(player)
-        player.tell_cc("\nGONNECT SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("    ^!size^. <size> | <w> <h>, ^!sz^.     Set board to <size>x<size>/<w>x<h>.\n")
-        player.tell_cc("      ^!directional^. off|on, ^!dir^.     Turn directional goals off|on.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nGONNECT PLAY:\n\n")
-        player.tell_cc("                ^!move^. <ln>, ^!mv^.     Place stone at <ln> (letter number).\n")
-        player.tell_cc("                         ^!swap^.     Swap first move (White only, first only).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Gonnect's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="GONNECT SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "set_size", TAKES_ARGS, "<size> | <w> <h>",
+             "Set board to <size>x<size>/<w>x<h>.", "GONNECT SETUP PHASE",
+             states=("setup",))
+COMMANDS.add(("directional", "goals", "dir", "goal"), "handle_one_arg",
+             TAKES_ARGS, "off|on", "Turn directional goals off|on.",
+             "GONNECT SETUP PHASE", shown=("directional", "dir"),
+             states=("setup",), setter="set_directional", what="directional")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="GONNECT SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Place stone at <ln> (letter number).", "GONNECT PLAY",
+             shown=("move", "mv"), states=("playing",))
+COMMANDS.add(("swap",), "handle_swap",
+             desc="Swap first move (White only, first only).",
+             section="GONNECT PLAY", states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="GONNECT PLAY", states=("playing",))
+
+Gonnect.commands = COMMANDS
@@ -27,10 +27,35 @@ class Hand(object):
     Methods of note:  show(), discard(), discard_specific(), add(), muck(),
     shuffle(), and sort().  The latter is not tested with items that are not
     able to be compared to each other.
+
+    Alongside the list, a Hand keeps a count of each item it holds, so "in"
+    doesn't have to scan the list, and neither does discard_specific() when
+    the item isn't there.  Removing an item that is there is still a search
+    of the list, which is fine at the size of a hand of cards.  Items must
+    be hashable, with equal items hashing equally.  Items with a .bit (like
+    PlayingCard) are also ORed into .mask, for the bitmask helpers in
+    trick.py.  Change the hand through its methods (or item assignment and
+    deletion), not by altering .cards directly.
     """
 
     def __init__(self):
         self.cards = []     # Ordered 'bottom' to 'top'.
+        self.counts = {}    # Item -> number of copies in the hand.
+        self.mask = 0       # Bits of every distinct item in the hand.
+
+    def _index(self, c):
+        count = self.counts.get(c, 0)
+        if not count:
+            self.mask |= getattr(c, "bit", 0)
+        self.counts[c] = count + 1
+
+    def _unindex(self, c):
+        count = self.counts[c] - 1
+        if count:
+            self.counts[c] = count
+        else:
+            del self.counts[c]
+            self.mask &= ~getattr(c, "bit", 0)
 
     # All comparison operators should be handled by specific type-of-card
     # implementations. As such, for generic arbitrary cards, NotImplemented
@@ -43,16 +68,19 @@ class Hand(object):
         return self.cards[key]
 
     def __setitem__(self, key, value):
+        self._unindex(self.cards[key])
+        self._index(value)
         return self.cards.__setitem__(key, value)
 
     def __delitem__(self, key):
+        self._unindex(self.cards[key])
         return self.cards.__delitem__(key)
 
     def __iter__(self):
         return self.cards.__iter__()
 
     def __contains__(self, needle):
-        if needle in self.cards:
+        if needle in self.counts:
             return True
         else:
             return False
@@ -61,9 +89,11 @@ class Hand(object):
         """Discard from a hand.  By default, discards the top item (item [-1]),
         or None if empty. Discard is returned."""
         try:
-            return self.cards.pop(n)
+            c = self.cards.pop(n)
         except:
             return None
+        self._unindex(c)
+        return c
 
     def muck(self):
         """Discard all of the items in a hand.  Returns a Hand containing all
@@ -83,10 +113,12 @@ class Hand(object):
 
     def discard_specific(self, needle):
         """Used to discard a specific item by example, or None if not found in
-        the Hand.  Discard is returned."""
-        if needle in self.cards:
-            self.cards.remove(needle)
-            return needle
+        the Hand.  Discard (the item from the Hand, not the example) is
+        returned.  Only a miss avoids the list search."""
+        if needle in self.counts:
+            c = self.cards.pop(self.cards.index(needle))
+            self._unindex(c)
+            return c
         else:
             return None
 
@@ -103,6 +135,7 @@ class Hand(object):
         anything that evaluates to False (e. g. None, [])"""
         if c:
             self.cards.append(c)
+            self._index(c)
             return True
         return False
 
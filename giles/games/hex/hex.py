@@ -14,11 +14,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from giles.command import CommandTable, TAKES_ARGS
 from giles.utils import booleanize
 from giles.utils import demangle_move
 from giles.state import State
-from giles.games.seated_game import SeatedGame
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
+from giles.games.printable_board import PrintableBoard
 
 # What are the minimum and maximum sizes for the board?
 HEX_MIN_SIZE = 3
@@ -151,41 +153,62 @@ class Hex(SeatedGame):
 
     def update_printable_board(self):
 
-        self.printable_board = []
-        slash_line = " "
-        char_line = ""
+        # Only lines whose contents (or last-move highlight) have changed
+        # since the last render are rebuilt; see PrintableBoard.
+        if not self.printable_board:
+            self.printable_board = PrintableBoard()
+        board = self.printable_board
+        board.resize(self.size + 2)
+
+        if board.is_stale(self.size, self.size):
+            slash_line = " "
+            char_line = ""
+            for x in range(self.size):
+                color_char = "^W"
+                if x % 2 == 0:
+                    color_char = "^K"
+                slash_line += color_char + "/^~ "
+                char_line += "%s " % COL_CHARACTERS[x]
+            board.set_line(self.size, slash_line + "\n", self.size)
+            board.set_line(self.size + 1, char_line + "\n", self.size)
+
         for x in range(self.size):
-            msg = " "
-            color_char = "^W"
-            if x % 2 == 0:
-                color_char = "^K"
-            slash_line += color_char + "/^~ "
-            char_line += "%s " % COL_CHARACTERS[x]
-            for spc in range(self.size - x):
-                msg += " "
-            for y in range(self.size):
-                piece = self.board[y][x]
-                if y == self.last_x and x == self.last_y:
-                    msg += "^5"
+            if x == self.last_y:
+                highlight = self.last_x
+            else:
+                highlight = None
+            pieces = tuple([self.board[y][x] for y in range(self.size)])
+            line_key = (self.size, pieces, highlight)
+            if not board.is_stale(x, line_key):
+                continue
+
+            bits = [" " * (self.size - x + 1)]
+            for y, piece in enumerate(pieces):
+                if y == highlight:
+                    bits.append("^5")
                 if piece == BLACK:
-                    msg += "^Kx^~ "
+                    bits.append("^Kx^~ ")
                 elif piece == WHITE:
-                    msg += "^Wo^~ "
+                    bits.append("^Wo^~ ")
                 elif y % 2 == 0:
-                    msg += "^m,^~ "
+                    bits.append("^m,^~ ")
                 else:
-                    msg += "^M.^~ "
-            msg += "- " + str(x + 1) + "\n"
-            self.printable_board.append(msg)
-        self.printable_board.append(slash_line + "\n")
-        self.printable_board.append(char_line + "\n")
+                    bits.append("^M.^~ ")
+            bits.append("- " + str(x + 1) + "\n")
+            board.set_line(x, "".join(bits), line_key)
 
-    def print_board(self, player):
+        board.update()
+
+    def get_public_view(self):
 
+        # Just the board; the turn string is broadcast separately.
         if not self.printable_board:
             self.update_printable_board()
-        for line in self.printable_board:
-            player.tell_cc(line)
+        return [self.printable_board]
+
+    def print_board(self, player):
+
+        self.send_view(player)
 
     def get_turn_str(self):
         if self.state.get() == "playing":
@@ -201,8 +224,7 @@ class Hex(SeatedGame):
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.print_board(player)
+        self.broadcast_view()
 
     def resign(self, seat):
 
@@ -215,19 +237,6 @@ class Hex(SeatedGame):
         self.print_board(player)
         player.tell_cc(self.get_turn_str())
 
-    def show_help(self, player):
-
-        super(Hex, self).show_help(player)
-        player.tell_cc("\nHEX SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("              ^!size^. <size>, ^!sz^.     Set board to size <size>.\n")
-        player.tell_cc("        ^!quickstart^. on|off, ^!qs^.     Enable quickstart mode.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nHEX PLAY:\n\n")
-        player.tell_cc("      ^!move^. <ln>, ^!play^., ^!mv^., ^!pl^.     Make move <ln> (letter number).\n")
-        player.tell_cc("                         ^!swap^.     Swap the first move (only Black, only their first).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
-
     def quickstart(self, player, qs_str):
 
         qs_bool = booleanize(qs_str)
@@ -270,116 +279,71 @@ class Hex(SeatedGame):
             self.send_board()
             self.channel.broadcast_cc(self.prefix + self.get_turn_str())
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        state = self.state.get()
-
-        command_bits = command_str.split()
-        primary = command_bits[0].lower()
-        if state == "setup":
-
-            if primary in ('size', 'sz'):
-                if len(command_bits) == 2:
-                    self.set_size(player, command_bits[1])
-                else:
-                    player.tell_cc(self.prefix + "Invalid size command.\n")
-                handled = True
-
-            elif primary in ('quickstart', 'headstart', 'qs', 'hs'):
-
-                if len(command_bits) == 2:
-                    self.quickstart(player, command_bits[1])
-                else:
-                    player.tell_cc(self.prefix + "Invalid quickstart command.\n")
-                handled = True
-
-            elif primary in ('done', 'ready', 'd', 'r'):
-
-                self.channel.broadcast_cc(self.prefix + "The game is now looking for players.\n")
-                self.state.set("need_players")
-                handled = True
-
-        elif state == "need_players":
+    def get_mover(self, player):
 
-            if primary in ('config', 'setup', 'conf'):
-                self.state.set("setup")
-                self.channel.broadcast_cc(self.prefix + "^R%s^~ has switched the game to setup mode.\n" %
-                   (player))
-                handled = True
-
-        elif state == "playing":
-
-            made_move = False
-
-            # For all move types, don't bother if it's not this player's turn.
-            if primary in ('move', 'mv', 'play', 'pl', 'swap', 'resign'):
+        # For all move types, don't bother if it's not this player's turn.
+        seat = self.get_seat_of_player(player)
+        if not seat:
+            player.tell_cc(self.prefix + "You can't move; you're not playing!\n")
+            return None
 
-                seat = self.get_seat_of_player(player)
-                if not seat:
-                    player.tell_cc(self.prefix + "You can't move; you're not playing!\n")
-                    return
+        elif seat.data.color != self.turn:
+            player.tell_cc(self.prefix + "You must wait for your turn to move.\n")
+            return None
 
-                elif seat.data.color != self.turn:
-                    player.tell_cc(self.prefix + "You must wait for your turn to move.\n")
-                    return
+        return seat
 
-            if primary in ('move', 'mv', 'play', 'pl'):
-                move_bits = demangle_move(command_bits[1:])
-                if move_bits and len(move_bits) == 1:
-                    success = self.move(seat, move_bits[0])
-                    if success:
-                        move = success
-                        made_move = True
-                    else:
-                        player.tell_cc(self.prefix + "Unsuccessful move.\n")
-                else:
-                    player.tell_cc(self.prefix + "Unsuccessful move.\n")
+    def handle_move(self, player, move_bits):
 
-                handled = True
-
-            elif primary in ('swap',):
+        seat = self.get_mover(player)
+        if not seat:
+            return
 
-                if self.turn_number == 2 and seat.player == player:
-                    self.swap()
-                    move = "swap"
-                    made_move = True
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            move = self.move(seat, move_bits[0])
+            if move:
+                self.end_turn(move)
+            else:
+                player.tell_cc(self.prefix + "Unsuccessful move.\n")
+        else:
+            player.tell_cc(self.prefix + "Unsuccessful move.\n")
 
-                else:
-                    player.tell_cc(self.prefix + "Unsuccessful swap.\n")
+    def handle_swap(self, player):
 
-                handled = True
+        seat = self.get_mover(player)
+        if not seat:
+            return
 
-            elif primary in ('resign',):
+        if self.turn_number == 2 and seat.player == player:
+            self.swap()
+            self.end_turn("swap")
+        else:
+            player.tell_cc(self.prefix + "Unsuccessful swap.\n")
 
-                if self.resign(seat):
-                    move = "resign"
-                    made_move = True
+    def handle_resign(self, player):
 
-                handled = True
+        seat = self.get_mover(player)
+        if seat and self.resign(seat):
+            self.end_turn("resign")
 
-            if made_move:
+    def end_turn(self, move):
 
-                self.update_printable_board()
-                self.send_board()
-                self.move_list.append(move)
-                self.turn_number += 1
-
-                winner = self.find_winner()
-                if winner:
-                    self.resolve(winner)
-                    self.finish()
-                else:
-                    if self.turn == WHITE:
-                        self.turn = BLACK
-                    else:
-                        self.turn = WHITE
-                    self.channel.broadcast_cc(self.prefix + self.get_turn_str())
+        self.update_printable_board()
+        self.send_board()
+        self.move_list.append(move)
+        self.turn_number += 1
 
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+        winner = self.find_winner()
+        if winner:
+            self.resolve(winner)
+            self.finish()
+        else:
+            if self.turn == WHITE:
+                self.turn = BLACK
+            else:
+                self.turn = WHITE
+            self.channel.broadcast_cc(self.prefix + self.get_turn_str())
 
     def find_winner(self):
 
@@ -460,3 +424,29 @@ class Hex(SeatedGame):
 
     def resolve(self, winner):
         self.channel.broadcast_cc(self.prefix + "^C%s^~ wins!\n" % (winner))
+
+# Hex's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="HEX SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "handle_one_arg", TAKES_ARGS, "<size>",
+             "Set board to size <size>.", "HEX SETUP PHASE",
+             states=("setup",), setter="set_size", what="size")
+COMMANDS.add(("quickstart", "headstart", "qs", "hs"), "handle_one_arg",
+             TAKES_ARGS, "on|off", "Enable quickstart mode.",
+             "HEX SETUP PHASE", shown=("quickstart", "qs"), states=("setup",),
+             setter="quickstart", what="quickstart")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="HEX SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "mv", "play", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Make move <ln> (letter number).", "HEX PLAY",
+             shown=("move", "play", "mv", "pl"), states=("playing",))
+COMMANDS.add(("swap",), "handle_swap",
+             desc="Swap the first move (only Black, only their first).",
+             section="HEX PLAY", states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="HEX PLAY", states=("playing",))
+
+Hex.commands = COMMANDS
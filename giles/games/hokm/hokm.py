@@ -16,9 +16,11 @@
 
 from giles.games.four_player_card_game_layout import FourPlayerCardGameLayout, NORTH, SOUTH, EAST, WEST
 from giles.games.three_player_card_game_layout import ThreePlayerCardGameLayout
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.hand import Hand
-from giles.games.playing_card import PlayingCard, new_deck, str_to_card, card_to_str, hand_to_str, SHORT, LONG, CLUBS, DIAMONDS, HEARTS, SPADES, JACK, QUEEN, KING, ACE
+from giles.games.deck import Deck
+from giles.games.playing_card import get_card, new_deck, str_to_card, card_to_str, hand_to_str, SHORT, LONG, CLUBS, DIAMONDS, HEARTS, SPADES, JACK, QUEEN, KING, ACE
 from giles.games.seat import Seat
 from giles.games.trick import handle_trick, hand_has_suit, sorted_hand
 from giles.state import State
@@ -126,24 +128,6 @@ class Hokm(SeatedGame):
         else:
             self.log_pre("MAJOR ERROR: Hokm initialization with invalid mode %s!" % self.mode)
 
-    def show_help(self, player):
-
-        super(Hokm, self).show_help(player)
-        player.tell_cc("\nHOKM SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("            ^!goal^. <num>, ^!score^.     Set the goal score to <num>.\n")
-        player.tell_cc("              ^!players^. 3|4, ^!pl^.     Set the number of players.\n")
-        player.tell_cc("             ^!short^. on|off, ^!sh^.     Use a short deck (3p only).\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nHOKM PLAY:\n\n")
-        player.tell_cc("            ^!choose^. <suit>, ^!ch^.     Declare <suit> as trumps.  Hakem only.\n")
-        player.tell_cc("              ^!play^. <card>, ^!pl^.     Play <card> from your hand.\n")
-        player.tell_cc("                 ^!hand^., ^!inv^., ^!i^.     Look at the cards in your hand.\n")
-
-    def display(self, player):
-
-        player.tell_cc("%s" % self.layout)
-
     def get_color_code(self, seat):
         if self.mode == 4:
             if seat == self.seats[0] or seat == self.seats[2]:
@@ -189,9 +173,11 @@ class Hokm(SeatedGame):
 
         return to_return
 
+    def get_public_view(self):
+        return [self.layout, self.get_metadata()]
+
     def show(self, player):
-        self.display(player)
-        player.tell_cc(self.get_metadata())
+        self.send_view(player)
 
     def set_goal(self, player, goal_str):
 
@@ -276,14 +262,14 @@ class Hokm(SeatedGame):
                 short_rank = '2'
 
             # Build the deck, full ranks first.
-            self.deck = Hand()
+            self.deck = Deck()
             for suit in (CLUBS, DIAMONDS, HEARTS, SPADES):
                 for rank in full_ranks:
-                    self.deck.add(PlayingCard(rank, suit))
+                    self.deck.add(get_card(rank, suit))
 
             # We only want three of the short rank.  No hearts, because.
             for suit in (CLUBS, DIAMONDS, SPADES):
-                self.deck.add(PlayingCard(short_rank, suit))
+                self.deck.add(get_card(short_rank, suit))
 
     def start_deal(self):
 
@@ -308,7 +294,7 @@ class Hokm(SeatedGame):
             seat.data.hand = Hand()
         for i in range(5):
             for seat in self.seats:
-                seat.data.hand.add(self.deck.discard())
+                seat.data.hand.add(self.deck.draw())
 
         # Clear the internal metadata about trumps.
         self.trump_suit = None
@@ -333,7 +319,7 @@ class Hokm(SeatedGame):
         self.bc_pre("^R%s^~ finishes dealing the cards out.\n" % self.dealer.player_name)
         while len(self.deck):
             for seat in self.seats:
-                seat.data.hand.add(self.deck.discard())
+                seat.data.hand.add(self.deck.draw())
 
         # Sort everyone's hands now that we have a trump suit.
         for seat in self.seats:
@@ -457,125 +443,68 @@ class Hokm(SeatedGame):
         self.bc_pre("^Y%s^~ has picked ^R%s^~ as trumps.\n" % (player, self.trump_suit))
         self.finish_deal()
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-
-            command_bits = command_str.split()
-            primary = command_bits[0].lower()
-
-            if state == "setup":
-
-                if primary in ("goal", "score", "sc", "g",):
-                    if len(command_bits) == 2:
-                        self.set_goal(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid goal command.\n")
-                    handled = True
-
-                elif primary in ("players", "pl",):
-                    if len(command_bits) == 2:
-                        self.set_players(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid players command.\n")
-                    handled = True
+    def show_hakem_hand(self, player):
 
-                elif primary in ("short", "sh",):
-                    if len(command_bits) == 2:
-                        self.set_short(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid short command.\n")
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
-                    self.state.set("setup")
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "choosing":
-
-                if primary in ("hand", "inventory", "inv", "i",):
-                    if player == self.hakem.player:
-                        self.show_hand(player)
-                    else:
-                        self.tell_pre(player, "You can't look at your cards yet!\n")
-                    handled = True
+        # While trumps are being chosen, only the hakem has seen any cards.
+        if player == self.hakem.player:
+            self.show_hand(player)
+        else:
+            self.tell_pre(player, "You can't look at your cards yet!\n")
 
-                elif primary in ("choose", "trump", "ch", "tr",):
-                    if player == self.hakem.player:
-                        if len(command_bits) == 2:
-                            self.choose(player, command_bits[1])
-                        else:
-                            self.tell_pre(player, "Invalid choose command.\n")
-                    else:
-                        self.tell_pre(player, "You're not hakem!\n")
-                    handled = True
+    def handle_choose(self, player, choose_bits):
 
-            elif state == "playing":
+        if player == self.hakem.player:
+            if len(choose_bits) == 1:
+                self.choose(player, choose_bits[0])
+            else:
+                self.tell_pre(player, "Invalid choose command.\n")
+        else:
+            self.tell_pre(player, "You're not hakem!\n")
 
-                card_played = False
-                if primary in ("hand", "inventory", "inv", "i",):
-                    self.show_hand(player)
-                    handled = True
+    def handle_play(self, player, play_bits):
 
-                elif primary in ("play", "move", "pl", "mv",):
-                    if len(command_bits) == 2:
-                        card_played = self.play(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid play command.\n")
-                    handled = True
+        if len(play_bits) == 1:
+            if self.play(player, play_bits[0]):
+                self.end_play()
+        else:
+            self.tell_pre(player, "Invalid play command.\n")
 
-                if card_played:
+    def end_play(self):
 
-                    # A card hit the table.  We need to do stuff.
-                    if len(self.trick) == self.mode:
+        # A card hit the table.  We need to do stuff.
+        if len(self.trick) == self.mode:
 
-                        # Finish the trick up.
-                        self.finish_trick()
+            # Finish the trick up.
+            self.finish_trick()
 
-                        # Did that end the hand?
-                        winner = self.find_hand_winner()
+            # Did that end the hand?
+            winner = self.find_hand_winner()
 
-                        if winner:
+            if winner:
 
-                            # Yup.  Resolve the hand...
-                            self.resolve_hand(winner)
+                # Yup.  Resolve the hand...
+                self.resolve_hand(winner)
 
-                            # And look for a winner.
-                            winner = self.find_winner()
-                            if winner:
+                # And look for a winner.
+                winner = self.find_winner()
+                if winner:
 
-                                # Found a winner.  Finish.
-                                self.resolve(winner)
-                                self.finish()
+                    # Found a winner.  Finish.
+                    self.resolve(winner)
+                    self.finish()
 
-                            else:
+                else:
 
-                                # No winner.  Redeal.
-                                self.start_deal()
+                    # No winner.  Redeal.
+                    self.start_deal()
 
-                    else:
+        else:
 
-                        # Trick not over.  Rotate.
-                        self.turn = self.next_seat(self.turn)
-                        self.layout.change_turn(self.turn.data.who)
-                        if self.turn.player:
-                            self.show_hand(self.turn.player)
-
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+            # Trick not over.  Rotate.
+            self.turn = self.next_seat(self.turn)
+            self.layout.change_turn(self.turn.data.who)
+            if self.turn.player:
+                self.show_hand(self.turn.player)
 
     def finish_trick(self):
 
@@ -764,3 +693,35 @@ class Hokm(SeatedGame):
             self.bc_pre("^G%s^~ and ^G%s^~ win!\n" % (name_one, name_two))
         else:
             self.bc_pre("^G%s^~ wins!\n" % winner.player_name)
+
+# Hokm's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="HOKM SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("goal", "score", "sc", "g"), "handle_one_arg", TAKES_ARGS,
+             "<num>", "Set the goal score to <num>.", "HOKM SETUP PHASE",
+             shown=("goal", "score"), states=("setup",), setter="set_goal",
+             what="goal")
+COMMANDS.add(("players", "pl"), "handle_one_arg", TAKES_ARGS, "3|4",
+             "Set the number of players.", "HOKM SETUP PHASE",
+             states=("setup",), setter="set_players", what="players")
+COMMANDS.add(("short", "sh"), "handle_one_arg", TAKES_ARGS, "on|off",
+             "Use a short deck (3p only).", "HOKM SETUP PHASE",
+             states=("setup",), setter="set_short", what="short")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="HOKM SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("choose", "trump", "ch", "tr"), "handle_choose", TAKES_ARGS,
+             "<suit>", "Declare <suit> as trumps.  Hakem only.", "HOKM PLAY",
+             shown=("choose", "ch"), states=("choosing",))
+COMMANDS.add(("hand", "inventory", "inv", "i"), "show_hakem_hand",
+             states=("choosing",))
+COMMANDS.add(("play", "move", "pl", "mv"), "handle_play", TAKES_ARGS,
+             "<card>", "Play <card> from your hand.", "HOKM PLAY",
+             shown=("play", "pl"), states=("playing",))
+COMMANDS.add(("hand", "inventory", "inv", "i"), "show_hand",
+             desc="Look at the cards in your hand.", section="HOKM PLAY",
+             shown=("hand", "inv", "i"), states=("playing",))
+
+Hokm.commands = COMMANDS
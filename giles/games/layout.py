@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from miniboa.xterm import colorize
+
 class Layout(object):
     """A layout for a game.  For a board game, this would be the board and
     representations of the pieces on that board; for a card game, this
@@ -28,8 +30,10 @@ class Layout(object):
     Layouts should auto-update an internal string representation when changed
     via resize(), move(), place(), or remove().  When the layout's look is
     gathered via get() or __str__(), it will simply spit out the saved
-    representation.  If you muck with a layout in other ways, be forewarned
-    that the internal strings will need to be updated as well.
+    representation; get_colorized() returns the same thing already run
+    through colorize() (and, for ANSI, optimize_sgr()), which layouts may
+    cache however they like.  If you muck with a layout in other ways, be
+    forewarned that the internal strings will need to be updated as well.
     """
 
     def __init__(self):
@@ -48,6 +52,12 @@ class Layout(object):
 
         return self.__repr__()
 
+    def get_colorized(self, ansi=True):
+
+        # Override this function if your layout can cache its colorized
+        # form; the default simply colorizes the representation every time.
+        return colorize(self.representation, ansi, optimize=True)
+
     def update(self):
 
         # Override this function with the bits that actually generate the
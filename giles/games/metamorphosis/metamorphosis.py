@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
 from giles.state import State
 from giles.utils import booleanize
@@ -129,18 +130,19 @@ class Metamorphosis(SeatedGame):
         self.printable_board.append("   ^m`=" + "".join(["=="] * self.size) + "'^~\n")
         self.printable_board.append(col_str + "\n")
 
-    def show(self, player):
+    def get_public_view(self):
 
         if not self.printable_board:
             self.update_printable_board()
-        for line in self.printable_board:
-            player.tell_cc(line)
-        player.tell_cc(self.get_turn_str() + "\n")
+        return ["".join(self.printable_board), self.get_turn_str() + "\n"]
+
+    def show(self, player):
+
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def get_turn_str(self):
 
@@ -408,105 +410,48 @@ class Metamorphosis(SeatedGame):
         self.channel.broadcast_cc("^Y%s^~ has swapped ^KBlack^~'s first move.\n" % (player))
         self.turn_number += 1
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("size", "sz",):
-
-                    if len(command_bits) == 2:
-                        self.set_size(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid size command.\n")
-                    handled = True
-
-                elif primary in ("ko",):
-
-                    if len(command_bits) == 2:
-                        self.set_ko_fight(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid ko command.\n")
-                    handled = True
-
-                if primary in ("done", "ready", "d", "r",):
-
-                    self.channel.broadcast_cc(self.prefix + "The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
+    def handle_move(self, player, move_bits):
 
-                    self.state.set("setup")
-                    self.channel.broadcast_cc(self.prefix + "^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
-
-                if primary in ("move", "play", "mv", "pl",):
-
-                    invalid = False
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.move(player, move_bits[0])
-                    else:
-                        invalid = True
-
-                    if invalid:
-                        player.tell_cc(self.prefix + "Invalid move command.\n")
-                    handled = True
-
-                elif primary in ("swap",):
-
-                    if self.seats[1].player == player and self.turn_number == 2:
-                        self.swap(player)
-                        made_move = True
-                    else:
-                        player.tell_cc(self.prefix + "Invalid swap command.\n")
-                    handled = True
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.move(player, move_bits[0]):
+                self.end_turn()
+        else:
+            player.tell_cc(self.prefix + "Invalid move command.\n")
 
-                elif primary in ("resign",):
+    def handle_swap(self, player):
 
-                    if self.resign(player):
-                        made_move = True
+        if self.seats[1].player == player and self.turn_number == 2:
+            self.swap(player)
+            self.end_turn()
+        else:
+            player.tell_cc(self.prefix + "Invalid swap command.\n")
 
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_turn()
 
-                    # Okay, something happened on the board.  Update.
-                    self.update_printable_board()
+    def end_turn(self):
 
-                    # Did someone win?
-                    winner = self.find_winner()
-                    if winner:
-                        self.resolve(winner)
-                        self.finish()
-                    else:
+        # Okay, something happened on the board.  Update.
+        self.update_printable_board()
 
-                        # Nope.  Switch turns...
-                        if self.turn == BLACK:
-                            self.turn = WHITE
-                        else:
-                            self.turn = BLACK
+        # Did someone win?
+        winner = self.find_winner()
+        if winner:
+            self.resolve(winner)
+            self.finish()
+        else:
 
-                        # ...show everyone the board, and keep on.
-                        self.send_board()
+            # Nope.  Switch turns...
+            if self.turn == BLACK:
+                self.turn = WHITE
+            else:
+                self.turn = BLACK
 
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+            # ...show everyone the board, and keep on.
+            self.send_board()
 
     def find_winner(self):
 
@@ -575,15 +520,27 @@ class Metamorphosis(SeatedGame):
         self.send_board()
         self.channel.broadcast_cc(self.prefix + "^C%s^~ wins!\n" % winner)
 
-    def show_help(self, player):
-
-        super(Metamorphosis, self).show_help(player)
-        player.tell_cc("\nMETAMORPHOSIS SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("                    ^!ko^. on|off     Enable/disable ko fight mode.\n")
-        player.tell_cc("             ^!size^. <size>,  ^!sz^.     Set board to <size>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nMETAMORPHOSIS PLAY:\n\n")
-        player.tell_cc("      ^!move^. <ln>, ^!play^., ^!mv^., ^!pl^.     Make move <ln> (letter number).\n")
-        player.tell_cc("                         ^!swap^.     Swap the first move (only White, only their first).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Metamorphosis's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="METAMORPHOSIS SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("ko",), "handle_one_arg", TAKES_ARGS, "on|off",
+             "Enable/disable ko fight mode.", "METAMORPHOSIS SETUP PHASE",
+             states=("setup",), setter="set_ko_fight", what="ko")
+COMMANDS.add(("size", "sz"), "handle_one_arg", TAKES_ARGS, "<size>",
+             "Set board to <size>.", "METAMORPHOSIS SETUP PHASE",
+             states=("setup",), setter="set_size", what="size")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="METAMORPHOSIS SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Make move <ln> (letter number).", "METAMORPHOSIS PLAY",
+             states=("playing",))
+COMMANDS.add(("swap",), "handle_swap",
+             desc="Swap the first move (only White, only their first).",
+             section="METAMORPHOSIS PLAY", states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="METAMORPHOSIS PLAY", states=("playing",))
+
+Metamorphosis.commands = COMMANDS
@@ -16,7 +16,7 @@
 
 from random import choice
 
-from giles.games.hand import Hand
+from giles.games.deck import Deck
 
 ACE = "Ace"
 JACK = "Jack"
@@ -39,6 +39,18 @@ SUITS = [CLUBS, DIAMONDS, HEARTS, SPADES]
 SHORT = "short"
 LONG = "long"
 
+# Each card also has a bit of its own, for hands held as bitmasks (see
+# trick.py).  The bits are suit-major: every suit gets SUIT_WIDTH bits, and
+# a card's bit within its suit is its value, so the four standard suits fit
+# in 64 bits.
+SUIT_WIDTH = 16
+SUIT_BITS = (1 << SUIT_WIDTH) - 1
+
+# Every card ever made, keyed by class, rank, suit, and ace-highness.  Cards
+# never change once made, so there's only ever one of each; see
+# PlayingCard.__new__().
+INTERNED_CARDS = {}
+
 class PlayingCard(object):
     """PlayingCard is an implementation of a traditional 52-card deck of playing
     cards.
@@ -52,66 +64,115 @@ class PlayingCard(object):
     is not a bug; it allows for simple constructions such as "if mycard in
     myhand" without having to go through absurd gymnastics.
 
+    Cards are flyweights: asking for the same card twice returns the same
+    object, with its value (.ordinal), the position of its suit in SUITS
+    (.suit_index), its bit (.bit, or 0 for jokers), and its short and long
+    display strings all worked out when it was first made.  Comparisons are therefore plain integer
+    comparisons.  Subclasses override rank_value(), make_short_str(), and
+    make_long_str(), and can supply their own SUIT_ORDER.
+
     Methods of note are:  __repr__(), value(), and all ordinal comparisons, e.g.
     __lt__().
     """
 
-    def __init__(self, r=None, s=None, ace_high=True):
-        self.rank = r
-        self.suit = s
-        self.ace_high = ace_high
+    __slots__ = ("rank", "suit", "ace_high", "ordinal", "suit_index", "bit",
+                 "short_str", "long_str", "hash_value")
+
+    SUIT_ORDER = SUITS + [BLACK, RED]
+
+    def __new__(cls, r=None, s=None, ace_high=True):
+
+        # Ranks can come in as numbers (from str_to_card(), say); store them
+        # the same way as RANKS does, so that equal cards are the same card.
+        if type(r) == int:
+            r = str(r)
+
+        key = (cls, r, s, ace_high)
+        card = INTERNED_CARDS.get(key)
+        if card is None:
+            card = object.__new__(cls)
+            card.rank = r
+            card.suit = s
+            card.ace_high = ace_high
+            card.ordinal = card.rank_value()
+            if s in cls.SUIT_ORDER:
+                card.suit_index = cls.SUIT_ORDER.index(s)
+            else:
+                card.suit_index = None
+            card.bit = 0
+            if card.ordinal is not None and card.suit_index is not None:
+                card.bit = 1 << (card.suit_index * SUIT_WIDTH + card.ordinal)
+            card.short_str = card.make_short_str()
+            card.long_str = card.make_long_str()
+            card.hash_value = hash((card.ordinal, s))
+            INTERNED_CARDS[key] = card
+        return card
+
+    def __reduce__(self):
+        # Copies (and unpickled cards) come back as the interned card.
+        return (self.__class__, (self.rank, self.suit, self.ace_high))
 
     def __repr__(self):
-        if self.rank == JOKER:
-            return ("the %s Joker" % (self.suit))
-        else:
-            return ("the %s of %s" % (self.rank, self.suit))
+        return self.long_str
 
     def __lt__(self, other):
-        if not (self.value() or other.value()):
+        if not (self.ordinal or other.ordinal):
             return NotImplemented
         else:
-            return self.value() < other.value()
+            return self.ordinal < other.ordinal
 
     def __le__(self, other):
-        if not (self.value() or other.value()):
+        if not (self.ordinal or other.ordinal):
             return NotImplemented
         else:
-            return self.value() <= other.value()
+            return self.ordinal <= other.ordinal
 
     def __eq__(self, other):
-        if not (self.value() or other.value()):
+        if self is other:
+            return True
+        if not (self.ordinal or other.ordinal):
             return NotImplemented
         else:
             # okay, so here's an interesting edge case.  Cards of differing
             # ranks of course can be compared.  however, the Three of Clubs is
             # not the same card as the Three of Diamonds.
-            return self.value() == other.value() and self.suit == other.suit
+            return self.ordinal == other.ordinal and self.suit == other.suit
+
+    def __hash__(self):
+        # Equal cards have equal values and suits, so they must hash alike;
+        # Hand relies on this for its membership index.
+        return self.hash_value
 
     def __ne__(self, other):
-        if not (self.value() or other.value()):
+        if self is other:
+            return False
+        if not (self.ordinal or other.ordinal):
             return NotImplemented
         else:
-            return self.value() != other.value() or self.suit != other.suit
+            return self.ordinal != other.ordinal or self.suit != other.suit
 
     def __ge__(self, other):
-        if not (self.value() or other.value()):
+        if not (self.ordinal or other.ordinal):
             return NotImplemented
         else:
-            return self.value() >= other.value()
+            return self.ordinal >= other.ordinal
 
     def __gt__(self, other):
-        if not (self.value() or other.value()):
+        if not (self.ordinal or other.ordinal):
             return NotImplemented
         else:
-            return self.value() > other.value()
+            return self.ordinal > other.ordinal
 
     def value(self):
+        return self.ordinal
+
+    def rank_value(self):
+
+        # Works out the card's value from its rank.  Only ever called once
+        # per card, when it's first made.
         r = self.rank
-        if r == JOKER:
+        if r == JOKER or r is None:
             return None
-        if type(r) == int:
-            return r
         if r.isdigit():
             return int(r)
         else:
@@ -129,6 +190,28 @@ class PlayingCard(object):
             else:
                 return None
 
+    def make_short_str(self):
+
+        if not self.suit:
+            return "  "
+        short_suit = self.suit[0].upper()
+        value = self.ordinal
+        if value in range(2, 10):
+            short_rank = str(value)
+        elif value == 10:
+            short_rank = "t"
+        elif value:
+            short_rank = "%s" % self.rank[0].lower()
+        else:
+            short_rank = "?"
+        return ("%s%s" % (short_rank, short_suit))
+
+    def make_long_str(self):
+        if self.rank == JOKER:
+            return ("the %s Joker" % (self.suit))
+        else:
+            return ("the %s of %s" % (self.rank, self.suit))
+
 def str_to_card(card_str):
 
     # This function is meant to take something like "10s" or "KH" and return
@@ -140,6 +223,15 @@ def str_to_card(card_str):
     if not card_str or type(card_str) != str or len(card_str) < 2:
         return None
 
+    # The usual spellings of every card are in CARD_STRS; only anything
+    # unusual needs parsing.
+    card = CARD_STRS.get(card_str.lower())
+    if card:
+        return card
+    return parse_card_str(card_str)
+
+def parse_card_str(card_str):
+
     # If it's three characters long and the first isn't a 1, it's also not a
     # card.  Same if it's just "10" by itself.
     if (len(card_str) == 3 and card_str[0] != "1") or (card_str == "10"):
@@ -216,12 +308,13 @@ def str_to_card(card_str):
 def random_card():
     return PlayingCard(choice(RANKS), choice(SUITS))
 
+def get_card(r, s, ace_high=True):
+
+    # Returns the (shared) card of a given rank and suit.
+    return PlayingCard(r, s, ace_high)
+
 def new_deck(ace_high=True):
-    deck = Hand()
-    for r in RANKS:
-        for s in SUITS:
-            deck.add(PlayingCard(r, s, ace_high))
-    return deck
+    return Deck([get_card(r, s, ace_high) for r in RANKS for s in SUITS])
 
 def card_to_str(card, mode=SHORT):
 
@@ -233,19 +326,9 @@ def card_to_str(card, mode=SHORT):
 
         if not card:
             return "  "
-        short_suit = card.suit[0].upper()
-        value = card.value()
-        if value in range(2, 10):
-            short_rank = str(value)
-        elif value == 10:
-            short_rank = "t"
-        elif value:
-            short_rank = "%s" % card.rank[0].lower()
-        else:
-            short_rank = "?"
-        return ("%s%s" % (short_rank, short_suit))
+        return card.short_str
     elif mode == LONG:
-        return (repr(card))
+        return card.long_str
 
     return ""
 
@@ -274,3 +357,25 @@ def hand_to_str(hand, trump_suit=None, is_sorted=True):
         to_return += "%s%s^~ " % (color_code, card_to_str(card))
 
     return to_return
+
+def build_card_strs():
+
+    # Every spelling of every card that str_to_card() is likely to see:
+    # rank then suit, in lowercase, with "1" or "a" for an ace and "10" or
+    # "t" for a ten.  Jokers are "?" with any suit or "b"/"r".
+    rank_strs = {"a": ACE, "1": ACE, "t": "10", "10": "10", "j": JACK,
+                 "q": QUEEN, "k": KING}
+    for rank in range(2, 10):
+        rank_strs[str(rank)] = str(rank)
+    suit_strs = {"c": CLUBS, "d": DIAMONDS, "h": HEARTS, "s": SPADES}
+
+    card_strs = {}
+    for rank_str in rank_strs:
+        for suit_str in suit_strs:
+            card_strs[rank_str + suit_str] = PlayingCard(rank_strs[rank_str], suit_strs[suit_str])
+    suit_strs.update({"b": BLACK, "r": RED})
+    for suit_str in suit_strs:
+        card_strs["?" + suit_str] = PlayingCard(JOKER, suit_strs[suit_str])
+    return card_strs
+
+CARD_STRS = build_card_strs()
@@ -16,9 +16,10 @@
 
 import random
 
+from giles.command import CommandTable, TAKES_ARGS
 from giles.utils import get_plural_str
 from giles.state import State
-from giles.games.seated_game import SeatedGame
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
 
 # Minimums and maximums.
@@ -258,7 +259,7 @@ class Poison(SeatedGame):
         seat = self.get_seat_of_player(player)
         if not seat:
             self.tell_pre(player, "You're not playing!\n")
-            return False
+            return
 
         self.tell_pre(player, "You have ^C%s^~ and ^R%s^~ overall.\n" % (get_plural_str(seat.data.antidotes, "antidote"), get_plural_str(seat.data.poisons, "poison")))
 
@@ -579,187 +580,95 @@ class Poison(SeatedGame):
                     self.tell_pre(seat.player, "You still must quaff ^C%s^~.\n" % get_plural_str(seat.data.bid - seat.data.quaffed, "potion"))
                     return True
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-
-            command_bits = command_str.split()
-            primary = command_bits[0].lower()
-            played = False
-            bid = False
-
-            if state == "need_players":
-
-                if primary in ('antidotes', 'anti', 'an'):
-                    if len(command_bits) == 2:
-                        self.set_antidote_count(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid antidotes command.\n")
-                    handled = True
-
-                elif primary in ('poisons', 'pois', 'po'):
-                    if len(command_bits) == 2:
-                        self.set_poison_count(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid poisons command.\n")
-                    handled = True
-
-                elif primary in ('goal', 'score'):
-                    if len(command_bits) == 2:
-                        self.set_goal(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid goal command.\n")
-                    handled = True
-
-                elif primary in ('start',):
-                    player_count = len([x for x in self.seats if x.player])
-                    if player_count < 3:
-                        self.tell_pre(player, "Need at least 3 players!\n")
-                    else:
-                        self.channel.broadcast_cc(self.prefix + "Game on!\n")
-                        self.start_game()
-                    handled = True
-
-            elif state == "initial_placement":
-
-                if primary in _PLAY_LIST:
-                    if len(command_bits) == 2:
-                        played = self.play(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid play command.\n")
-                    handled = True
-                elif primary in _INVENTORY_LIST:
-                    self.inventory(player)
-                    handled = True
-
-            elif state == "playing":
-
-                if primary in _PLAY_LIST:
-                    if len(command_bits) == 2:
-                        played = self.play(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid play command.\n")
-                    handled = True
-                elif primary in _INVENTORY_LIST:
-                    self.inventory(player)
-                    handled = True
-                elif primary in _BID_LIST:
-                    if len(command_bits) == 2:
-                        bid = self.bid(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid bid command.\n")
-                    handled = True
-
-                if played:
-
-                    # It's the next player's turn.
-                    self.turn = self.next_seat(self.turn)
-                    self.tell_pre(self.turn.player, "It is your turn.\n")
-
-                elif bid:
-
-                    # If the bid is for "every potion there is," immediately
-                    # jump to autoquaff mode.
-                    if self._count_racked_potions() == self.turn.data.bid:
-                        self.bc_pre("%s has bid for all the potions!\n" % self.get_sp_str(self.turn))
-                        self.state.set("autoquaffing")
-
-                    else:
-
-                        # Start of a bidding round.  Make sure everyone can bid.
-                        self.state.set("bidding")
-                        for seat in self.seats:
-                            if seat != self.turn:
-                                seat.data.bid = 0
-                            if not seat.data.is_dead:
-                                seat.data.is_bidding = True
-
-                        # ...set the high bid...
-                        self.highest_bidder = self.turn
-
-                        # ...and pass the buck.
-                        self.turn = self.next_seat(self.turn, bidding=True)
-                        self.tell_pre(self.turn.player, "It is your turn to bid or pass.\n")
-
-            elif state == "bidding":
-
-                if primary in _BID_LIST:
-                    if len(command_bits) == 2:
-                        bid = self.bid(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid bid command.\n")
-                    handled = True
-
-                elif primary in _INVENTORY_LIST:
-                    self.inventory(player)
-                    handled = True
-
-                elif primary in ('pass', 'pa', 'p'):
-
-                    # No need for a function, as this one's easy.
-                    self.turn.data.is_bidding = False
-                    self.bc_pre("%s has passed and is no longer bidding.\n" % self.get_sp_str(self.turn))
-
-                    # Get the next player...
-                    self.turn = self.next_seat(self.turn, bidding=True)
-
-                    # ...and see if it's the highest bidder.  If it is, they
-                    # won the bidding.
-                    if self.turn == self.highest_bidder:
-                        self.bc_pre("%s has won the bid with ^Y%s^~.\n" % (self.get_sp_str(self.turn), get_plural_str(self.turn.data.bid, "potion")))
-                        self.state.set("autoquaffing")
-                    else:
-                        self.tell_pre(self.turn.player, "It is your turn to bid or pass.\n")
-
-                    handled = True
-                if bid:
-
-                    # If the bid is the count of racked potions, we're done.
-                    if self._count_racked_potions() == self.turn.data.bid:
-                        self.bc_pre("%s has bid for all the potions!\n" % self.get_sp_str(self.turn))
-                        self.state.set("autoquaffing")
-
-                    else:
-
-                        # New highest bidder.  Set it and go around.
-                        self.highest_bidder = self.turn
-
-                        self.turn = self.next_seat(self.turn, bidding=True)
-                        self.tell_pre(self.turn.player, "It is your turn to bid or pass.\n")
-
-            elif state == "choosing_player" or state == "quaffing":
-
-                if primary in _PICK_LIST:
-                    if len(command_bits) == 2:
-                        self.pick(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid pick command.\n")
-                    handled = True
-
-                elif primary in _INVENTORY_LIST:
-                    self.inventory(player)
-                    handled = True
-
-            elif state == "tossing":
+    def handle_start(self, player):
+
+        player_count = len([x for x in self.seats if x.player])
+        if player_count < 3:
+            self.tell_pre(player, "Need at least 3 players!\n")
+        else:
+            self.channel.broadcast_cc(self.prefix + "Game on!\n")
+            self.start_game()
+
+    def handle_play(self, player, play_bits):
+
+        if len(play_bits) == 1:
+            if self.play(player, play_bits[0]):
 
-                if primary in ('toss', 'to'):
-                    if len(command_bits) == 2:
-                        self.toss(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid toss command.\n")
-                    handled = True
+                # It's the next player's turn.
+                self.turn = self.next_seat(self.turn)
+                self.tell_pre(self.turn.player, "It is your turn.\n")
+        else:
+            self.tell_pre(player, "Invalid play command.\n")
 
-                elif primary in _INVENTORY_LIST:
-                    self.inventory(player)
-                    handled = True
+    def handle_opening_bid(self, player, bid_bits):
+
+        if len(bid_bits) != 1:
+            self.tell_pre(player, "Invalid bid command.\n")
+            return
+
+        if not self.bid(player, bid_bits[0]):
+            return
+
+        # If the bid is for "every potion there is," immediately
+        # jump to autoquaff mode.
+        if self._count_racked_potions() == self.turn.data.bid:
+            self.bc_pre("%s has bid for all the potions!\n" % self.get_sp_str(self.turn))
+            self.state.set("autoquaffing")
+
+        else:
+
+            # Start of a bidding round.  Make sure everyone can bid.
+            self.state.set("bidding")
+            for seat in self.seats:
+                if seat != self.turn:
+                    seat.data.bid = 0
+                if not seat.data.is_dead:
+                    seat.data.is_bidding = True
 
-            if not handled:
-                self.tell_pre(player, "Invalid command.\n")
+            # ...set the high bid...
+            self.highest_bidder = self.turn
+
+            # ...and pass the buck.
+            self.turn = self.next_seat(self.turn, bidding=True)
+            self.tell_pre(self.turn.player, "It is your turn to bid or pass.\n")
+
+    def handle_bid(self, player, bid_bits):
+
+        if len(bid_bits) != 1:
+            self.tell_pre(player, "Invalid bid command.\n")
+            return
+
+        if not self.bid(player, bid_bits[0]):
+            return
+
+        # If the bid is the count of racked potions, we're done.
+        if self._count_racked_potions() == self.turn.data.bid:
+            self.bc_pre("%s has bid for all the potions!\n" % self.get_sp_str(self.turn))
+            self.state.set("autoquaffing")
+
+        else:
+
+            # New highest bidder.  Set it and go around.
+            self.highest_bidder = self.turn
+
+            self.turn = self.next_seat(self.turn, bidding=True)
+            self.tell_pre(self.turn.player, "It is your turn to bid or pass.\n")
+
+    def handle_pass(self, player):
+
+        self.turn.data.is_bidding = False
+        self.bc_pre("%s has passed and is no longer bidding.\n" % self.get_sp_str(self.turn))
+
+        # Get the next player...
+        self.turn = self.next_seat(self.turn, bidding=True)
+
+        # ...and see if it's the highest bidder.  If it is, they
+        # won the bidding.
+        if self.turn == self.highest_bidder:
+            self.bc_pre("%s has won the bid with ^Y%s^~.\n" % (self.get_sp_str(self.turn), get_plural_str(self.turn.data.bid, "potion")))
+            self.state.set("autoquaffing")
+        else:
+            self.tell_pre(self.turn.player, "It is your turn to bid or pass.\n")
 
     def tick(self):
 
@@ -783,18 +692,47 @@ class Poison(SeatedGame):
         elif state == "autoquaffing":
             self.autoquaff(self.turn)
 
-    def show_help(self, player):
-
-        super(Poison, self).show_help(player)
-        player.tell_cc("\nPOISON SETUP PHASE:\n\n")
-        player.tell_cc("              ^!antidotes^. <num>     Set the antidote count to <num> (%d-%d).\n" % (MIN_ANTIDOTE_COUNT, MAX_ANTIDOTE_COUNT))
-        player.tell_cc("                ^!poisons^. <num>     Set the poison count to <num> (%d-%d).\n" % (MIN_POISON_COUNT, MAX_POISON_COUNT))
-        player.tell_cc("                   ^!goal^. <num>     Set the goal score to <num> (%d-%d).\n" % (MIN_GOAL, MAX_GOAL))
-        player.tell_cc("                        ^!start^.     Start the game.\n")
-        player.tell_cc("\nPOISON PLAY:\n\n")
-        player.tell_cc("       ^!play^. a|p, ^!pl^., ^!rack^., ^!ra^.     Play an antidote or poison.\n")
-        player.tell_cc("            ^!inventory^., ^!inv^., ^!i^.     Check your potion inventory.\n")
-        player.tell_cc("                    ^!bid^. <num>     Bid <num> quaffs.\n")
-        player.tell_cc("                         ^!pass^.     Pass on bidding.\n")
-        player.tell_cc("          ^!pick^. <seat>, ^!pi^., ^!ch^.     Pick potion or player at <seat>.\n")
-        player.tell_cc("                     ^!toss^. a|p     Toss an antidote or poison.\n")
+# Poison's own commands, on top of the seated ones.
+_POTION_STATES = ("initial_placement", "playing", "bidding",
+                  "choosing_player", "quaffing", "tossing")
+
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("antidotes", "anti", "an"), "handle_one_arg", TAKES_ARGS,
+             "<num>", "Set the antidote count to <num> (%d-%d)." %
+             (MIN_ANTIDOTE_COUNT, MAX_ANTIDOTE_COUNT), "POISON SETUP PHASE",
+             shown=("antidotes",), states=("need_players",),
+             setter="set_antidote_count", what="antidotes")
+COMMANDS.add(("poisons", "pois", "po"), "handle_one_arg", TAKES_ARGS,
+             "<num>", "Set the poison count to <num> (%d-%d)." %
+             (MIN_POISON_COUNT, MAX_POISON_COUNT), "POISON SETUP PHASE",
+             shown=("poisons",), states=("need_players",),
+             setter="set_poison_count", what="poisons")
+COMMANDS.add(("goal", "score"), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Set the goal score to <num> (%d-%d)." % (MIN_GOAL, MAX_GOAL),
+             "POISON SETUP PHASE", shown=("goal",), states=("need_players",),
+             setter="set_goal", what="goal")
+COMMANDS.add(("start",), "handle_start", desc="Start the game.",
+             section="POISON SETUP PHASE", states=("need_players",))
+COMMANDS.add(_PLAY_LIST, "handle_one_arg", TAKES_ARGS, "a|p",
+             "Play an antidote or poison.", "POISON PLAY",
+             shown=("play", "pl", "rack", "ra"), states=("initial_placement",),
+             setter="play", what="play")
+COMMANDS.add(_PLAY_LIST, "handle_play", TAKES_ARGS, states=("playing",))
+COMMANDS.add(_INVENTORY_LIST, "inventory",
+             desc="Check your potion inventory.", section="POISON PLAY",
+             states=_POTION_STATES)
+COMMANDS.add(_BID_LIST, "handle_opening_bid", TAKES_ARGS, "<num>",
+             "Bid <num> quaffs.", "POISON PLAY", shown=("bid",),
+             states=("playing",))
+COMMANDS.add(_BID_LIST, "handle_bid", TAKES_ARGS, states=("bidding",))
+COMMANDS.add(("pass", "pa", "p"), "handle_pass", desc="Pass on bidding.",
+             section="POISON PLAY", shown=("pass",), states=("bidding",))
+COMMANDS.add(_PICK_LIST, "handle_one_arg", TAKES_ARGS, "<seat>",
+             "Pick potion or player at <seat>.", "POISON PLAY",
+             shown=("pick", "pi", "ch"), states=("choosing_player", "quaffing"),
+             setter="pick", what="pick")
+COMMANDS.add(("toss", "to"), "handle_one_arg", TAKES_ARGS, "a|p",
+             "Toss an antidote or poison.", "POISON PLAY", shown=("toss",),
+             states=("tossing",), setter="toss", what="toss")
+
+Poison.commands = COMMANDS
@@ -0,0 +1,94 @@
+# Giles: printable_board.py
+# Copyright 2012 Phil Bordelon
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from giles.games.layout import Layout
+from miniboa.xterm import colorize
+
+class PrintableBoard(Layout):
+    """A layout that is nothing more than a list of caret-coded lines, for
+    games that keep their own board state and render it themselves.
+
+    Every line is stored along with a key describing whatever it was drawn
+    from (typically a tuple of the row's contents and any highlighting).
+    Renderers ask is_stale() before building a line and only rebuild the
+    ones whose key has changed; update() then joins the lines, and
+    get_colorized() hands out a single pre-joined, pre-colorized (and
+    SGR-optimized) buffer per ANSI mode, colorizing only the lines that
+    changed since last time.
+    """
+
+    def __init__(self):
+
+        super(PrintableBoard, self).__init__()
+
+        self.lines = []
+        self.keys = []
+        self.line_colorized = []
+        self.colorized = {}
+        self.changed = False
+
+    def __len__(self):
+
+        return len(self.lines)
+
+    def __iter__(self):
+
+        return iter(self.lines)
+
+    def resize(self, line_count):
+
+        # Grow or shrink the line list; new lines are always stale.
+        if line_count < len(self.lines):
+            del self.lines[line_count:]
+            del self.keys[line_count:]
+            del self.line_colorized[line_count:]
+            self.changed = True
+        while len(self.lines) < line_count:
+            self.lines.append("")
+            self.keys.append(None)
+            self.line_colorized.append({})
+            self.changed = True
+
+    def is_stale(self, index, key):
+
+        return self.keys[index] != key
+
+    def set_line(self, index, line, key=None):
+
+        self.keys[index] = key
+        if self.lines[index] != line:
+            self.lines[index] = line
+            self.line_colorized[index] = {}
+            self.changed = True
+
+    def update(self):
+
+        if self.changed or not self.representation:
+            self.representation = "".join(self.lines)
+            self.colorized = {}
+            self.changed = False
+
+    def get_colorized(self, ansi=True):
+
+        if ansi not in self.colorized:
+            bits = []
+            for i, line in enumerate(self.lines):
+                cache = self.line_colorized[i]
+                if ansi not in cache:
+                    cache[ansi] = colorize(line, ansi, optimize=True)
+                bits.append(cache[ansi])
+            self.colorized[ansi] = "".join(bits)
+        return self.colorized[ansi]
@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.piece import Piece
 from giles.games.seat import Seat
 from giles.games.square_grid_layout import SquareGridLayout, COLS
@@ -100,15 +101,17 @@ class Redstone(SeatedGame):
 
         return "It is ^C%s^~'s turn (%s).\n" % (self.turn.player_name, self.turn.data.seat_str)
 
+    def get_public_view(self):
+
+        return [self.layout, self.get_turn_str()]
+
     def show(self, player):
 
-        player.tell_cc(self.layout)
-        player.tell_cc(self.get_turn_str())
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def set_size(self, player, size_bits):
 
@@ -370,83 +373,44 @@ class Redstone(SeatedGame):
             self.turn = self.black
             self.send_board()
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.lower().split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("size", "sz"):
-
-                    self.set_size(player, command_bits[1:])
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
-
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
+    def handle_move(self, player, move_bits):
 
-                if primary in ("config", "setup", "conf",):
-
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    self.state.set("setup")
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
-
-                if primary in ("move", "play", "mv", "pl",):
-
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.move(player, move_bits[0])
-                    else:
-                        self.tell_pre(player, "Invalid move command.\n")
-                    handled = True
-
-                if primary in ("redstone", "red", "r",):
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.move(player, move_bits[0]):
+                self.end_turn()
+        else:
+            self.tell_pre(player, "Invalid move command.\n")
 
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.red(player, move_bits[0])
-                    else:
-                        self.tell_pre(player, "Invalid red command.\n")
-                    handled = True
+    def handle_red(self, player, move_bits):
 
-                elif primary in ("resign",):
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.red(player, move_bits[0]):
+                self.end_turn()
+        else:
+            self.tell_pre(player, "Invalid red command.\n")
 
-                    made_move = self.resign(player)
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_turn()
 
-                    # Did someone win?
-                    winner = self.find_winner()
+    def end_turn(self):
 
-                    if winner:
+        # Did someone win?
+        winner = self.find_winner()
 
-                        # Yup!
-                        self.resolve(winner)
-                        self.finish()
-                    else:
+        if winner:
 
-                        # No.  Switch turns.
-                        self.turn = self.next_seat(self.turn)
-                        self.send_board()
+            # Yup!
+            self.resolve(winner)
+            self.finish()
+        else:
 
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+            # No.  Switch turns.
+            self.turn = self.next_seat(self.turn)
+            self.send_board()
 
     def find_winner(self):
 
@@ -487,14 +451,24 @@ class Redstone(SeatedGame):
         self.send_board()
         self.bc_pre("%s wins!\n" % self.get_sp_str(winner))
 
-    def show_help(self, player):
-
-        super(Redstone, self).show_help(player)
-        player.tell_cc("\nREDSTONE SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("             ^!size^. <size>,  ^!sz^.     Set board to <size>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nREDSTONE PLAY:\n\n")
-        player.tell_cc("      ^!move^. <ln>, ^!play^., ^!mv^., ^!pl^.     Make move <ln> (letter number).\n")
-        player.tell_cc("                  ^!red^. <ln>, ^!r^.     Place redstone at <ln> (letter number).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Redstone's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="REDSTONE SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "set_size", TAKES_ARGS, "<size>",
+             "Set board to <size>.", "REDSTONE SETUP PHASE",
+             states=("setup",))
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="REDSTONE SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Make move <ln> (letter number).", "REDSTONE PLAY",
+             states=("playing",))
+COMMANDS.add(("redstone", "red", "r"), "handle_red", TAKES_ARGS, "<ln>",
+             "Place redstone at <ln> (letter number).", "REDSTONE PLAY",
+             shown=("red", "r"), states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="REDSTONE PLAY", states=("playing",))
+
+Redstone.commands = COMMANDS
@@ -14,12 +14,15 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from giles.command import CommandTable, TAKES_ARGS, TAKES_COMMAND
 from giles.state import State
-from giles.games.seated_game import SeatedGame
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
 
 TAGS = ["abstract", "turnless", "2p"]
 
+_THROW_LIST = ('r', 'p', 's', 'rock', 'paper', 'scissors')
+
 class RockPaperScissors(SeatedGame):
     """A Rock-Paper-Scissors game table implementation.
     """
@@ -47,26 +50,11 @@ class RockPaperScissors(SeatedGame):
 
     def handle(self, player, command_str):
 
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
         state = self.state.get()
 
-        if state == "need_moves":
-
-            command_bits = command_str.split()
-            primary = command_bits[0].lower()
+        super(RockPaperScissors, self).handle(player, command_str)
 
-            # If this player is used to prefacing plays with 'move'/'play',
-            # let's be polite and just chomp that away.  Also allow 'throw'
-            # and 'th', even though they're undocumented, because they seem
-            # like an obvious sort of command to try.  (Read that as: I kept
-            # typing it.)
-            if primary in ('move', 'play', 'throw', 'mv', 'pl', 'th') and len(command_bits) > 1:
-                primary = command_bits[1].lower()
-            if primary in ('r', 'p', 's', 'rock', 'paper', 'scissors'):
-                self.move(player, primary)
-                handled = True
+        if state == "need_moves":
 
             if self.plays[0] and self.plays[1] and self.active:
 
@@ -74,8 +62,20 @@ class RockPaperScissors(SeatedGame):
                 self.resolve()
                 self.finish()
 
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+    def handle_throw(self, player, command):
+
+        self.move(player, command.primary)
+
+    def handle_move(self, player, move_bits):
+
+        # If this player is used to prefacing plays with 'move'/'play',
+        # let's be polite and just chomp that away.  Also allow 'throw'
+        # and 'th', even though they're undocumented, because they seem
+        # like an obvious sort of command to try.  (Read that as: I kept
+        # typing it.)
+        if not move_bits or move_bits[0].lower() not in _THROW_LIST:
+            return False
+        self.move(player, move_bits[0].lower())
 
     def tick(self):
 
@@ -106,14 +106,6 @@ class RockPaperScissors(SeatedGame):
         else:
             player.tell_cc(self.prefix + "Nothing to see here.  Move along.\n")
 
-    def show_help(self, player):
-
-        super(RockPaperScissors, self).show_help(player)
-        player.tell_cc("\nROCK-PAPER-SCISSORS:\n\n")
-        player.tell_cc("                      ^!rock^., ^!r^.     Throw rock.\n")
-        player.tell_cc("                     ^!paper^., ^!p^.     Throw paper.\n")
-        player.tell_cc("                  ^!scissors^., ^!s^.     Throw scissors.\n")
-
     def move(self, player, play):
 
         seat = self.get_seat_of_player(player)
@@ -166,3 +158,19 @@ class RockPaperScissors(SeatedGame):
         elif self.seats[1].player == player:
             self.plays[1] = None
         super(RockPaperScissors, self).remove_player(player)
+
+# Rock-Paper-Scissors' own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("rock", "r"), "handle_throw", TAKES_COMMAND,
+             desc="Throw rock.", section="ROCK-PAPER-SCISSORS",
+             states=("need_moves",))
+COMMANDS.add(("paper", "p"), "handle_throw", TAKES_COMMAND,
+             desc="Throw paper.", section="ROCK-PAPER-SCISSORS",
+             states=("need_moves",))
+COMMANDS.add(("scissors", "s"), "handle_throw", TAKES_COMMAND,
+             desc="Throw scissors.", section="ROCK-PAPER-SCISSORS",
+             states=("need_moves",))
+COMMANDS.add(("move", "play", "throw", "mv", "pl", "th"), "handle_move",
+             TAKES_ARGS, states=("need_moves",))
+
+RockPaperScissors.commands = COMMANDS
@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.game import Game
+from giles.command import Command, CommandTable, TAKES_ARGS
+from giles.games.game import Game, COMMANDS as GAME_COMMANDS
 from giles.games.seat import Seat
 
 class SeatedGame(Game):
@@ -87,23 +88,6 @@ class SeatedGame(Game):
 
         return None
 
-    def show_help(self, player):
-        self.log_pre("%s asked for help with the game." % player)
-        player.tell_cc("\nVIEWING:\n\n")
-        player.tell_cc("                ^!kibitz^., ^!watch^.     Watch the game as it happens.\n")
-        player.tell_cc("                 ^!list^., ^!who^., ^!w^.     List players and kibitzers.\n")
-        player.tell_cc("                ^!show^., ^!look^., ^!l^.     Look at the game itself.\n")
-        player.tell_cc("        ^!show_config^., ^!showconf^.     Show the game's configuration.\n")
-        player.tell_cc("\nPARTICIPATING:\n\n")
-        player.tell_cc("   ^!join^. [<seat>], ^!add^., ^!sit^., ^!j^.     Join the game [in seat <seat>].\n")
-        player.tell_cc("                 ^!leave^., ^!stand^.     Leave the game.\n")
-        player.tell_cc("      ^!replace^. <seat> <player>     Replace <seat> with <player>.\n")
-        player.tell_cc("            ^!terminate^., ^!finish^.     Terminate game.\n")
-        if self.debug:
-            player.tell_cc("\nDEBUG:\n\n")
-            player.tell_cc("         ^!change_state^. <state>     Change game state to <state>.\n")
-
-
     def add_player(self, player, seat_name=None):
 
         # Is the game already full?
@@ -198,6 +182,7 @@ class SeatedGame(Game):
                 self.bc_pre("^R%s^~ has left the table.\n" % player)
                 self.num_players -= 1
                 seat.stand()
+                player.release_live_board(self)
 
         self.update_active()
 
@@ -274,58 +259,89 @@ class SeatedGame(Game):
 
         return True
 
+    def handle_replace(self, player, replace_bits):
+
+        if len(replace_bits) == 2:
+            self.replace(player, replace_bits[0], replace_bits[1])
+        else:
+            self.tell_pre(player, "Invalid replacement.\n")
+
+    def handle_one_arg(self, player, arg_bits, setter, what):
+
+        # Hands the one argument a command takes to setter; any other
+        # number of them makes it an invalid <what> command.
+        if len(arg_bits) == 1:
+            getattr(self, setter)(player, arg_bits[0])
+        else:
+            self.tell_pre(player, "Invalid %s command.\n" % what)
+
+    def enter_setup(self, player):
+
+        # For games with a setup phase to go back to before anyone sits.
+        self.state.set("setup")
+        self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
+
+    def finish_setup(self, player):
+
+        self.bc_pre("The game is now looking for players.\n")
+        self.state.set("need_players")
+
+    def handle(self, player, command_str):
+
+        # Common commands first, then whatever the game's table has for the
+        # state it's in.  Anything else is invalid.
+        command = Command(command_str)
+        handled = self.handle_common_commands(player, command)
+
+        if not handled:
+            handled = self.commands.dispatch(self, player, command,
+                                             self.state.get())
+
+        if not handled:
+            self.tell_pre(player, "Invalid command.\n")
+
     def handle_common_commands(self, player, command_str):
 
         # This handles certain command bits common to all seated games.
         # It passes the buck to the standard game class first, then:
-        # - If the game is in the "need_players" state, accept new
-        #   players unless we're already at max_players.
-        # - At any point, take these generic commands:
-        #   * replace (replace a player at the table)
-        #   * leave (leave the table)
-        #   * list (show players at the table)
+        # - If the game is finished, reject commands.
+        # - Otherwise, take the seated commands in COMMANDS below; join
+        #   in particular may decline a command if the game overrides it.
         #
         # We also return whether or not we handled the command, which may
         # be useful to games that call us.
 
         # First, let's see if the superclass can handle it.
-        if super(SeatedGame, self).handle_common_commands(player, command_str):
+        command = Command(command_str)
+        if super(SeatedGame, self).handle_common_commands(player, command):
 
             # Yup, it did; we're done.  Return True because it was handled.
             return True
 
-        state = self.state.get()
-
         # Bail if the game is over.
-        if state == "finished":
+        if self.state.get() == "finished":
             self.tell_pre(player, "Game already finished.\n")
             return True
 
-        handled = False
-        # Pull out the command bits.
-        command_bits = command_str.split()
-        primary = command_bits[0].lower()
-
-        if primary in ('replace', 'switch'):
-            if len(command_bits) == 3:
-                self.replace(player, command_bits[1], command_bits[2])
-            else:
-                self.tell_pre(player, "Invalid replacement.\n")
-            handled = True
-
-        elif primary in ('leave', 'stand'):
-            self.leave(player)
-            handled = True
-
-        elif primary in ('list', 'who', 'w'):
-            self.list_players(player)
-            handled = True
-
-        elif primary in ('add', 'join', 'sit', 'j'):
-            handled = self.join(player, command_bits[1:])
+        handled = COMMANDS.dispatch(self, player, command)
 
         # If we've done something, update the active state.
         if handled:
             self.update_active()
 
         return handled
+
+# The base game commands, plus seating.  Games build their own tables on
+# top of this one, adding their commands for the states they're taken in.
+COMMANDS = CommandTable(parent=GAME_COMMANDS)
+COMMANDS.add(("list", "who", "w"), "list_players",
+             desc="List players and kibitzers.", section="VIEWING")
+COMMANDS.add(("join", "add", "sit", "j"), "join", TAKES_ARGS, "[<seat>]",
+             "Join the game [in seat <seat>].", "PARTICIPATING")
+COMMANDS.add(("leave", "stand"), "leave", desc="Leave the game.",
+             section="PARTICIPATING")
+COMMANDS.add(("replace", "switch"), "handle_replace", TAKES_ARGS,
+             "<seat> <player>", "Replace <seat> with <player>.",
+             "PARTICIPATING", shown=("replace",))
+
+SeatedGame.commands = COMMANDS
@@ -17,12 +17,16 @@
 import random
 import time
 
+from giles.command import CommandTable, TAKES_ARGS
 from giles.state import State
 from giles.utils import booleanize
 from giles.utils import demangle_move
-from giles.games.seated_game import SeatedGame
+from giles.games.deck import Deck
+from giles.games.layout import Layout
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
 from giles.utils import Struct, get_plural_str
+from miniboa.xterm import colorize
 
 # Some useful default values.
 DEFAULT_MAX_CARDS = 24
@@ -78,13 +82,91 @@ SQUIGGLE = Struct()
 SQUIGGLE.art = "/\\/\\"
 SQUIGGLE.display = "squiggle"
 
-# Bitfields!
-BITFIELDS = [
-   {1: ONE, 2: TWO, 4: THREE, ONE: 1, TWO: 2, THREE: 4},
-   {1: SMOOTH, 2: WAVY, 4: CHUNKY, SMOOTH: 1, WAVY: 2, CHUNKY: 4},
-   {1: MAGENTA, 2: RED, 4: GREEN, MAGENTA: 1, RED: 2, GREEN: 4},
-   {1: BLOB, 2: LOZENGE, 4: SQUIGGLE, BLOB: 1, LOZENGE: 2, SQUIGGLE: 4},
-]
+# Cards are small integers, 0 to 80: each of the four attributes is a
+# base-3 digit, in the order count, fill, color, shape.  These are the
+# attribute values for each digit, and the place value of each attribute.
+COUNTS = (ONE, TWO, THREE)
+FILLS = (SMOOTH, WAVY, CHUNKY)
+COLORS = (MAGENTA, RED, GREEN)
+SHAPES = (BLOB, LOZENGE, SQUIGGLE)
+PLACES = (27, 9, 3, 1)
+CARD_COUNT = 81
+
+def make_card(count, fill, color, shape):
+    return count * 27 + fill * 9 + color * 3 + shape
+
+def compute_third_card(one, two):
+
+    # In a set, every attribute is either all the same or all different,
+    # so the three digits of each attribute always sum to 0 mod 3.  That
+    # makes the third digit -(one + two) mod 3.
+    three = 0
+    for place in PLACES:
+        three += (-(one / place % 3) - (two / place % 3)) % 3 * place
+    return three
+
+# The attributes for every card, and the third card for every pair.
+CARD_ATTRS = [(COUNTS[c / 27], FILLS[c / 9 % 3], COLORS[c / 3 % 3], SHAPES[c % 3])
+              for c in range(CARD_COUNT)]
+THIRD_CARD = [[compute_third_card(one, two) for two in range(CARD_COUNT)]
+              for one in range(CARD_COUNT)]
+
+def get_card_art_bit(card, line_number):
+    # .----. 1 /~~~~\ |=||=|
+    # |2or3| 2 {    } =    =
+    # |1or3| 3 {    } |    |
+    # |2or3| 4 {    } =    =
+    # `----' 5 \~~~~/ |=||=|
+
+    # Just in case...
+    if line_number < 1 or line_number > 5:
+        return
+
+    # At the end of the game, we will sometimes print blank
+    # spaces where cards should go.  Handle that.
+    if card is None:
+        return "      "
+    count, fill, color, shape = CARD_ATTRS[card]
+
+    # If a line has a piece of art, it looks like this...
+    art_bit = "%s%s^~" % (color.code, shape.art)
+    # ...otherwise this.
+    blank_bit = "    "
+
+    if line_number == 1:
+        return fill.edge_art[0]
+    elif line_number == 2 or line_number == 4:
+        center = blank_bit
+        if count == TWO or count == THREE:
+            center = art_bit
+        return fill.edge_art[1] % center
+    elif line_number == 3:
+        center = blank_bit
+        if count == ONE or count == THREE:
+            center = art_bit
+        return fill.edge_art[2] % center
+    elif line_number == 5:
+        return fill.edge_art[3]
+
+    # Dunno how we got here...
+    return "ERROR"
+
+# The art for every card (and for an empty space, None) in every colorize
+# mode: None for the raw caret codes, True and False for ANSI on and off.
+# Each entry is the five lines of the card, each with its leading space,
+# ready to be joined into a row.  There are only 82 of each, so they're
+# all rendered up front and shared by every game.
+def build_card_art():
+
+    card_art = {}
+    for card in [None] + range(CARD_COUNT):
+        raw_art = tuple([" " + get_card_art_bit(card, x) for x in range(1, 6)])
+        card_art[(card, None)] = raw_art
+        for ansi in (True, False):
+            card_art[(card, ansi)] = tuple([colorize(x, ansi, optimize=True) for x in raw_art])
+    return card_art
+
+CARD_ART = build_card_art()
 
 TAGS = ["card", "random", "turnless", "anyp"]
 
@@ -95,6 +177,86 @@ CONFIG_PARAMS = (
     ("max_cards_on_table", "Maximum cards on the table"),
 )
 
+class SetTable(Layout):
+    """The cards on a Set table, drawn as three rows of card art.
+
+    The table is a list of columns of three cards each.  Every column keeps
+    its lines (five per row, straight out of CARD_ART) for each colorize
+    mode it has been drawn in, and only columns whose cards have changed
+    are rebuilt.  Composing the table is then just joining those lines
+    across the columns, once for the representation and once per ANSI mode
+    asked for by get_colorized().
+    """
+
+    def __init__(self):
+
+        super(SetTable, self).__init__()
+
+        self.columns = []
+        self.column_lines = []
+        self.message = None
+        self.colorized = {}
+
+    def show_message(self, message):
+
+        # Show a message in place of the table.
+        self.columns = []
+        self.column_lines = []
+        self.message = message
+        self.representation = message
+        self.colorized = {}
+
+    def update(self, cards):
+
+        columns = [tuple(cards[x:x + 3]) for x in range(0, len(cards), 3)]
+        if columns == self.columns and self.message is None:
+            return
+
+        # Throw away the lines of any column whose cards have changed.
+        for i, column in enumerate(columns):
+            if i >= len(self.columns):
+                self.column_lines.append({})
+            elif column != self.columns[i]:
+                self.column_lines[i] = {}
+        del self.column_lines[len(columns):]
+
+        self.columns = columns
+        self.message = None
+        self.representation = self.compose(None)
+        self.colorized = {}
+
+    def get_column_lines(self, index, mode):
+
+        cache = self.column_lines[index]
+        if mode not in cache:
+            lines = []
+            for card in self.columns[index]:
+                lines.extend(CARD_ART[(card, mode)])
+            cache[mode] = lines
+        return cache[mode]
+
+    def compose(self, mode):
+
+        column_lines = [self.get_column_lines(x, mode) for x in range(len(self.columns))]
+        cards_per_row = len(self.columns)
+        bits = ["=======" * cards_per_row + "=\n"]
+        for row, row_char in enumerate("ABC"):
+            for card_line in range(row * 5, row * 5 + 5):
+                bits.append("".join([x[card_line] for x in column_lines]) + "\n")
+
+            # Now we print the codes for each card under the cards.
+            bits.append("".join(["   %s%s  " % (row_char, x) for x in range(1, cards_per_row + 1)]) + "\n\n")
+        return "".join(bits)
+
+    def get_colorized(self, ansi=True):
+
+        if ansi not in self.colorized:
+            if self.message is not None:
+                self.colorized[ansi] = colorize(self.message, ansi, optimize=True)
+            else:
+                self.colorized[ansi] = self.compose(ansi)
+        return self.colorized[ansi]
+
 class Set(SeatedGame):
     """A Set game table implementation.  Invented in 1974 by Marsha Jean Falco.
     """
@@ -119,34 +281,80 @@ class Set(SeatedGame):
         self.layout = None
         self.printable_layout = None
         self.deck = None
+
+        # Where each card on the table is in the layout, how many sets each
+        # card on the table is part of, and how many sets there are in all.
+        # These are kept up to date as cards come and go; see place_card()
+        # and remove_card().
+        self.positions = {}
+        self.card_sets = {}
+        self.live_sets = 0
+
         self.last_play_time = None
         self.max_card_count = 81
         self.has_borders = True
 
     def build_deck(self):
 
-        # Generate the deck...
-        self.deck = []
-        for count in (ONE, TWO, THREE):
-            fill_list = (SMOOTH,)
-            if self.has_borders:
-                fill_list = (SMOOTH, WAVY, CHUNKY)
-            for fill in fill_list:
-                for color in (MAGENTA, RED, GREEN):
-                    for shape in (BLOB, LOZENGE, SQUIGGLE):
-                        self.deck.append((count, fill, color, shape))
-
-        # ...and shuffle it.
-        random.shuffle(self.deck)
-
-        # Trim it to at most the max count.
-        self.deck = self.deck[:self.max_card_count]
+        # Generate the cards...
+        cards = []
+        fill_count = 1
+        if self.has_borders:
+            fill_count = 3
+        for count in range(3):
+            for fill in range(fill_count):
+                for color in range(3):
+                    for shape in range(3):
+                        cards.append(make_card(count, fill, color, shape))
+
+        # ...shuffle them, and trim them to at most the max count.
+        random.shuffle(cards)
+        self.deck = Deck(cards[:self.max_card_count])
 
     def build_layout(self):
 
         # Put the first twelve cards on the table.
-        self.layout = self.deck[:12]
-        self.deck = self.deck[12:]
+        self.layout = [None] * 12
+        self.positions = {}
+        self.card_sets = {}
+        self.live_sets = 0
+        for i in range(12):
+            if self.deck:
+                self.place_card(i, self.deck.draw())
+
+    def place_card(self, pos, card):
+
+        # Put a card on the table, counting the sets it completes: every
+        # card already on the table pairs with it to demand exactly one
+        # third card, so each new set is found twice.
+        new_sets = 0
+        for other in self.positions:
+            third = THIRD_CARD[card][other]
+            if third in self.positions:
+                new_sets += 1
+                self.card_sets[other] += 1
+        self.card_sets[card] = new_sets / 2
+        self.live_sets += new_sets / 2
+
+        if pos == len(self.layout):
+            self.layout.append(card)
+        else:
+            self.layout[pos] = card
+        self.positions[card] = pos
+
+    def remove_card(self, pos):
+
+        # The reverse of place_card().
+        card = self.layout[pos]
+        self.layout[pos] = None
+        del self.positions[card]
+        del self.card_sets[card]
+        lost_sets = 0
+        for other in self.positions:
+            if THIRD_CARD[card][other] in self.positions:
+                lost_sets += 1
+                self.card_sets[other] -= 1
+        self.live_sets -= lost_sets / 2
 
     def update_layout(self):
 
@@ -159,101 +367,50 @@ class Set(SeatedGame):
         layout_len = len(self.layout)
         if len(self.layout) <= 12:
             for i in range(layout_len):
-                if not self.layout[i] and self.deck:
-                    self.layout[i] = self.deck[0]
-                    self.deck = self.deck[1:]
+                if self.layout[i] is None and self.deck:
+                    self.place_card(i, self.deck.draw())
 
         else:
-            new_layout = [x for x in self.layout if x]
+            new_layout = [x for x in self.layout if x is not None]
             while len(new_layout) < 12:
                 new_layout.append(None)
             self.layout = new_layout
 
-    def get_card_art_bits(self, card, line_number):
-        # .----. 1 /~~~~\ |=||=|
-        # |2or3| 2 {    } =    =
-        # |1or3| 3 {    } |    |
-        # |2or3| 4 {    } =    =
-        # `----' 5 \~~~~/ |=||=|
-
-        # Just in case...
-        if line_number < 1 or line_number > 5:
-            return
-
-        # At the end of the game, we will sometimes print blank
-        # spaces where cards should go.  Handle that.
-        if not card:
-            return "      "
-        count, fill, color, shape = card
-
-        # If a line has a piece of art, it looks like this...
-        art_bit = "%s%s^~" % (color.code, shape.art)
-        # ...otherwise this.
-        blank_bit = "    "
-
-        if line_number == 1:
-            return fill.edge_art[0]
-        elif line_number == 2 or line_number == 4:
-            center = blank_bit
-            if count == TWO or count == THREE:
-                center = art_bit
-            return fill.edge_art[1] % center
-        elif line_number == 3:
-            center = blank_bit
-            if count == ONE or count == THREE:
-                center = art_bit
-            return fill.edge_art[2] % center
-        elif line_number == 5:
-            return fill.edge_art[3]
-
-        # Dunno how we got here...
-        return "ERROR"
+            # The cards are the same, so the set counts are too; only their
+            # positions have moved.
+            self.positions = dict([(card, pos) for pos, card in enumerate(self.layout)
+                                   if card is not None])
 
     def update_printable_layout(self):
 
-        self.printable_layout = []
+        if not self.printable_layout:
+            self.printable_layout = SetTable()
+
         if not self.layout:
-            self.printable_layout.append("The layout is currently ^cempty^~.\n")
+            self.printable_layout.show_message("The layout is currently ^cempty^~.\n")
             return
 
         # If the layout doesn't have a number of card spaces divisible
         # by 3, something is horribly wrong, and we should bail.
         if len(self.layout) % 3 != 0:
-            self.printable_layout.append("Something is ^Rhorribly wrong^~ with the layout.  Alert an admin.\n")
+            self.printable_layout.show_message("Something is ^Rhorribly wrong^~ with the layout.  Alert an admin.\n")
             return
 
-        # Okay, we have a usable layout.  Generate it!
-        cards_per_row = len(self.layout) / 3
-        self.printable_layout.append("=======" * cards_per_row + "=\n")
-        for row in range(3):
-            if row == 0:
-                row_char = "A"
-            elif row == 1:
-                row_char = "B"
-            else:
-                row_char = "C"
-            for card_line in range(1, 6):
-                this_line = ""
-                for col in range(cards_per_row):
-                    this_line += (" %s" % self.get_card_art_bits(self.layout[col * 3 + row], card_line))
-                self.printable_layout.append(this_line + "\n")
-
-            # Now we print the codes for each card under the cards.
-            this_line = ""
-            for col in range(1, cards_per_row + 1):
-                this_line += ("   %s%s  " % (row_char, col))
-            self.printable_layout.append(this_line + "\n\n")
+        # Okay, we have a usable layout.  Draw it!
+        self.printable_layout.update(self.layout)
 
-    def show(self, player):
+    def get_public_view(self):
 
         if not self.printable_layout:
             self.update_printable_layout()
-        for line in self.printable_layout:
-            player.tell_cc(line)
+        return [self.printable_layout]
+
+    def show(self, player):
+
+        self.send_view(player)
 
     def send_layout(self):
-        for listener in self.channel.listeners:
-            self.show(listener)
+        self.broadcast_view()
 
     def join(self, player, join_bits):
 
@@ -341,76 +498,38 @@ class Set(SeatedGame):
 
     def handle(self, player, command_str):
 
-        # Handle common commands first.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-            state = self.state.get()
-            command_bits = command_str.split()
-            primary = command_bits[0].lower()
-
-            if primary in ("score", "scores"):
-                self.show_scores(player)
-                handled = True
-
-            elif state == "need_players":
-                if primary in ("column", "columns"):
-                    if len(command_bits) == 2:
-                        self.set_max_columns(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid columns command.\n")
-                    handled = True
-
-                elif primary in ("delay",):
-                    if len(command_bits) == 2:
-                        self.set_delay(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid delay command.\n")
-                    handled = True
-
-                elif primary in ("cards", "count"):
-                    if len(command_bits) == 2:
-                        self.set_max_count(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid cards command.\n")
-                    handled = True
-
-                elif primary in ("borders", "border"):
-                    if len(command_bits) == 2:
-                        self.set_border(player, command_bits[1])
-                    else:
-                        player.tell_cc(self.prefix + "Invalid border command.\n")
-                    handled = True
-
-                elif primary in ("start",):
-                    if not len(self.seats):
-                        player.tell_cc(self.prefix + "Need at least one player!\n")
-                    else:
-                        self.state.set("playing")
-                        self.channel.broadcast_cc(self.prefix + "Game on!\n")
-                        self.build_deck()
-                        self.build_layout()
-                        self.update_printable_layout()
-                        self.send_layout()
-                        self.last_play_time = time.time()
-                    handled = True
-
-            elif state == "playing":
-
-                # Everything at this point should be a move, which consists
-                # of a list of 3 card choices.  As always, do the polite thing
-                # for players who do the play/pl/move/mv/thing.
-                if primary in ('play', 'move', 'pl', 'mv'):
-                    play_bits = demangle_move(command_bits[1:])
-                else:
-                    play_bits = demangle_move(command_bits)
-
-                if play_bits and len(play_bits) == 3:
-                    self.declare(player, play_bits)
-                    handled = True
-
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+        # Everything while playing should be a move, which consists of a
+        # list of 3 card choices, usually with no command in front.  Those
+        # can't be mistaken for any command, so take them first.
+        if self.state.get() == "playing":
+            play_bits = demangle_move(command_str.split())
+            if play_bits and len(play_bits) == 3:
+                self.declare(player, play_bits)
+                return
+
+        super(Set, self).handle(player, command_str)
+
+    def handle_start(self, player):
+
+        if not len(self.seats):
+            player.tell_cc(self.prefix + "Need at least one player!\n")
+        else:
+            self.state.set("playing")
+            self.channel.broadcast_cc(self.prefix + "Game on!\n")
+            self.build_deck()
+            self.build_layout()
+            self.update_printable_layout()
+            self.send_layout()
+            self.last_play_time = time.time()
+
+    def handle_play(self, player, play_bits):
+
+        # As always, do the polite thing for players who do the
+        # play/pl/move/mv/thing.
+        play_bits = demangle_move(play_bits)
+        if not play_bits or len(play_bits) != 3:
+            return False
+        self.declare(player, play_bits)
 
     def tick(self):
 
@@ -427,20 +546,23 @@ class Set(SeatedGame):
         if not self.deck:
             return
 
-        # Okay, so, we're playing.  See if too much time has passed.
+        # Okay, so, we're playing.  If there's no set on the table, there's
+        # no point waiting; otherwise, see if too much time has passed.
         curr_time = time.time()
-        if curr_time - self.last_play_time < self.deal_delay:
+        if self.live_sets and curr_time - self.last_play_time < self.deal_delay:
             return
 
         # Yup.  Deal out three new cards.
         for i in range(3):
             if self.deck:
-                self.layout.append(self.deck[0])
-                self.deck = self.deck[1:]
+                self.place_card(len(self.layout), self.deck.draw())
 
         self.update_printable_layout()
         self.send_layout()
-        self.channel.broadcast_cc(self.prefix + "New cards have automatically been dealt.\n")
+        if self.live_sets:
+            self.channel.broadcast_cc(self.prefix + "New cards have automatically been dealt.\n")
+        else:
+            self.channel.broadcast_cc(self.prefix + "New cards have automatically been dealt; there's still no set.\n")
 
         # Update the last play time.
         self.last_play_time = time.time()
@@ -486,7 +608,7 @@ class Set(SeatedGame):
         cards = [self.layout[x] for x in card_locations]
 
         # Bail if any of these are empty locations.
-        if not cards[0] or not cards[1] or not cards[2]:
+        if cards[0] is None or cards[1] is None or cards[2] is None:
             player.tell_cc(self.prefix + "You can't pick empty spaces.\n")
             return
 
@@ -498,7 +620,7 @@ class Set(SeatedGame):
             # zomg.  Is an actual set!  Notify the press.  Update the layout
             # and send it out.
             for i in card_locations:
-                self.layout[i] = None
+                self.remove_card(i)
             self.update_layout()
             self.update_printable_layout()
             self.send_layout()
@@ -516,33 +638,17 @@ class Set(SeatedGame):
         else:
             player.tell_cc(self.prefix + self.make_set_str(cards) + " is not a set!\n")
 
-    def third_card(self, one, two):
-
-        # For any two cards, the third card to make it a set can be
-        # determined easily.  For each element, if the two cards are
-        # the same, the third must have the same one as well; if
-        # different, use BITFIELDS to find the missing one.  Since
-        # there are 3 possible values, subtract 7 from the summation
-        # of the two's bit values to get the third one.
-        three = []
-        for k in range(4):
-            if one[k] == two[k]:
-                three.append(one[k])
-            else:
-                three.append(BITFIELDS[k][7 - (BITFIELDS[k][one[k]] +
-                   BITFIELDS[k][two[k]])])
-        return tuple(three)
-
     def is_a_set(self, cards):
 
-        return self.third_card(cards[0], cards[1]) == cards[2]
+        return THIRD_CARD[cards[0]][cards[1]] == cards[2]
 
     def make_set_str(self, cards):
 
         card_str_list = []
         for card in cards:
-            card_str = card[2].code + " ".join([x.display for x in card])
-            if card[0] != ONE:
+            attrs = CARD_ATTRS[card]
+            card_str = attrs[2].code + " ".join([x.display for x in attrs])
+            if attrs[0] != ONE:
                 card_str += "s"
             card_str_list.append(card_str + "^~")
 
@@ -550,31 +656,32 @@ class Set(SeatedGame):
 
     def no_more_sets(self):
 
-        # First, bail if the deck still has any cards whatsoever, as we can't
-        # possibly know that there aren't any sets left until the deck is
-        # depleted.
-        if self.deck:
-            return False
+        # There are no more sets if the deck is empty (as otherwise more
+        # cards can come out) and none of the cards on the table make one.
+        return not self.deck and not self.live_sets
 
-        # Okay, now, get a list of cards on the layout.
-        cards_left = [x for x in self.layout if x]
+    def get_location_str(self, pos):
 
-        count_left = len(cards_left)
-        # If there are more than 20 cards on the table, we know for a fact
-        # that there has to be a set left.
-        if count_left > 20:
-            return False
+        return "%s%d" % ("ABC"[pos % 3], pos / 3 + 1)
 
-        # Take every unique pair of cards on the layout and determine what
-        # the third card would be that makes them a set.  If that card is
-        # still on the table, we have a valid set left.
-        for i in range(count_left):
-            for j in range(i + 1, count_left):
-                if self.third_card(cards_left[i], cards_left[j]) in cards_left:
-                    return False
+    def hint(self, player):
 
-        # No sets found.
-        return True
+        if not self.get_seat_of_player(player):
+            player.tell_cc(self.prefix + "You're not playing in this game!  (But you should join.)\n")
+            return
+
+        if not self.live_sets:
+            player.tell_cc(self.prefix + "There are ^cno sets^~ on the table right now.\n")
+            return
+
+        # Point out a card (at random, so it's not always the same one)
+        # that's part of at least one set.
+        card = random.choice([x for x in self.card_sets if self.card_sets[x]])
+        self.channel.broadcast_cc(self.prefix + "^Y%s^~ asked for a hint.\n" % player)
+        player.tell_cc(self.prefix + "^C%s^~ is part of %s; there %s on the table.\n" %
+           (self.get_location_str(self.positions[card]),
+            get_plural_str(self.card_sets[card], "set"),
+            self.live_sets == 1 and "is 1 set" or "are %d sets" % self.live_sets))
 
     def resolve(self):
 
@@ -617,15 +724,33 @@ class Set(SeatedGame):
         for player in self.channel.listeners:
             self.show_scores(player)
 
-    def show_help(self, player):
-
-        super(Set, self).show_help(player)
-        player.tell_cc("\nSET SETUP PHASE:\n\n")
-        player.tell_cc("                ^!columns^. <num>     Set the maximum columns to <num> (7-9).\n")
-        player.tell_cc("                  ^!delay^. <sec>     Set the autodeal delay to <sec> secs.\n")
-        player.tell_cc("                  ^!cards^. <num>     Set the maximum card count to <num>.\n")
-        player.tell_cc("               ^!borders^. on|off     Set the borders on or off.\n")
-        player.tell_cc("                        ^!start^.     Start the game.\n")
-        player.tell_cc("\nSET PLAY:\n\n")
-        player.tell_cc("                   ^!l1^., ^!l2^., ^!l3^.     Declare <l1>, <l2>, <l3> a set.\n")
-        player.tell_cc("                       ^!scores^.     See the current scores.\n")
+# Set's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("columns", "column"), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Set the maximum columns to <num> (7-9).", "SET SETUP PHASE",
+             shown=("columns",), states=("need_players",),
+             setter="set_max_columns", what="columns")
+COMMANDS.add(("delay",), "handle_one_arg", TAKES_ARGS, "<sec>",
+             "Set the autodeal delay to <sec> secs.", "SET SETUP PHASE",
+             states=("need_players",), setter="set_delay", what="delay")
+COMMANDS.add(("cards", "count"), "handle_one_arg", TAKES_ARGS, "<num>",
+             "Set the maximum card count to <num>.", "SET SETUP PHASE",
+             shown=("cards",), states=("need_players",),
+             setter="set_max_count", what="cards")
+COMMANDS.add(("borders", "border"), "handle_one_arg", TAKES_ARGS, "on|off",
+             "Set the borders on or off.", "SET SETUP PHASE",
+             shown=("borders",), states=("need_players",),
+             setter="set_border", what="border")
+COMMANDS.add(("start",), "handle_start", desc="Start the game.",
+             section="SET SETUP PHASE", states=("need_players",))
+COMMANDS.add(("play", "move", "pl", "mv"), "handle_play", TAKES_ARGS,
+             section="SET PLAY",
+             rows=(("^!l1^., ^!l2^., ^!l3^.", "Declare <l1>, <l2>, <l3> a set."),),
+             states=("playing",))
+COMMANDS.add(("scores", "score"), "show_scores",
+             desc="See the current scores.", section="SET PLAY",
+             shown=("scores",), states=("need_players", "playing"))
+COMMANDS.add(("hint",), "hint", desc="Point out a card that's part of a set.",
+             section="SET PLAY", states=("playing",))
+
+Set.commands = COMMANDS
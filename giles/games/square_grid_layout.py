@@ -15,6 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from giles.games.layout import Layout
+from miniboa.xterm import colorize
 
 COLS = "abcdefghijklmnopqrstuvwxyz"
 
@@ -24,6 +25,11 @@ class SquareGridLayout(Layout):
     externally (it's a list of (row, col) tuples); that said, all of place, move,
     and remove can optionally replace the list with the destination locations (and,
     in the case of move, both the source /and/ destination).
+
+    Each row of the board is rendered and colorized separately and cached;
+    update() only re-renders the rows that have been marked dirty by place(),
+    move(), remove(), or a change to last_moves.  If you change the grid or
+    the pieces on it by hand, call mark_dirty() before update().
     """
 
     def __init__(self, board_color=None, cell_color=None, highlight_color=None):
@@ -38,6 +44,14 @@ class SquareGridLayout(Layout):
         self.bottom_row = ""
         self.grid = []
 
+        # Row caches.  row_strs holds the caret-coded string for each row;
+        # row_colorized holds a {use_ansi: string} dict for the same rows.
+        self.row_strs = []
+        self.row_colorized = []
+        self.dirty_rows = set()
+        self.drawn_last_moves = set()
+        self.colorized = {}
+
         if not board_color:
             board_color = "^m"
         if not cell_color:
@@ -56,32 +70,72 @@ class SquareGridLayout(Layout):
         else:
             return False
 
-    def update(self):
+    def mark_dirty(self, row=None):
 
-        self.representation = "\n" + self.col_str
-        self.representation += self.top_row
-        for r in range(self.height):
-            r_disp = r + 1
-            this_row = "%2d %s|^~ " % (r_disp, self.board_color)
-            for c in range(self.width):
-                last_move = False
-                if (r, c) in self.last_moves:
-                    last_move = True
-                    this_row += self.highlight_color
-                loc = self.grid[r][c]
-                if loc:
-                    this_row += loc.color
-                    if last_move:
-                        this_row += loc.last_char
-                    else:
-                        this_row += loc.char
-                    this_row += "^~ "
+        # Mark a single row (or, with no argument, every row) as needing to
+        # be re-rendered on the next update().
+        if row is None:
+            self.dirty_rows.update(range(self.height))
+        else:
+            self.dirty_rows.add(row)
+
+    def render_row(self, r, highlights):
+
+        r_disp = r + 1
+        bits = ["%2d %s|^~ " % (r_disp, self.board_color)]
+        for c, loc in enumerate(self.grid[r]):
+            last_move = (r, c) in highlights
+            if last_move:
+                bits.append(self.highlight_color)
+            if loc:
+                bits.append(loc.color)
+                if last_move:
+                    bits.append(loc.last_char)
                 else:
-                    this_row += self.cell_color + ".^~ "
-            this_row += self.board_color + "|^~ %d\n" % r_disp
-            self.representation += this_row
-        self.representation += self.bottom_row
-        self.representation += self.col_str
+                    bits.append(loc.char)
+                bits.append("^~ ")
+            else:
+                bits.append(self.cell_color + ".^~ ")
+        bits.append(self.board_color + "|^~ %d\n" % r_disp)
+        return "".join(bits)
+
+    def update(self):
+
+        # Any row whose last-move highlighting has changed since the last
+        # draw needs to be redrawn, along with anything explicitly dirtied.
+        highlights = set(self.last_moves)
+        for r, c in highlights.symmetric_difference(self.drawn_last_moves):
+            self.dirty_rows.add(r)
+        self.drawn_last_moves = highlights
+
+        dirty = [r for r in self.dirty_rows if 0 <= r < self.height]
+        self.dirty_rows = set()
+        if not dirty and self.representation:
+            return
+
+        for r in dirty:
+            row_str = self.render_row(r, highlights)
+            self.row_strs[r] = row_str
+            self.row_colorized[r] = {
+                True: colorize(row_str, True, optimize=True),
+                False: colorize(row_str, False),
+            }
+
+        self.representation = "".join(["\n", self.col_str, self.top_row] +
+                                       self.row_strs +
+                                       [self.bottom_row, self.col_str])
+        self.colorized = {}
+
+    def get_colorized(self, ansi=True):
+
+        # Assemble the colorized board out of the cached colorized rows;
+        # the header and footer are the only bits colorized here.
+        if ansi not in self.colorized:
+            self.colorized[ansi] = "".join(
+               [colorize("\n" + self.col_str + self.top_row, ansi, optimize=True)] +
+               [x[ansi] for x in self.row_colorized] +
+               [colorize(self.bottom_row + self.col_str, ansi, optimize=True)])
+        return self.colorized[ansi]
 
     def resize(self, width, height=None):
 
@@ -97,6 +151,11 @@ class SquareGridLayout(Layout):
 
         self.width = width
         self.height = height
+        self.row_strs = [""] * height
+        self.row_colorized = [None] * height
+        self.drawn_last_moves = set()
+        self.representation = ""
+        self.mark_dirty()
 
         self.col_str = "    " + "".join([" " + COLS[i] for i in range(self.width)]) + "\n"
         equals_str = "".join(["=="] * self.width)
@@ -109,6 +168,7 @@ class SquareGridLayout(Layout):
 
         if self.is_valid(row, col):
             self.grid[row][col] = piece
+            self.dirty_rows.add(row)
             if update_last_moves:
                 self.last_moves = [(row, col)]
             if update:
@@ -124,6 +184,8 @@ class SquareGridLayout(Layout):
 
             self.grid[dst_r][dst_c] = self.grid[src_r][src_c]
             self.grid[src_r][src_c] = None
+            self.dirty_rows.add(src_r)
+            self.dirty_rows.add(dst_r)
             if update_last_moves:
                 self.last_moves = [(src_r, src_c), (dst_r, dst_c)]
             if update:
@@ -136,6 +198,7 @@ class SquareGridLayout(Layout):
 
         if self.is_valid(row, col) and self.grid[row][col]:
             self.grid[row][col] = None
+            self.dirty_rows.add(row)
             if update_last_moves:
                 self.last_moves = [(row, col)]
             if update:
@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.piece import Piece
 from giles.games.seat import Seat
 from giles.games.square_grid_layout import SquareGridLayout, COLS
@@ -62,11 +63,11 @@ class SquareOust(SeatedGame):
         self.turn = None
         self.black = self.seats[0]
         self.black.data.seat_str = "^KBlack^~"
-        self.black.data.groups = []
+        self.black.data.groups = set()
         self.black.data.made_move = False
         self.white = self.seats[1]
         self.white.data.seat_str = "^WWhite^~"
-        self.white.data.groups = []
+        self.white.data.groups = set()
         self.white.data.made_move = False
         self.resigner = None
         self.layout = None
@@ -92,15 +93,17 @@ class SquareOust(SeatedGame):
 
         return "It is ^C%s^~'s turn (%s).\n" % (self.turn.player_name, self.turn.data.seat_str)
 
+    def get_public_view(self):
+
+        return [self.layout, self.get_turn_str()]
+
     def show(self, player):
 
-        player.tell_cc(self.layout)
-        player.tell_cc(self.get_turn_str())
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def set_size(self, player, size_bits):
 
@@ -138,94 +141,102 @@ class SquareOust(SeatedGame):
         self.bc_pre("^R%s^~ has set the board size to ^C%d^Gx^C%d^~.\n" % (player, w, h))
         self.init_layout()
 
-    def get_new_piece(self, seat):
+    def get_new_piece(self, seat, row, col):
 
+        # Every piece starts out as a group of its own.  Groups are kept as
+        # a union-find forest: a piece that has been merged into another
+        # group points at it with data.parent, and only the piece at the
+        # root of a group (see find()) has up-to-date members, size, and
+        # adjacencies (the set of enemy groups touching it).
         if seat == self.black:
             p = Piece("^K", "x", "X")
         else:
             p = Piece("^W", "o", "O")
         p.data.owner = seat
-        p.data.adjacencies = []
+        p.data.parent = None
+        p.data.members = [(row, col)]
+        p.data.adjacencies = set()
         p.data.size = 1
-        p.data.num = id(p)
 
         return p
 
-    def replace(self, old, new):
-
-        # First step: Replace the actual pieces on the board.
-        for r in range(self.height):
-            for c in range(self.width):
-                if self.layout.grid[r][c] == old:
-                    self.layout.place(new, r, c, update=False)
-        self.layout.update()
-
-        # Second step: Get rid of it from the group list of its owner.
-        owner = new.data.owner
-        owner.data.groups.remove(old)
-
-        # Third step: Replace instances of it in the other player's group
-        # adjacencies.
-        for group in self.next_seat(owner).data.groups:
-            if old in group.data.adjacencies:
-                group.data.adjacencies.remove(old)
-                if new not in group.data.adjacencies:
-                    group.data.adjacencies.append(new)
+    def find(self, piece):
+
+        # Returns the root of a piece's group, pointing every piece along
+        # the way straight at it.
+        root = piece
+        while root.data.parent:
+            root = root.data.parent
+        while piece is not root:
+            next_piece = piece.data.parent
+            piece.data.parent = root
+            piece = next_piece
+        return root
+
+    def merge(self, group, other):
+
+        # Merges two groups of the same owner, returning the root of the
+        # result.  The smaller group joins the larger, so only its members
+        # and adjacencies have to move.
+        if group.data.size < other.data.size:
+            group, other = other, group
+
+        other.data.parent = group
+        group.data.size += other.data.size
+        group.data.members.extend(other.data.members)
+        for enemy in other.data.adjacencies:
+            enemy.data.adjacencies.discard(other)
+            enemy.data.adjacencies.add(group)
+        group.data.adjacencies |= other.data.adjacencies
+        group.data.owner.data.groups.discard(other)
+
+        other.data.members = None
+        other.data.adjacencies = None
+        return group
 
     def remove(self, dead_group):
 
-        # Like above, except removing this time.
-        for r in range(self.height):
-            for c in range(self.width):
-                if self.layout.grid[r][c] == dead_group:
-                    self.layout.remove(r, c, update=False)
+        # Take the group's pieces off the board.  Only the rows they were
+        # on get redrawn.
+        for r, c in dead_group.data.members:
+            self.layout.remove(r, c, update=False)
         self.layout.update()
 
-        owner = dead_group.data.owner
-        owner.data.groups.remove(dead_group)
-
-        for group in self.next_seat(owner).data.groups:
-            if dead_group in group.data.adjacencies:
-                group.data.adjacencies.remove(dead_group)
+        dead_group.data.owner.data.groups.discard(dead_group)
+        for group in dead_group.data.adjacencies:
+            group.data.adjacencies.discard(dead_group)
 
     def update_board(self, row, col):
 
         # We just put a fresh piece at this location; it will have to be
         # incorporated into everything else that's on the board.
-        this_piece = self.layout.grid[row][col]
+        this_group = self.find(self.layout.grid[row][col])
+        owner = this_group.data.owner
 
         # Look at all of the adjacencies and collapse the same-color groups
         # into one.  Collate the unique enemy groups as well, as we may be
         # capturing them.
-        other_adjacencies = []
+        other_adjacencies = set()
         potential_capture = False
         for r_delta, c_delta in CONNECTION_DELTAS:
             new_r = row + r_delta
             new_c = col + c_delta
             if self.layout.is_valid(new_r, new_c):
                 loc = self.layout.grid[new_r][new_c]
-                if loc and loc.data.owner == this_piece.data.owner:
+                if not loc:
+                    continue
+                group = self.find(loc)
+                if group.data.owner == owner:
                     potential_capture = True
-                    if loc != this_piece:
+                    if group is not this_group:
 
                         # New same-color group to collapse.
-                        other_adjacencies.extend([x for x in loc.data.adjacencies
-                           if x not in other_adjacencies])
-                        new_size = this_piece.data.size + loc.data.size
-                        if this_piece.data.num < loc.data.num:
-                            self.replace(loc, this_piece)
-                        else:
-                            self.replace(this_piece, loc)
-                            this_piece = loc
-
-                        # Whichever "won," set the new size.
-                        this_piece.data.size = new_size
-                elif loc:
+                        other_adjacencies |= group.data.adjacencies
+                        this_group = self.merge(this_group, group)
+                else:
 
-                    # A group of the other player.  Add to other adjacencies if
-                    # it's not already there.
-                    if loc not in other_adjacencies:
-                        other_adjacencies.append(loc)
+                    # A group of the other player.
+                    other_adjacencies.add(group)
 
         # After having collapsed all of the same-colored groups, we look to see
         # if this is a potential capture.  If not, we can't affect the opponent's
@@ -236,20 +247,17 @@ class SquareOust(SeatedGame):
                 self.remove(group)
 
             # By definition, a capturing group has no enemy adjacencies.
-            this_piece.data.adjacencies = []
+            this_group.data.adjacencies = set()
 
             # Return the number of groups we captured.
             return len(other_adjacencies)
 
         else:
 
-            # Set the adjacency list.
-            this_piece.data.adjacencies = other_adjacencies
-
-            # Add ourselves to those pieces' adjacency lists.
+            # Set the adjacencies, and add ourselves to those groups'.
+            this_group.data.adjacencies = other_adjacencies
             for group in other_adjacencies:
-                if this_piece not in group.data.adjacencies:
-                    group.data.adjacencies.append(this_piece)
+                group.data.adjacencies.add(this_group)
 
             # No captures.
             return 0
@@ -279,8 +287,8 @@ class SquareOust(SeatedGame):
 
         # Valid.  Put a piece there.
         move_str = "%s%s" % (COLS[col], row + 1)
-        piece = self.get_new_piece(seat)
-        seat.data.groups.append(piece)
+        piece = self.get_new_piece(seat, row, col)
+        seat.data.groups.add(piece)
         self.layout.place(piece, row, col, True)
 
         # Update the board, making any captures.
@@ -320,90 +328,51 @@ class SquareOust(SeatedGame):
             self.turn = self.black
             self.send_board()
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.lower().split()
-            primary = command_bits[0]
+    def handle_move(self, player, move_bits):
 
-            if state == "setup":
-
-                if primary in ("size", "sz"):
-
-                    self.set_size(player, command_bits[1:])
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
-
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
-
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    self.state.set("setup")
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
-
-                if primary in ("move", "play", "mv", "pl",):
-
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.move(player, move_bits[0])
-                    else:
-                        self.tell_pre(player, "Invalid move command.\n")
-                    handled = True
-
-                elif primary in ("resign",):
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.move(player, move_bits[0]):
+                self.end_turn()
+        else:
+            self.tell_pre(player, "Invalid move command.\n")
 
-                    made_move = self.resign(player)
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_turn()
 
-                    # Did someone win?
-                    winner = self.find_winner()
+    def end_turn(self):
 
-                    if winner:
+        # Did someone win?
+        winner = self.find_winner()
 
-                        # Yup!
-                        self.resolve(winner)
-                        self.finish()
-                    else:
+        if winner:
 
-                        # No.  If the move was not a capturing move, see if the
-                        # next player has a move; if so, change turns.  If not,
-                        # print a message and stay here.
-                        other = self.next_seat(self.turn)
-                        if not self.move_was_capture:
-                            if not self.has_move(other):
-                                self.bc_pre("%s has no valid move; ^Rskipping their turn^~.\n" % self.get_sp_str(other))
-                            else:
-                                self.turn = other
+            # Yup!
+            self.resolve(winner)
+            self.finish()
+        else:
 
-                        elif not self.has_move(self.turn):
-                            self.bc_pre("%s has no further valid moves.\n" % self.get_sp_str(self.turn))
-                            self.turn = other
+            # No.  If the move was not a capturing move, see if the
+            # next player has a move; if so, change turns.  If not,
+            # print a message and stay here.
+            other = self.next_seat(self.turn)
+            if not self.move_was_capture:
+                if not self.has_move(other):
+                    self.bc_pre("%s has no valid move; ^Rskipping their turn^~.\n" % self.get_sp_str(other))
+                else:
+                    self.turn = other
 
-                        else:
-                            self.bc_pre("%s continues their turn.\n" % self.get_sp_str(self.turn))
+            elif not self.has_move(self.turn):
+                self.bc_pre("%s has no further valid moves.\n" % self.get_sp_str(self.turn))
+                self.turn = other
 
-                        # No matter what, send the board again.
-                        self.send_board()
+            else:
+                self.bc_pre("%s continues their turn.\n" % self.get_sp_str(self.turn))
 
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+            # No matter what, send the board again.
+            self.send_board()
 
     def is_valid_play(self, seat, row, col):
 
@@ -425,6 +394,8 @@ class SquareOust(SeatedGame):
             new_c = col + c_delta
             if self.layout.is_valid(new_r, new_c):
                 loc = self.layout.grid[new_r][new_c]
+                if loc:
+                    loc = self.find(loc)
                 if loc and loc.data.owner == seat:
                     if loc not in same_list:
                         same_list.append(loc)
@@ -486,13 +457,21 @@ class SquareOust(SeatedGame):
         self.send_board()
         self.bc_pre("%s wins!\n" % self.get_sp_str(winner))
 
-    def show_help(self, player):
-
-        super(SquareOust, self).show_help(player)
-        player.tell_cc("\nSQUARE OUST SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("             ^!size^. <size>,  ^!sz^.     Set board to <size>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nSQUARE OUST PLAY:\n\n")
-        player.tell_cc("      ^!move^. <ln>, ^!play^., ^!mv^., ^!pl^.     Make move <ln> (letter number).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Square Oust's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="SQUARE OUST SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "set_size", TAKES_ARGS, "<size>",
+             "Set board to <size>.", "SQUARE OUST SETUP PHASE",
+             states=("setup",))
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="SQUARE OUST SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Make move <ln> (letter number).", "SQUARE OUST PLAY",
+             states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="SQUARE OUST PLAY", states=("playing",))
+
+SquareOust.commands = COMMANDS
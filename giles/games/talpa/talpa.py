@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.piece import Piece
 from giles.games.seat import Seat
 from giles.games.square_grid_layout import SquareGridLayout, COLS
@@ -101,15 +102,17 @@ class Talpa(SeatedGame):
 
         return "It is ^C%s^~'s turn (%s).\n" % (self.turn.player_name, self.turn.data.seat_str)
 
+    def get_public_view(self):
+
+        return [self.layout, self.get_turn_str()]
+
     def show(self, player):
 
-        player.tell_cc(self.layout)
-        player.tell_cc(self.get_turn_str())
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def set_size(self, player, size_str):
 
@@ -262,86 +265,44 @@ class Talpa(SeatedGame):
             self.turn = self.red
             self.send_board()
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.lower().split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("size", "sz"):
-
-                    if len(command_bits) == 2:
-                        self.set_size(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid size command.\n")
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
+    def handle_move(self, player, move_bits):
 
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 2:
+            if self.move(player, move_bits[0], move_bits[1]):
+                self.end_turn()
+        else:
+            self.tell_pre(player, "Invalid move command.\n")
 
-            elif state == "need_players":
+    def handle_remove(self, player, move_bits):
 
-                if primary in ("config", "setup", "conf",):
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.remove(player, move_bits[0]):
+                self.end_turn()
+        else:
+            self.tell_pre(player, "Invalid remove command.\n")
 
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    self.state.set("setup")
-                    handled = True
+    def handle_resign(self, player):
 
-            elif state == "playing":
+        if self.resign(player):
+            self.end_turn()
 
-                made_move = False
+    def end_turn(self):
 
-                if primary in ("move", "play", "mv", "pl",):
+        # Did someone win?
+        winner = self.find_winner()
 
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 2:
-                        made_move = self.move(player, move_bits[0], move_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid move command.\n")
-                    handled = True
+        if winner:
 
-                elif primary in ("remove", "re",):
+            # Yup!
+            self.resolve(winner)
+            self.finish()
+        else:
 
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.remove(player, move_bits[0])
-                    else:
-                        self.tell_pre(player, "Invalid remove command.\n")
-                    handled = True
-
-                elif primary in ("resign",):
-
-                    made_move = self.resign(player)
-                    handled = True
-
-                if made_move:
-
-                    # Did someone win?
-                    winner = self.find_winner()
-
-                    if winner:
-
-                        # Yup!
-                        self.resolve(winner)
-                        self.finish()
-                    else:
-
-                        # No.  Change turns and send the board to listeners.
-                        self.turn = self.next_seat(self.turn)
-                        self.send_board()
-
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+            # No.  Change turns and send the board to listeners.
+            self.turn = self.next_seat(self.turn)
+            self.send_board()
 
     def find_winner(self):
 
@@ -426,14 +387,24 @@ class Talpa(SeatedGame):
         self.send_board()
         self.bc_pre("%s wins!\n" % self.get_sp_str(winner))
 
-    def show_help(self, player):
-
-        super(Talpa, self).show_help(player)
-        player.tell_cc("\nTALPA SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("             ^!size^. <size>,  ^!sz^.     Set board to <size>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nTALPA PLAY:\n\n")
-        player.tell_cc("          ^!move^. <ln> <ln2>, ^!mv^.     Move from <ln> to <ln2> (letter number).\n")
-        player.tell_cc("               ^!remove^. <ln> ^!re^.     Remove piece at <ln> (letter number).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Talpa's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="TALPA SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "handle_one_arg", TAKES_ARGS, "<size>",
+             "Set board to <size>.", "TALPA SETUP PHASE", states=("setup",),
+             setter="set_size", what="size")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="TALPA SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS,
+             "<ln> <ln2>", "Move from <ln> to <ln2> (letter number).",
+             "TALPA PLAY", shown=("move", "mv"), states=("playing",))
+COMMANDS.add(("remove", "re"), "handle_remove", TAKES_ARGS, "<ln>",
+             "Remove piece at <ln> (letter number).", "TALPA PLAY",
+             states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="TALPA PLAY", states=("playing",))
+
+Talpa.commands = COMMANDS
@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.piece import Piece
 from giles.games.seat import Seat
 from giles.games.square_grid_layout import SquareGridLayout, COLS
@@ -66,6 +67,9 @@ class Tanbo(SeatedGame):
         self.resigner = None
         self.layout = None
 
+        # Roots that have no growth points left; see update_growth().
+        self.bound_roots = set()
+
         # Initialize the starting layout.
         self.init_layout()
 
@@ -77,6 +81,11 @@ class Tanbo(SeatedGame):
 
         p.data.owner = seat
         p.data.num = num
+
+        # Every root knows the cells it covers and its growth points: the
+        # empty cells it could grow into next.
+        p.data.cells = set()
+        p.data.growth = set()
         return p
 
     def init_layout(self):
@@ -130,9 +139,15 @@ class Tanbo(SeatedGame):
                 row = offset + i * jump_delta
                 col = offset + j * jump_delta
                 p.data.start = (row, col)
+                p.data.cells.add((row, col))
                 self.layout.place(p, row, col, update=False)
         self.layout.update()
 
+        # Work out everyone's starting growth points.
+        self.bound_roots = set()
+        all_roots = self.black.data.root_list + self.white.data.root_list
+        self.update_growth(set([x.data.start for x in all_roots]), all_roots)
+
     def get_sp_str(self, seat):
 
         return "^C%s^~ (%s)" % (seat.player_name, seat.data.seat_str)
@@ -144,15 +159,17 @@ class Tanbo(SeatedGame):
 
         return "It is ^C%s^~'s turn (%s).\n" % (self.turn.player_name, self.turn.data.seat_str)
 
+    def get_public_view(self):
+
+        return [self.layout, self.get_turn_str()]
+
     def show(self, player):
 
-        player.tell_cc(self.layout)
-        player.tell_cc(self.get_turn_str())
+        self.send_view(player)
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.show(player)
+        self.broadcast_view()
 
     def set_size(self, player, size_str):
 
@@ -197,97 +214,98 @@ class Tanbo(SeatedGame):
         else:
             return None
 
-    def recurse_is_bound(self, piece, row, col, prev_row, prev_col):
-
-        # Thanks to the way Tanbo placement works, we don't have to worry about
-        # loops, so we can get away with not using an adjacenty map and instead
-        # just track the direction we came from.
-        #
-        # Bail if this isn't a valid location.
-        if not self.layout.is_valid(row, col):
-            return True
-
-        loc = self.layout.grid[row][col]
-
-        # If there's no piece here, see if we can place one.
-        if not loc:
-            if self.can_place_at(piece.data.owner, row, col):
-
-                # Yup.  This root isn't bound.
-                return False
-
-            else:
-
-                # No, this location is binding.
-                return True
+    def get_neighbors(self, row, col):
 
-        elif loc != piece:
-
-            # Some other root.  Definitely binding.
-            return True
-
-        else:
-
-            # Okay, it's another part of this root.  Recurse, but don't double
-            # back.
-            for r_delta, c_delta in CONNECTION_DELTAS:
-                new_r = row + r_delta
-                new_c = col + c_delta
-                if new_r != prev_row or new_c != prev_col:
-                    if not self.recurse_is_bound(piece, new_r, new_c, row, col):
-
-                        # A recursive call found a liberty.  Awesome!
-                        return False
+        to_return = []
+        for r_delta, c_delta in CONNECTION_DELTAS:
+            new_r = row + r_delta
+            new_c = col + c_delta
+            if self.layout.is_valid(new_r, new_c):
+                to_return.append((new_r, new_c))
+        return to_return
+
+    def update_growth(self, changed_cells, touched_roots):
+
+        # Something has changed at each of the given cells (a piece has
+        # arrived or left), which can only affect whether those cells and the
+        # empty cells next to them are growth points.  Redo just those, then
+        # recheck whether any root we touched is now bound (or no longer is).
+        cells = set(changed_cells)
+        for row, col in changed_cells:
+            cells.update(self.get_neighbors(row, col))
+
+        touched_roots = set(touched_roots)
+        for row, col in cells:
+            adjacent = [self.layout.grid[r][c] for r, c in self.get_neighbors(row, col)]
+            adjacent = [x for x in adjacent if x]
+            touched_roots.update(adjacent)
+
+            if self.layout.grid[row][col]:
+
+                # Occupied; not a growth point for anyone.
+                for root in adjacent:
+                    root.data.growth.discard((row, col))
+                continue
+
+            # Empty.  A root can grow here iff it holds the only adjacent
+            # piece of its owner's.
+            for root in adjacent:
+                owner_count = len([x for x in adjacent if x.data.owner == root.data.owner])
+                if owner_count == 1:
+                    root.data.growth.add((row, col))
+                else:
+                    root.data.growth.discard((row, col))
 
-            # All of the recursive calls returned that they were bound.  This
-            # (sub)root is bound.
-            return True
+        for root in touched_roots:
+            if root.data.growth:
+                self.bound_roots.discard(root)
+            elif root in root.data.owner.data.root_list:
+                self.bound_roots.add(root)
 
     def root_is_bound(self, piece):
 
-        # We'll just start recursing at the root's starting location and find
-        # whether it's bound or not.
-        row, col = piece.data.start
-        return self.recurse_is_bound(piece, row, col, None, None)
+        # A root is bound once it has nowhere left to grow.
+        return not piece.data.growth
 
     def kill_root(self, piece):
 
-        # We could do this recursively, but we're lazy.
-        for r in range(self.size):
-            for c in range(self.size):
-                loc = self.layout.grid[r][c]
-                if loc == piece:
-                    self.layout.remove(r, c, update=False)
+        # Only the root's own cells need clearing.
+        for r, c in piece.data.cells:
+            self.layout.remove(r, c, update=False)
         self.layout.update()
 
         # Remove this root from the owner's root list.
         piece.data.owner.data.root_list.remove(piece)
+        self.bound_roots.discard(piece)
+
+        # The freed cells may give the neighbouring roots room to grow.
+        freed_cells = piece.data.cells
+        piece.data.cells = set()
+        piece.data.growth = set()
+        self.update_growth(freed_cells, [])
 
     def update_roots(self, row, col):
 
-        # If the piece at row, col is part of a bounded root, that root is killed.
+        # The piece at row, col has just grown its root; update the growth
+        # points around it.
         piece = self.layout.grid[row][col]
+        piece.data.cells.add((row, col))
+        self.update_growth([(row, col)], [piece])
+
+        # If the piece at row, col is part of a bounded root, that root is killed.
         if self.root_is_bound(piece):
             self.kill_root(piece)
 
             # -1 indicates a suicide.
             return -1
 
-        # Not a suicide; loop through all roots, finding bound ones.
-        bound_root_list = []
-        all_roots = self.black.data.root_list[:]
-        all_roots.extend(self.white.data.root_list)
-        for root in all_roots:
-            if self.root_is_bound(root):
-                bound_root_list.append(root)
-
-        bound_count = 0
+        # Not a suicide; kill every bound root.
+        bound_root_list = list(self.bound_roots)
         for bound_root in bound_root_list:
             self.kill_root(bound_root)
-            bound_count += 1
 
         # Return the number of roots we killed.
-        return bound_count
+        return len(bound_root_list)
 
     def move(self, player, move_bits):
 
@@ -353,77 +371,35 @@ class Tanbo(SeatedGame):
             self.turn = self.black
             self.send_board()
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-            command_bits = command_str.lower().split()
-            primary = command_bits[0]
-
-            if state == "setup":
-
-                if primary in ("size", "sz"):
-
-                    if len(command_bits) == 2:
-                        self.set_size(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid size command.\n")
-                    handled = True
-
-                elif primary in ("done", "ready", "d", "r",):
-
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
+    def handle_move(self, player, move_bits):
 
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
-
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    self.state.set("setup")
-                    handled = True
-
-            elif state == "playing":
-
-                made_move = False
-
-                if primary in ("move", "play", "mv", "pl",):
-
-                    move_bits = demangle_move(command_bits[1:])
-                    if move_bits and len(move_bits) == 1:
-                        made_move = self.move(player, move_bits[0])
-                    else:
-                        self.tell_pre(player, "Invalid move command.\n")
-                    handled = True
-
-                elif primary in ("resign",):
+        move_bits = demangle_move(move_bits)
+        if move_bits and len(move_bits) == 1:
+            if self.move(player, move_bits[0]):
+                self.end_turn()
+        else:
+            self.tell_pre(player, "Invalid move command.\n")
 
-                    made_move = self.resign(player)
-                    handled = True
+    def handle_resign(self, player):
 
-                if made_move:
+        if self.resign(player):
+            self.end_turn()
 
-                    # Did someone win?
-                    winner = self.find_winner()
+    def end_turn(self):
 
-                    if winner:
+        # Did someone win?
+        winner = self.find_winner()
 
-                        # Yup!
-                        self.resolve(winner)
-                        self.finish()
-                    else:
+        if winner:
 
-                        # No.  Change turns and send the board to listeners.
-                        self.turn = self.next_seat(self.turn)
-                        self.send_board()
+            # Yup!
+            self.resolve(winner)
+            self.finish()
+        else:
 
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+            # No.  Change turns and send the board to listeners.
+            self.turn = self.next_seat(self.turn)
+            self.send_board()
 
     def find_winner(self):
 
@@ -447,13 +423,21 @@ class Tanbo(SeatedGame):
         self.send_board()
         self.bc_pre("%s wins!\n" % self.get_sp_str(winner))
 
-    def show_help(self, player):
-
-        super(Tanbo, self).show_help(player)
-        player.tell_cc("\nTANBO SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("     ^!size^. 5|7|9|13|19|21,  ^!sz^.     Set board to <size>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nTANBO PLAY:\n\n")
-        player.tell_cc("      ^!move^. <ln>, ^!play^., ^!mv^., ^!pl^.     Make move <ln> (letter number).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
+# Tanbo's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="TANBO SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "handle_one_arg", TAKES_ARGS, "5|7|9|13|19|21",
+             "Set board to <size>.", "TANBO SETUP PHASE", states=("setup",),
+             setter="set_size", what="size")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="TANBO SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "play", "mv", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Make move <ln> (letter number).", "TANBO PLAY",
+             states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="TANBO PLAY", states=("playing",))
+
+Tanbo.commands = COMMANDS
@@ -18,6 +18,10 @@
 # trick-taking games such as Whist, Spades, Bridge, Bourre, Hokm, and Hearts.
 
 from giles.games.hand import Hand
+from giles.games.playing_card import SUIT_WIDTH, SUIT_BITS
+
+# Mask of every bit of a suit, keyed by card class and suit; see suit_mask().
+SUIT_MASKS = {}
 
 def handle_trick(hand, trump_suit=None, last_wins=False):
     """handle_trick() is a utility function for the vast majority of
@@ -58,6 +62,24 @@ def handle_trick(hand, trump_suit=None, last_wins=False):
     if led_suit == trump_suit:
         trumps_played = True
 
+    # Interned cards (PlayingCard and friends) carry their values around, so
+    # compare those directly instead of going through the operators.  Once
+    # a trump is down only trumps can win; until then, only the led suit.
+    if len([x for x in hand if getattr(x, "ordinal", None) is not None]) == len(hand):
+        best = winner.ordinal
+        for this_card in hand[1:]:
+            this_suit = this_card.suit
+            if this_suit == trump_suit and not trumps_played:
+                winner = this_card
+                best = this_card.ordinal
+                trumps_played = True
+            elif this_suit == (trumps_played and trump_suit or led_suit):
+                value = this_card.ordinal
+                if value > best or (value == best and last_wins):
+                    winner = this_card
+                    best = value
+        return winner
+
     for this_card in hand[1:]:
 
         # We always evaluate trumps.
@@ -88,9 +110,51 @@ def handle_trick(hand, trump_suit=None, last_wins=False):
     # Return the winning card.
     return winner
 
+def suit_mask(card_class, suit):
+
+    # Returns the mask of all of the bits of a suit for a given card class,
+    # or None if the class doesn't have that suit.
+    key = (card_class, suit)
+    if key not in SUIT_MASKS:
+        suit_order = getattr(card_class, "SUIT_ORDER", None)
+        if suit_order and suit in suit_order:
+            SUIT_MASKS[key] = SUIT_BITS << (suit_order.index(suit) * SUIT_WIDTH)
+        else:
+            SUIT_MASKS[key] = None
+    return SUIT_MASKS[key]
+
+def hand_mask(hand):
+    """Returns a hand as a bitmask, with one bit per card (see PlayingCard),
+    or None if it can't be represented as one: if a card has no bit of its
+    own (a joker, say, or something that isn't a PlayingCard at all), or if
+    the hand holds two of the same card.  Hands keep their mask up to date as
+    cards come and go, so for a Hand this is nearly free.
+    """
+
+    mask = getattr(hand, "mask", None)
+    if mask is None:
+        mask = 0
+        for card in hand:
+            bit = getattr(card, "bit", 0)
+            if not bit or mask & bit:
+                return None
+            mask |= bit
+    elif bin(mask).count("1") != len(hand):
+        return None
+    return mask
+
 def hand_has_suit(hand, suit):
 
     # Returns true if the hand has at least one card in a given suit.
+    # If the hand fits in a mask, that's a single AND.
+    if not len(hand):
+        return False
+    mask = hand_mask(hand)
+    if mask is not None:
+        this_suit_mask = suit_mask(type(hand[0]), suit)
+        if this_suit_mask is not None:
+            return bool(mask & this_suit_mask)
+
     cards_in_suit = [x for x in hand if x.suit == suit]
     if len(cards_in_suit):
         return True
@@ -101,6 +165,29 @@ def sorted_hand(hand, trump_suit=None):
     remaining suits arbitrarily.  Returns this newly-sorted hand.
     """
 
+    # If the hand fits in a mask, the mask already has the cards in order
+    # within each suit; just walk the suits, pulling out the set bits from
+    # lowest to highest.
+    mask = hand_mask(hand)
+    if mask is not None and len(hand):
+        card_class = type(hand[0])
+        suit_order = getattr(card_class, "SUIT_ORDER", None)
+        if suit_order:
+            by_bit = dict([(card.bit, card) for card in hand])
+            suits = sorted([x for x in suit_order if x != trump_suit])
+            if trump_suit in suit_order:
+                suits.insert(0, trump_suit)
+
+            s_hand = Hand()
+            for suit in suits:
+                suit_bits = mask & suit_mask(card_class, suit)
+                while suit_bits:
+                    low_bit = suit_bits & -suit_bits
+                    s_hand.add(by_bit[low_bit])
+                    suit_bits ^= low_bit
+            if len(s_hand) == len(hand):
+                return s_hand
+
     trump_cards = Hand()
     other_suits = {}
     for card in hand:
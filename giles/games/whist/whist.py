@@ -15,7 +15,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from giles.games.four_player_card_game_layout import FourPlayerCardGameLayout, NORTH, SOUTH, EAST, WEST
-from giles.games.seated_game import SeatedGame
+from giles.command import CommandTable, TAKES_ARGS
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.hand import Hand
 from giles.games.playing_card import new_deck, str_to_card, card_to_str, hand_to_str, LONG
 from giles.games.seat import Seat
@@ -75,21 +76,6 @@ class Whist(SeatedGame):
 
         self.layout = FourPlayerCardGameLayout()
 
-    def show_help(self, player):
-
-        super(Whist, self).show_help(player)
-        player.tell_cc("\nWHIST SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("            ^!goal^. <num>, ^!score^.     Set the goal score to <num>.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nWHIST PLAY:\n\n")
-        player.tell_cc("              ^!play^. <card>, ^!pl^.     Play <card> from your hand.\n")
-        player.tell_cc("                 ^!hand^., ^!inv^., ^!i^.     Look at the cards in your hand.\n")
-
-    def display(self, player):
-
-        player.tell_cc("%s" % self.layout)
-
     def get_score_str(self):
         return "          ^RNorth/South^~: %d    ^MEast/West^~: %d\n" % (self.ns.score, self.ew.score)
 
@@ -115,9 +101,11 @@ class Whist(SeatedGame):
 
         return to_return
 
+    def get_public_view(self):
+        return [self.layout, self.get_metadata()]
+
     def show(self, player):
-        self.display(player)
-        player.tell_cc(self.get_metadata())
+        self.send_view(player)
 
     def set_goal(self, player, goal_str):
 
@@ -162,7 +150,7 @@ class Whist(SeatedGame):
             seat.data.hand = Hand()
         for i in range(13):
             for seat in self.seats:
-                seat.data.hand.add(deck.discard())
+                seat.data.hand.add(deck.draw())
 
         # Flip the dealer's last card; it determines the trump suit.
         last_card = self.dealer.data.hand[-1]
@@ -273,95 +261,53 @@ class Whist(SeatedGame):
             self.turn = self.next_seat(self.dealer)
             self.layout.change_turn(self.turn.data.who)
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        if not handled:
-
-            state = self.state.get()
-
-            command_bits = command_str.split()
-            primary = command_bits[0].lower()
-
-            if state == "setup":
-
-                if primary in ("goal", "score", "sc", "g",):
-                    if len(command_bits) == 2:
-                        self.set_goal(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid goal command.\n")
-                    handled = True
+    def handle_play(self, player, play_bits):
 
-                elif primary in ("done", "ready", "d", "r",):
-                    self.bc_pre("The game is now looking for players.\n")
-                    self.state.set("need_players")
-                    handled = True
-
-            elif state == "need_players":
-
-                if primary in ("config", "setup", "conf",):
-                    self.state.set("setup")
-                    self.bc_pre("^R%s^~ has switched the game to setup mode.\n" % player)
-                    handled = True
-
-            elif state == "playing":
-
-                card_played = False
-                if primary in ("hand", "inventory", "inv", "i",):
-                    self.show_hand(player)
-                    handled = True
-
-                elif primary in ("play", "move", "pl", "mv",):
-                    if len(command_bits) == 2:
-                        card_played = self.play(player, command_bits[1])
-                    else:
-                        self.tell_pre(player, "Invalid play command.\n")
-                    handled = True
-
-                if card_played:
+        if len(play_bits) == 1:
+            if self.play(player, play_bits[0]):
+                self.end_play()
+        else:
+            self.tell_pre(player, "Invalid play command.\n")
 
-                    # A card hit the table.  We need to do stuff.
-                    if len(self.trick) == 4:
+    def end_play(self):
 
-                        # Finish the trick up.
-                        self.finish_trick()
+        # A card hit the table.  We need to do stuff.
+        if len(self.trick) == 4:
 
-                        # Is that the last trick of this hand?
-                        if self.ns.tricks + self.ew.tricks == 13:
+            # Finish the trick up.
+            self.finish_trick()
 
-                            # Yup.  Finish the hand up.
-                            self.finish_hand()
+            # Is that the last trick of this hand?
+            if self.ns.tricks + self.ew.tricks == 13:
 
-                            # Did someone win the overall game?
-                            winner = self.find_winner()
-                            if winner:
+                # Yup.  Finish the hand up.
+                self.finish_hand()
 
-                                # Yup.  Finish.
-                                self.resolve(winner)
-                                self.finish()
+                # Did someone win the overall game?
+                winner = self.find_winner()
+                if winner:
 
-                            else:
+                    # Yup.  Finish.
+                    self.resolve(winner)
+                    self.finish()
 
-                                # Nope.  Pass the deal to the next dealer...
-                                self.dealer = self.next_seat(self.dealer)
+                else:
 
-                                # Deal and set up the first player.
-                                self.new_deal()
-                                self.turn = self.next_seat(self.dealer)
-                                self.layout.change_turn(self.turn.data.who)
+                    # Nope.  Pass the deal to the next dealer...
+                    self.dealer = self.next_seat(self.dealer)
 
-                    else:
+                    # Deal and set up the first player.
+                    self.new_deal()
+                    self.turn = self.next_seat(self.dealer)
+                    self.layout.change_turn(self.turn.data.who)
 
-                        # Trick not over.  Rotate.
-                        self.turn = self.next_seat(self.turn)
-                        self.layout.change_turn(self.turn.data.who)
-                        if self.turn.player:
-                            self.show_hand(self.turn.player)
+        else:
 
-        if not handled:
-            self.tell_pre(player, "Invalid command.\n")
+            # Trick not over.  Rotate.
+            self.turn = self.next_seat(self.turn)
+            self.layout.change_turn(self.turn.data.who)
+            if self.turn.player:
+                self.show_hand(self.turn.player)
 
     def finish_trick(self):
 
@@ -431,3 +377,24 @@ class Whist(SeatedGame):
             name_one = self.seats[1].player_name
             name_two = self.seats[3].player_name
         self.bc_pre("^G%s^~ and ^G%s^~ win!\n" % (name_one, name_two))
+
+# Whist's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="WHIST SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("goal", "score", "sc", "g"), "handle_one_arg", TAKES_ARGS,
+             "<num>", "Set the goal score to <num>.", "WHIST SETUP PHASE",
+             shown=("goal", "score"), states=("setup",), setter="set_goal",
+             what="goal")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="WHIST SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("play", "move", "pl", "mv"), "handle_play", TAKES_ARGS,
+             "<card>", "Play <card> from your hand.", "WHIST PLAY",
+             shown=("play", "pl"), states=("playing",))
+COMMANDS.add(("hand", "inventory", "inv", "i"), "show_hand",
+             desc="Look at the cards in your hand.", section="WHIST PLAY",
+             shown=("hand", "inv", "i"), states=("playing",))
+
+Whist.commands = COMMANDS
@@ -14,11 +14,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from giles.command import CommandTable, TAKES_ARGS
 from giles.utils import booleanize
 from giles.utils import demangle_move
 from giles.state import State
-from giles.games.seated_game import SeatedGame
+from giles.games.seated_game import SeatedGame, COMMANDS as SEATED_COMMANDS
 from giles.games.seat import Seat
+from giles.games.printable_board import PrintableBoard
 
 # What are the minimum and maximum sizes for the board?
 Y_MIN_SIZE = 2
@@ -213,41 +215,59 @@ class Y(SeatedGame):
 
     def update_printable_board(self):
 
-        self.printable_board = []
-        slash_line = " "
-        char_line = ""
+        # Only lines whose contents (or last-move highlights) have changed
+        # since the last render are rebuilt; see PrintableBoard.
+        if not self.printable_board:
+            self.printable_board = PrintableBoard()
+        board = self.printable_board
+        board.resize(self.size + 2)
+
+        if board.is_stale(self.size, self.size):
+            slash_line = " "
+            char_line = ""
+            for x in range(self.size):
+                color_char = "^W"
+                if x % 2 == 0:
+                    color_char = "^K"
+                slash_line += color_char + "/^~ "
+                char_line += "%s " % COL_CHARACTERS[x]
+            board.set_line(self.size, slash_line + "\n", self.size)
+            board.set_line(self.size + 1, char_line + "\n", self.size)
+
         for x in range(self.size):
-            msg = " "
-            color_char = "^W"
-            if x % 2 == 0:
-                color_char = "^K"
-            slash_line += color_char + "/^~ "
-            char_line += "%s " % COL_CHARACTERS[x]
-            for spc in range(self.size - x):
-                msg += " "
-            for y in range(x + 1):
-                piece = self.board[y][x]
-                if (y, x) in self.last_moves:
-                    msg += "^5"
+            highlights = tuple([y for (y, hx) in self.last_moves if hx == x])
+            pieces = tuple([self.board[y][x] for y in range(x + 1)])
+            line_key = (self.size, pieces, highlights)
+            if not board.is_stale(x, line_key):
+                continue
+
+            bits = [" " * (self.size - x + 1)]
+            for y, piece in enumerate(pieces):
+                if y in highlights:
+                    bits.append("^5")
                 if piece == BLACK:
-                    msg += "^Kx^~ "
+                    bits.append("^Kx^~ ")
                 elif piece == WHITE:
-                    msg += "^Wo^~ "
+                    bits.append("^Wo^~ ")
                 elif y % 2 == 0:
-                    msg += "^m,^~ "
+                    bits.append("^m,^~ ")
                 else:
-                    msg += "^M.^~ "
-            msg += "- " + str(x + 1) + "\n"
-            self.printable_board.append(msg)
-        self.printable_board.append(slash_line + "\n")
-        self.printable_board.append(char_line + "\n")
+                    bits.append("^M.^~ ")
+            bits.append("- " + str(x + 1) + "\n")
+            board.set_line(x, "".join(bits), line_key)
 
-    def print_board(self, player):
+        board.update()
 
+    def get_public_view(self):
+
+        # Just the board; the turn string is broadcast separately.
         if not self.printable_board:
             self.update_printable_board()
-        for line in self.printable_board:
-            player.tell_cc(line)
+        return [self.printable_board]
+
+    def print_board(self, player):
+
+        self.send_view(player)
 
     def get_turn_str(self):
         if self.state.get() == "playing":
@@ -263,8 +283,7 @@ class Y(SeatedGame):
 
     def send_board(self):
 
-        for player in self.channel.listeners:
-            self.print_board(player)
+        self.broadcast_view()
 
     def resign(self, seat):
 
@@ -277,19 +296,6 @@ class Y(SeatedGame):
         self.print_board(player)
         player.tell_cc(self.get_turn_str())
 
-    def show_help(self, player):
-
-        super(Y, self).show_help(player)
-        player.tell_cc("\nY SETUP PHASE:\n\n")
-        player.tell_cc("          ^!setup^., ^!config^., ^!conf^.     Enter setup phase.\n")
-        player.tell_cc("              ^!size^. <size>, ^!sz^.     Set board to size <size>.\n")
-        player.tell_cc("             ^!master^. on|off, ^!m^.     Enable/disable Master Y mode.\n")
-        player.tell_cc("            ^!ready^., ^!done^., ^!r^., ^!d^.     End setup phase.\n")
-        player.tell_cc("\nY PLAY:\n\n")
-        player.tell_cc("      ^!move^. <ln>, ^!play^., ^!mv^., ^!pl^.     Make move <ln> (letter number).\n")
-        player.tell_cc("                         ^!swap^.     Swap the first move (only Black, only their first).\n")
-        player.tell_cc("                       ^!resign^.     Resign.\n")
-
     def tick(self):
 
         # If both seats are full and the game is active, autostart.
@@ -303,115 +309,71 @@ class Y(SeatedGame):
             self.send_board()
             self.channel.broadcast_cc(self.prefix + self.get_turn_str())
 
-    def handle(self, player, command_str):
-
-        # Handle common commands.
-        handled = self.handle_common_commands(player, command_str)
-
-        state = self.state.get()
-
-        command_bits = command_str.split()
-        primary = command_bits[0].lower()
-        if state == "setup":
-
-            if primary in ('size', 'sz'):
-                if len(command_bits) == 2:
-                    self.set_size(player, command_bits[1])
-                else:
-                    player.tell_cc(self.prefix + "Invalid size command.\n")
-                handled = True
-
-            elif primary in ('master', 'm'):
-                if len(command_bits) == 2:
-                    self.set_master(player, command_bits[1])
-                else:
-                    player.tell_cc(self.prefix + "Invalid master command.\n")
-                handled = True
-
-            elif primary in ('done', 'ready', 'd', 'r'):
-
-                self.channel.broadcast_cc(self.prefix + "The game is now looking for players.\n")
-                self.state.set("need_players")
-                handled = True
-
-        elif state == "need_players":
-
-            if primary in ('config', 'setup', 'conf'):
-                self.state.set("setup")
-                self.channel.broadcast_cc(self.prefix + "^R%s^~ has switched the game to setup mode.\n" %
-                   (player))
-                handled = True
+    def get_mover(self, player):
 
-        elif state == "playing":
-
-            made_move = False
-
-            # For all move types, don't bother if it's not this player's turn.
-            if primary in ('move', 'mv', 'play', 'pl', 'swap', 'resign'):
-
-                seat = self.get_seat_of_player(player)
-                if not seat:
-                    player.tell_cc(self.prefix + "You can't move; you're not playing!\n")
-                    return
-
-                elif seat.data.color != self.turn:
-                    player.tell_cc(self.prefix + "You must wait for your turn to move.\n")
-                    return
+        # For all move types, don't bother if it's not this player's turn.
+        seat = self.get_seat_of_player(player)
+        if not seat:
+            player.tell_cc(self.prefix + "You can't move; you're not playing!\n")
+            return None
 
-            if primary in ('move', 'mv', 'play', 'pl'):
-                move_bits = demangle_move(command_bits[1:])
-                if move_bits:
-                    success = self.move(seat, move_bits)
-                    if success:
-                        move = success
-                        made_move = True
-                    else:
-                        player.tell_cc(self.prefix + "Unsuccessful move.\n")
-                else:
-                    player.tell_cc(self.prefix + "Unsuccessful move.\n")
+        elif seat.data.color != self.turn:
+            player.tell_cc(self.prefix + "You must wait for your turn to move.\n")
+            return None
 
-                handled = True
+        return seat
 
-            elif primary in ('swap',):
+    def handle_move(self, player, move_bits):
 
-                if self.turn_number == 2 and seat.player == player:
-                    self.swap()
-                    move = "swap"
-                    made_move = True
+        seat = self.get_mover(player)
+        if not seat:
+            return
 
-                else:
-                    player.tell_cc(self.prefix + "Unsuccessful swap.\n")
+        move_bits = demangle_move(move_bits)
+        if move_bits:
+            move = self.move(seat, move_bits)
+            if move:
+                self.end_turn(move)
+            else:
+                player.tell_cc(self.prefix + "Unsuccessful move.\n")
+        else:
+            player.tell_cc(self.prefix + "Unsuccessful move.\n")
 
-                handled = True
+    def handle_swap(self, player):
 
-            elif primary in ('resign',):
+        seat = self.get_mover(player)
+        if not seat:
+            return
 
-                if self.resign(seat):
-                    move = "resign"
-                    made_move = True
+        if self.turn_number == 2 and seat.player == player:
+            self.swap()
+            self.end_turn("swap")
+        else:
+            player.tell_cc(self.prefix + "Unsuccessful swap.\n")
 
-                handled = True
+    def handle_resign(self, player):
 
-            if made_move:
+        seat = self.get_mover(player)
+        if seat and self.resign(seat):
+            self.end_turn("resign")
 
-                self.update_printable_board()
-                self.send_board()
-                self.move_list.append(move)
-                self.turn_number += 1
+    def end_turn(self, move):
 
-                winner = self.find_winner()
-                if winner:
-                    self.resolve(winner)
-                    self.finish()
-                else:
-                    if self.turn == WHITE:
-                        self.turn = BLACK
-                    else:
-                        self.turn = WHITE
-                    self.channel.broadcast_cc(self.prefix + self.get_turn_str())
+        self.update_printable_board()
+        self.send_board()
+        self.move_list.append(move)
+        self.turn_number += 1
 
-        if not handled:
-            player.tell_cc(self.prefix + "Invalid command.\n")
+        winner = self.find_winner()
+        if winner:
+            self.resolve(winner)
+            self.finish()
+        else:
+            if self.turn == WHITE:
+                self.turn = BLACK
+            else:
+                self.turn = WHITE
+            self.channel.broadcast_cc(self.prefix + self.get_turn_str())
 
     def find_winner(self):
 
@@ -498,3 +460,28 @@ class Y(SeatedGame):
 
     def resolve(self, winner):
         self.channel.broadcast_cc(self.prefix + "^C%s^~ wins!\n" % (winner))
+
+# Y's own commands, on top of the seated ones.
+COMMANDS = CommandTable(parent=SEATED_COMMANDS)
+COMMANDS.add(("config", "setup", "conf"), "enter_setup",
+             desc="Enter setup phase.", section="Y SETUP PHASE",
+             shown=("setup", "config", "conf"), states=("need_players",))
+COMMANDS.add(("size", "sz"), "handle_one_arg", TAKES_ARGS, "<size>",
+             "Set board to size <size>.", "Y SETUP PHASE", states=("setup",),
+             setter="set_size", what="size")
+COMMANDS.add(("master", "m"), "handle_one_arg", TAKES_ARGS, "on|off",
+             "Enable/disable Master Y mode.", "Y SETUP PHASE",
+             states=("setup",), setter="set_master", what="master")
+COMMANDS.add(("done", "ready", "d", "r"), "finish_setup",
+             desc="End setup phase.", section="Y SETUP PHASE",
+             shown=("ready", "done", "r", "d"), states=("setup",))
+COMMANDS.add(("move", "mv", "play", "pl"), "handle_move", TAKES_ARGS, "<ln>",
+             "Make move <ln> (letter number).", "Y PLAY",
+             shown=("move", "play", "mv", "pl"), states=("playing",))
+COMMANDS.add(("swap",), "handle_swap",
+             desc="Swap the first move (only Black, only their first).",
+             section="Y PLAY", states=("playing",))
+COMMANDS.add(("resign",), "handle_resign", desc="Resign.",
+             section="Y PLAY", states=("playing",))
+
+Y.commands = COMMANDS
@@ -15,6 +15,20 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from giles.utils import name_is_valid, MAX_NAME_LENGTH
+from miniboa.bucket import TokenBucket
+from miniboa.xterm import colorize, cursor_to, scroll_region
+from miniboa.xterm import CLEAR_SCREEN, CLEAR_TO_EOL, SAVE_CURSOR, RESTORE_CURSOR
+
+# How many rows of the screen a live board must leave free for chat.
+LIVE_BOARD_MIN_FREE_ROWS = 6
+
+# How fast a player may talk on channels and send tells: a burst of this
+# many, then one every so many seconds.  They're limited separately so
+# chatting on a channel doesn't stop you from answering a tell.
+CHANNEL_BURST = 5
+CHANNEL_INTERVAL = 2
+TELL_BURST = 5
+TELL_INTERVAL = 1
 
 class Player(object):
     """A player on Giles.  Tracks their name, current location, and other
@@ -38,9 +52,23 @@ class Player(object):
 
             "color": True,
             "timestamps": False,
+            "live_board": False,
         }
         self.state = state
 
+        # Limits on how fast this player's messages fan out to others.
+        self.channel_limit = TokenBucket(1.0 / CHANNEL_INTERVAL, CHANNEL_BURST)
+        self.tell_limit = TokenBucket(1.0 / TELL_INTERVAL, TELL_BURST)
+
+        # When the server next checks whether to send a keepalive probe.
+        self.keepalive_time = None
+
+        # Live board state: the game that owns the top of the screen, the
+        # lines currently drawn there, and the screen height it assumed.
+        self.live_owner = None
+        self.live_lines = None
+        self.live_rows = None
+
     def __repr__(self):
         return self.display_name
 
@@ -101,7 +129,68 @@ class Player(object):
             msg = "(^C%s^~) %s" % (self.server.timestamp, msg)
         self.client.send_cc(msg)
 
-    def prompt(self):
+    def tell_layout(self, layout):
+        # Layouts keep their own colorized output around, so send that
+        # as-is rather than colorizing the whole board again.
+        msg = layout.get_colorized(self.client.use_ansi)
+        if self.config["timestamps"]:
+            msg = colorize("(^C%s^~) " % self.server.timestamp,
+                           self.client.use_ansi) + msg
+        self.client.send(msg)
+
+    def wants_live_board(self):
+        # Live boards need cursor addressing, so only bother for clients
+        # that have told us what they are and that have colour turned on.
+        return (self.config["live_board"] and self.client.use_ansi and
+                self.client.terminal_type != 'unknown client')
+
+    def draw_live_board(self, owner, layout):
+        # Pin the layout to the top of the screen and scroll everything else
+        # underneath it.  The first draw (or any change of owner, shape, or
+        # screen size) paints the whole board; after that only the lines
+        # that differ from what's on screen are rewritten in place.  Returns
+        # False if the board won't fit, in which case send it normally.
+        lines = layout.get_colorized(True).strip("\n").split("\n")
+        rows = self.client.rows
+        if len(lines) + LIVE_BOARD_MIN_FREE_ROWS > rows:
+            self.release_live_board()
+            return False
+
+        if (owner != self.live_owner or rows != self.live_rows or
+           not self.live_lines or len(lines) != len(self.live_lines)):
+            msg = (scroll_region() + CLEAR_SCREEN + cursor_to(1) +
+                   "".join([x + CLEAR_TO_EOL + "\n" for x in lines]) +
+                   scroll_region(len(lines) + 1, rows) + cursor_to(rows))
+        else:
+            changed = [i for i, line in enumerate(lines)
+                       if line != self.live_lines[i]]
+            if not changed:
+                return True
+            msg = SAVE_CURSOR
+            for i in changed:
+                msg += cursor_to(i + 1) + lines[i] + CLEAR_TO_EOL
+            msg += RESTORE_CURSOR
+
+        self.live_owner = owner
+        self.live_lines = lines
+        self.live_rows = rows
+        self.client.send(msg)
+        return True
+
+    def redraw_live_board(self):
+        # Forget what's on screen so the next draw is a full one.
+        self.live_lines = None
+
+    def release_live_board(self, owner=None):
+        # Give the whole screen back to scrolling text.  If an owner is
+        # given, only do so if it's the one currently holding the board.
+        if self.live_owner and (owner is None or owner == self.live_owner):
+            self.client.send(scroll_region() + cursor_to(self.client.rows))
+            self.live_owner = None
+            self.live_lines = None
+            self.live_rows = None
+
+    def prompt(self, redraw=True):
         if self.server.admin_manager.is_admin(self):
             loc_color_code = "^R"
             ts_color_code = "^R"
@@ -115,4 +204,7 @@ class Player(object):
             msg = "^Y*%s*^~ %s" % (self.config["focus_table"], msg)
         if self.config["timestamps"]:
             msg = "(%s%s^~) %s" % (ts_color_code, self.server.timestamp, msg)
-        self.client.send_prompt_cc(msg)
+        if redraw:
+            self.client.send_prompt_cc(msg)
+        else:
+            self.client.set_prompt_cc(msg)
@@ -14,9 +14,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import deque
 from datetime import datetime, timedelta
-from miniboa import TelnetServer
+from miniboa import OffloadServer, ReactorServer, TelnetServer
 
+import random
 import sys
 import time
 import traceback
@@ -43,9 +45,22 @@ from giles.state import State
 CLEANUP_INTERVAL_SECONDS = 10
 CLEANUP_INTERVAL_TICKS = 500
 
-# What about keepalives?
+# What about keepalives?  The kernel watches for dead connections (see
+# miniboa.async), but we also nudge any client that's been quiet for a
+# while, about once a minute each.  Each player gets their own deadline,
+# jittered, so the nudges trickle out rather than all going at once; the
+# check for who's due runs every second.
+KEEPALIVE_CHECK_SECONDS = 1
+KEEPALIVE_CHECK_TICKS = 25
 KEEPALIVE_INTERVAL_SECONDS = 60
-KEEPALIVE_INTERVAL_TICKS = 1500
+KEEPALIVE_QUIET_SECONDS = 60
+
+# When the clock ticks over a minute, everyone chatting with timestamps on
+# gets a fresh prompt.  Those are spread across this many seconds rather
+# than all sent at once.  Players idle at least PROMPT_IDLE_SECONDS just
+# have their prompt updated in place, to go out with their next output.
+PROMPT_REFRESH_WINDOW_SECONDS = 5
+PROMPT_IDLE_SECONDS = 300
 
 # And gameplay ticks?
 GAMEPLAY_INTERVAL_SECONDS = 0.5
@@ -91,18 +106,72 @@ class Server(object):
         # No telnet server yet; that needs instantiate().
         self.telnet = None
 
+        # Prompt refreshes still to go out, as (when, player, midnight),
+        # in order of when.
+        self.prompt_refreshes = deque()
+
+        # Input flood settings for new clients; None keeps miniboa's.
+        self.command_queue = None
+        self.flood_disconnect = False
+
         # Set up the global channel for easy access.
         self.wall = self.channel_manager.channels[0]
         self.log.log("Server started up.")
 
-    def instantiate(self, port, timeout=.05):
-        self.telnet = TelnetServer(
+    def instantiate(self, port, timeout=.05, backend="select",
+                    websocket_port=None, tls_port=None, tls_certfile=None,
+                    tls_keyfile=None, backlog=None, max_per_ip=None,
+                    connect_rate=None, connect_burst=None,
+                    command_queue=None, flood_disconnect=False,
+                    io_workers=0):
+
+        # The "reactor" backend waits on epoll/poll and runs our periodic
+        # work as timers; the default "select" one is the classic miniboa
+        # poll loop, with the tickers in loop() doing the timing.
+        if backend == "reactor":
+            server_class = ReactorServer
+        else:
+            server_class = TelnetServer
+
+        self.command_queue = command_queue
+        self.flood_disconnect = flood_disconnect
+
+        # Only pass the admission limits we were given; miniboa has defaults.
+        # A limit of 0 is given (it means "no limit"), so check for None.
+        limits = {}
+        if backlog:
+            limits["backlog"] = backlog
+        if max_per_ip is not None:
+            limits["max_per_ip"] = max_per_ip
+        if connect_rate is not None:
+            limits["connect_rate"] = connect_rate
+        if connect_burst is not None:
+            limits["connect_burst"] = connect_burst
+        # With I/O workers, they run the chosen backend and own the
+        # sockets, and we only see lines in and output out.
+        if io_workers:
+            limits["workers"] = io_workers
+            limits["server_class"] = server_class
+            server_class = OffloadServer
+
+        self.telnet = server_class(
            port=port,
            address='',
            on_connect=self.connect_client,
            on_disconnect=self.disconnect_client,
-           timeout=timeout)
-        self.log.log("Listening on port %d." % port)
+           timeout=timeout,
+           websocket_port=websocket_port,
+           tls_port=tls_port,
+           tls_certfile=tls_certfile,
+           tls_keyfile=tls_keyfile,
+           **limits)
+        self.log.log("Listening on port %d (%s backend)." % (port, backend))
+        if io_workers:
+            self.log.log("Network I/O is in %d worker processes." % io_workers)
+        if websocket_port:
+            self.log.log("Listening for WebSockets on port %d." % websocket_port)
+        if tls_port:
+            self.log.log("Listening for TLS on port %d." % tls_port)
         self.startup_datetime = datetime.now()
         self.update_timestamp()
 
@@ -118,11 +187,16 @@ class Server(object):
 
     def loop(self):
 
+        if isinstance(self.telnet, ReactorServer):
+            self.loop_scheduled()
+            return
+
         cleanup_time = keepalive_time = gametick_time = time.time()
         cleanup_ticker = keepalive_ticker = gametick_ticker = 0
         while self.should_run:
             self.telnet.poll()
             self.handle_players()
+            self.refresh_prompts()
 
             # Handle time and the tickers.
             curr_time = time.time()
@@ -130,15 +204,13 @@ class Server(object):
             cleanup_ticker += 1
             if ((cleanup_time + CLEANUP_INTERVAL_SECONDS <= curr_time) or
              ((cleanup_ticker % CLEANUP_INTERVAL_TICKS) == 0)):
-                self.cleanup()
-                self.channel_manager.cleanup()
-                self.game_master.cleanup()
+                self.cleanup_all()
                 cleanup_time = curr_time
                 cleanup_ticker = 0
 
             keepalive_ticker += 1
-            if ((keepalive_time + KEEPALIVE_INTERVAL_SECONDS <= curr_time) or
-             ((keepalive_ticker % KEEPALIVE_INTERVAL_TICKS) == 0)):
+            if ((keepalive_time + KEEPALIVE_CHECK_SECONDS <= curr_time) or
+             ((keepalive_ticker % KEEPALIVE_CHECK_TICKS) == 0)):
                 self.keepalive()
                 keepalive_time = curr_time
                 keepalive_ticker = 0
@@ -146,20 +218,58 @@ class Server(object):
             gametick_ticker += 1
             if ((gametick_time + GAMEPLAY_INTERVAL_SECONDS <= curr_time) or
              ((gametick_ticker % GAMEPLAY_INTERVAL_TICKS) == 0)):
-                self.game_master.tick()
+                self.gametick()
                 gametick_time = curr_time
                 gametick_ticker = 0
 
-                # Since this is more than once a second, abuse it to update
-                # the timestamp as well. If the timestamp actually changed
-                # then update the prompts for all players.
-                if self.update_timestamp():
-                    if self.update_day():
-                        self.announce_midnight()
-                    self.update_prompts()
+        self.log.log("Server shutting down.")
+
+    def loop_scheduled(self):
+
+        # Same work as loop(), but the reactor runs the periodic bits as
+        # timers, so each pass only has to poll and handle players.
+        self.telnet.call_every(CLEANUP_INTERVAL_SECONDS, self.cleanup_all)
+        self.telnet.call_every(KEEPALIVE_CHECK_SECONDS, self.keepalive)
+        self.telnet.call_every(GAMEPLAY_INTERVAL_SECONDS, self.gametick)
+        while self.should_run:
+            self.telnet.poll()
+            self.handle_players()
+            self.refresh_prompts()
 
         self.log.log("Server shutting down.")
 
+    def cleanup_all(self):
+        self.cleanup()
+        self.channel_manager.cleanup()
+        self.game_master.cleanup()
+
+    def gametick(self):
+        self.game_master.tick()
+
+        # Since this is more than once a second, abuse it to update
+        # the timestamp as well. If the timestamp actually changed
+        # then update the prompts for all players (and, at midnight, tell
+        # them the date).
+        if self.update_timestamp():
+            self.update_prompts(self.update_day())
+
+    def run_blocking(self, func, args=(), callback=None):
+
+        # Run something slow (database work, password hashing) without
+        # holding up everyone else, if the backend can; callback gets
+        # (result, error) once it's done.  Otherwise just run it now.
+        if isinstance(self.telnet, ReactorServer):
+            self.telnet.run_in_executor(func, args, callback)
+            return
+
+        result, error = None, None
+        try:
+            result = func(*args)
+        except Exception as e:
+            error = e
+        if callback:
+            callback(result, error)
+
     def connect_client(self, client):
 
         # Log the connection and instantiate a new player for this connection.
@@ -170,9 +280,26 @@ class Server(object):
         # Now set their state to the name entry screen.
         new_player.state = State("login")
 
-        # Enable echo/char mode on the client connection
+        # Bound how much input they can queue up, and what happens if
+        # they go over.
+        if self.command_queue:
+            client.max_commands = self.command_queue
+        client.flood_disconnect = self.flood_disconnect
+
+        # Enable echo/char mode on the client connection, but ask it to
+        # do its own line editing if it can; we drop back out of echoing
+        # if it agrees.
         client.request_will_echo()
         client.request_will_sga()
+        client.request_linemode()
+
+        # Find out what the client is and how big its screen is; live
+        # boards need both.
+        client.request_terminal_type()
+        client.request_naws()
+
+        # Offer to compress output; board redraws squash very nicely.
+        client.request_compression()
 
     def disconnect_client(self, client):
         self.log.log("Client disconnect on port %s." % client.addrport())
@@ -203,12 +330,50 @@ class Server(object):
                     self.log.log("The chat module bombed with player %s: %s\n%s" % (player.name, e, traceback.format_exc()))
                     player.prompt()
 
-    def announce_midnight(self):
-        for player in self.players:
-            player.tell_cc("It is now ^C%s^~.\n" % self.current_day)
+    def announce_midnight(self, player):
+        player.tell_cc("It is now ^C%s^~.\n" % self.current_day)
 
-    def update_prompts(self):
+    def update_prompts(self, midnight=False):
+
+        # Players who have output waiting anyway get their new prompt now,
+        # in the same write; idle ones get it quietly, next time they're
+        # sent something.  Everyone else is queued, spread evenly across
+        # the refresh window.  At midnight everyone is queued, since they
+        # all have the date to hear about.
+        curr_time = time.time()
+        due = []
         for player in self.players:
+            wants_prompt = (player.state.get() == "chat" and
+                            player.config["timestamps"])
+            if midnight:
+                due.append(player)
+            elif not wants_prompt:
+                continue
+            elif player.client.send_pending:
+                player.prompt()
+            elif player.client.idle() >= PROMPT_IDLE_SECONDS:
+                player.prompt(redraw=False)
+            else:
+                due.append(player)
+
+        if due:
+            step = float(PROMPT_REFRESH_WINDOW_SECONDS) / len(due)
+            for i, player in enumerate(due):
+                self.prompt_refreshes.append((curr_time + i * step, player,
+                                              midnight))
+
+    def refresh_prompts(self):
+
+        # Send the queued prompt refreshes that have come due.
+        if not self.prompt_refreshes:
+            return
+        curr_time = time.time()
+        while self.prompt_refreshes and self.prompt_refreshes[0][0] <= curr_time:
+            when, player, midnight = self.prompt_refreshes.popleft()
+            if not player.client.active:
+                continue
+            if midnight:
+                self.announce_midnight(player)
             if player.state.get() == "chat" and player.config["timestamps"]:
                 player.prompt()
 
@@ -256,7 +421,17 @@ class Server(object):
 
     def keepalive(self):
 
-        # For now, just request a window size negotiation.  Unexciting,
-        # but it /is/ traffic over the TCP connection.
+        # Send a probe (a telnet NOP, or a WebSocket ping) to each player
+        # whose deadline has come, if their connection has been quiet.
+        # Deadlines start at a random point in the first interval and
+        # wander by up to a quarter of it each time, so they stay spread.
+        curr_time = time.time()
         for player in self.players:
-            player.client.request_naws()
+            if not player.keepalive_time:
+                player.keepalive_time = (curr_time +
+                   random.uniform(0, KEEPALIVE_INTERVAL_SECONDS))
+            elif player.keepalive_time <= curr_time:
+                if player.client.quiet() >= KEEPALIVE_QUIET_SECONDS:
+                    player.client.send_keepalive()
+                player.keepalive_time = (curr_time + KEEPALIVE_INTERVAL_SECONDS *
+                   random.uniform(0.75, 1.25))
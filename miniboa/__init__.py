@@ -13,6 +13,8 @@
 #------------------------------------------------------------------------------
 
 from miniboa.async import TelnetServer
+from miniboa.reactor import ReactorServer
+from miniboa.offload import OffloadServer
 
 
 
@@ -16,11 +16,17 @@
 Handle Asynchronous Telnet Connections.
 """
 
+import errno
 import socket
 import select
+import ssl
 import sys
+import time
 
+from miniboa.bucket import TokenBucket
 from miniboa.telnet import TelnetClient
+from miniboa.tls import PendingHandshake, TLSTelnetClient, make_server_context
+from miniboa.websocket import WebSocketClient
 from miniboa.error import BogConnectionLost
 
 ## Cap sockets to 512 on Windows because winsock can only process 512 at time
@@ -30,6 +36,30 @@ if sys.platform == 'win32':
 else:
     MAX_CONNECTIONS = 1000
 
+## How many unaccepted connections the kernel may queue for us, and how
+## many we take off that queue per readiness event; the rest wait for the
+## next poll so a reconnect storm can't starve players already on.
+LISTEN_BACKLOG = 128
+MAX_ACCEPTS_PER_EVENT = 32
+
+## Per-address admission limits: connections open at once, and a token
+## bucket of new connections (CONNECT_BURST at once, refilling at
+## CONNECT_RATE per second).
+MAX_CONNECTIONS_PER_IP = 10
+CONNECT_RATE = 0.5
+CONNECT_BURST = 5
+
+## TCP keepalive settings for every accepted connection: the kernel starts
+## probing a connection after KEEPALIVE_IDLE quiet seconds and gives up
+## after KEEPALIVE_COUNT unanswered probes KEEPALIVE_INTERVAL apart.  Where
+## the platform lacks the knobs we settle for SO_KEEPALIVE's defaults.
+KEEPALIVE_IDLE = 120
+KEEPALIVE_INTERVAL = 30
+KEEPALIVE_COUNT = 4
+
+## Sent, best effort, to connections we turn away.
+REJECT_MESSAGE = "Too many connections; please try again in a minute.\r\n"
+
 
 #-----------------------------------------------------Dummy Connection Handlers
 
@@ -55,7 +85,10 @@ class TelnetServer(object):
     Poll sockets for new connections and sending/receiving data from clients.
     """
     def __init__(self, port=7777, address='', on_connect=_on_connect,
-            on_disconnect=_on_disconnect, timeout=0.005):
+            on_disconnect=_on_disconnect, timeout=0.005, websocket_port=None,
+            tls_port=None, tls_certfile=None, tls_keyfile=None,
+            backlog=LISTEN_BACKLOG, max_per_ip=MAX_CONNECTIONS_PER_IP,
+            connect_rate=CONNECT_RATE, connect_burst=CONNECT_BURST):
         """
         Create a new Telnet Server.
 
@@ -75,6 +108,25 @@ class TelnetServer(object):
 
         timeout -- amount of time that Poll() will wait from user inport
             before returning.  Also frees a slice of CPU time.
+
+        websocket_port -- if given, also listen on this port for browsers
+            connecting via WebSocket.  They get WebSocketClients, which
+            look just like TelnetClients to on_connect and everything else.
+
+        tls_port, tls_certfile, tls_keyfile -- if given, also listen on
+            tls_port for telnet over TLS, using the certificate chain (and
+            key, if it's not in the same file) given.  Clients are only
+            passed to on_connect once their handshake has finished.
+
+        backlog -- the listen() backlog for every listening socket.
+
+        max_per_ip -- how many connections one address may have open, or
+            0 for no limit.
+
+        connect_rate, connect_burst -- how fast one address may open new
+            connections: connect_burst at once, then connect_rate a second.
+            A connect_rate of 0 turns this off.  Connections over any limit
+            are sent a short notice and closed.
         """
 
         self.port = port
@@ -82,22 +134,79 @@ class TelnetServer(object):
         self.on_connect = on_connect
         self.on_disconnect = on_disconnect
         self.timeout = timeout
+        self.backlog = backlog
+        self.max_per_ip = max_per_ip
+        self.connect_rate = connect_rate
+        self.connect_burst = connect_burst
+
+        ## Open connections (clients and handshakes) per address, and each
+        ## address's connect TokenBucket.
+        self.ip_counts = {}
+        self.ip_buckets = {}
+        self.last_bucket_sweep = time.time()
+
+        ## Admission counters
+        self.accepted = 0
+        self.rejected_full = 0
+        self.rejected_ip = 0
+        self.rejected_rate = 0
+
+        ## Dictionary of listening sockets,
+        ## key = file descriptor, value = (socket, client class, TLS context)
+        self.listeners = {}
+
+        ## TLS connections still handshaking, keyed by file descriptor, and
+        ## how handshakes have been going.
+        self.handshakes = {}
+        self.tls_handshakes = 0
+        self.tls_failures = 0
+        self.tls_timeouts = 0
+
+        self.server_socket = self._listen(address, port, TelnetClient)
+        self.server_fileno = self.server_socket.fileno()
+
+        self.websocket_port = websocket_port
+        if websocket_port:
+            self._listen(address, websocket_port, WebSocketClient)
+
+        self.tls_port = tls_port
+        self.tls_context = None
+        if tls_port:
+            try:
+                self.tls_context = make_server_context(tls_certfile, tls_keyfile)
+            except (IOError, ssl.SSLError), err:
+                print >> sys.stderr, "Unable to load the TLS certificate:", err
+                sys.exit(1)
+            self._listen(address, tls_port, TLSTelnetClient, self.tls_context)
 
+        ## Dictionary of active clients,
+        ## key = file descriptor, value = TelnetClient (see miniboa.telnet)
+        self.clients = {}
+
+        ## Other file descriptors to wait on, and what to call when each is
+        ## readable; see watch().
+        self.watched = {}
+
+    def _listen(self, address, port, client_class, context=None):
+        """
+        Open a listening socket whose connections become client_class,
+        after a TLS handshake if there's a context.
+        """
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
             server_socket.bind((address, port))
-            server_socket.listen(5)
+            server_socket.listen(self.backlog)
         except socket.error, err:
             print >> sys.stderr, "Unable to create the server socket:", err
             sys.exit(1)
 
-        self.server_socket = server_socket
-        self.server_fileno = server_socket.fileno()
+        ## Non-blocking, so we can accept until the queue runs dry.
+        server_socket.setblocking(0)
 
-        ## Dictionary of active clients,
-        ## key = file descriptor, value = TelnetClient (see miniboa.telnet)
-        self.clients = {}
+        self.listeners[server_socket.fileno()] = (server_socket, client_class,
+            context)
+        return server_socket
 
     def client_count(self):
         """
@@ -105,6 +214,50 @@ class TelnetServer(object):
         """
         return len(self.clients)
 
+    def watch(self, fileno, callback):
+        """
+        Have poll() wake for, and call callback() when, fileno is readable.
+        """
+        self.watched[fileno] = callback
+
+    def close(self):
+        """
+        Close the listening sockets (and anything else the server opened
+        for itself).  Clients are left alone.
+        """
+        for listen_socket, client_class, context in self.listeners.values():
+            listen_socket.close()
+        self.listeners = {}
+
+    def after_fork(self):
+        """
+        Called in a child process that will serve this server's sockets
+        (see miniboa.offload); anything that can't be shared with the
+        parent gets remade here.
+        """
+        pass
+
+    def admission_stats(self):
+        """
+        Returns a dictionary of connections accepted and turned away, by
+        reason.
+        """
+        return {'accepted': self.accepted, 'full': self.rejected_full,
+            'per_ip': self.rejected_ip, 'rate': self.rejected_rate,
+            'addresses': len(self.ip_counts)}
+
+    def tls_stats(self):
+        """
+        Returns a dictionary of TLS counters: handshakes finished, failed
+        and timed out, and how many finished ones resumed a session.
+        """
+        stats = {'handshakes': self.tls_handshakes,
+            'failures': self.tls_failures, 'timeouts': self.tls_timeouts,
+            'pending': len(self.handshakes), 'resumed': 0}
+        if self.tls_context:
+            stats['resumed'] = self.tls_context.session_stats()['hits']
+        return stats
+
     def client_list(self):
         """
         Returns a list of connected clients.
@@ -121,18 +274,12 @@ class TelnetServer(object):
         """
         #print len(self.connections)
         ## Build a list of connections to test for receive data pending
-        recv_list = [self.server_fileno]    # always add the server
+        recv_list = self.listeners.keys()   # always add the listeners
+        recv_list.extend(self.watched)
 
+        self._remove_inactive()
         for client in self.clients.values():
-            if client.active:
-                recv_list.append(client.fileno)
-            ## Delete inactive connections from the dictionary
-            else:
-                #print "-- Lost connection to %s" % client.addrport()
-                #client.sock.close()
-                self.on_disconnect(client)
-                del self.clients[client.fileno]
-
+            recv_list.append(client.fileno)
 
         ## Build a list of connections that need to send data
         send_list = []
@@ -140,6 +287,15 @@ class TelnetServer(object):
             if client.send_pending:
                 send_list.append(client.fileno)
 
+        ## TLS handshakes wait on whichever way OpenSSL asked for
+        if self.handshakes:
+            self._expire_handshakes()
+            for pending in self.handshakes.values():
+                if pending.want_write:
+                    send_list.append(pending.fileno)
+                else:
+                    recv_list.append(pending.fileno)
+
         ## Get active socket file descriptors from select.select()
         try:
             rlist, slist, elist = select.select(recv_list, send_list, [],
@@ -154,38 +310,226 @@ class TelnetServer(object):
         ## Process socket file descriptors with data to recieve
         for sock_fileno in rlist:
 
-            ## If it's coming from the server's socket then this is a new
+            ## If it's coming from a listening socket then this is a new
             ## connection request.
-            if sock_fileno == self.server_fileno:
-
-                try:
-                    sock, addr_tup = self.server_socket.accept()
-
-                except socket.error, err:
-                    print >> sys.stderr, ("!! ACCEPT error '%d:%s'." %
-                        (err[0], err[1]))
-                    continue
+            if sock_fileno in self.listeners:
+                self._accept_connection(sock_fileno)
 
-                ## Check for maximum connections
-                if self.client_count() >= MAX_CONNECTIONS:
-                    print '?? Refusing new connection; maximum in use.'
-                    sock.close()
-                    continue
+            elif sock_fileno in self.handshakes:
+                self._continue_handshake(sock_fileno)
 
-                new_client = TelnetClient(sock, addr_tup)
-                #print "++ Opened connection to %s" % new_client.addrport()
-                ## Add the connection to our dictionary and call handler
-                self.clients[new_client.fileno] = new_client
-                self.on_connect(new_client)
+            elif sock_fileno in self.watched:
+                self.watched[sock_fileno]()
 
             else:
-                ## Call the connection's recieve method
-                try:
-                    self.clients[sock_fileno].socket_recv()
-                except BogConnectionLost:
-                    self.clients[sock_fileno].deactivate()
+                self._client_recv(sock_fileno)
 
         ## Process sockets with data to send
         for sock_fileno in slist:
+            if sock_fileno in self.handshakes:
+                self._continue_handshake(sock_fileno)
+
             ## Call the connection's send method
-            self.clients[sock_fileno].socket_send()
+            elif sock_fileno in self.clients:
+                self.clients[sock_fileno].socket_send()
+
+    def _remove_inactive(self):
+        """
+        Delete inactive connections from the dictionary.
+        """
+        for client in self.clients.values():
+            if not client.active:
+                #print "-- Lost connection to %s" % client.addrport()
+                #client.sock.close()
+                self.on_disconnect(client)
+                del self.clients[client.fileno]
+                self._release_address(client.address)
+
+    def _accept_connection(self, listen_fileno):
+        """
+        Accept the connections waiting on a listener, up to
+        MAX_ACCEPTS_PER_EVENT of them, and admit or turn away each.
+        """
+        listen_socket, client_class, context = self.listeners[listen_fileno]
+        for i in xrange(MAX_ACCEPTS_PER_EVENT):
+            try:
+                sock, addr_tup = listen_socket.accept()
+
+            except socket.error, err:
+                if err[0] not in (errno.EAGAIN, errno.EWOULDBLOCK,
+                        errno.EINTR, errno.ECONNABORTED):
+                    print >> sys.stderr, ("!! ACCEPT error '%d:%s'." %
+                        (err[0], err[1]))
+                break
+
+            reason = self._check_admission(addr_tup[0])
+            if reason:
+                self._reject(sock, reason)
+            else:
+                self.accepted += 1
+                self.ip_counts[addr_tup[0]] = (
+                    self.ip_counts.get(addr_tup[0], 0) + 1)
+                self._admit(sock, addr_tup, client_class, context)
+
+    def _check_admission(self, address):
+        """
+        Returns why a connection from address should be turned away, or
+        None if it's welcome.
+        """
+        if self.client_count() + len(self.handshakes) >= MAX_CONNECTIONS:
+            return 'full'
+        if self.max_per_ip and self.ip_counts.get(address, 0) >= self.max_per_ip:
+            return 'per_ip'
+        if not self.connect_rate:
+            return None
+
+        ## Take a token from this address's bucket.
+        now = time.time()
+        bucket = self.ip_buckets.get(address)
+        if not bucket:
+            bucket = TokenBucket(self.connect_rate, self.connect_burst)
+            self.ip_buckets[address] = bucket
+        if not bucket.take(now):
+            return 'rate'
+
+        ## Buckets that have refilled tell us nothing; sweep them out now
+        ## and then so the table doesn't grow without bound.
+        if now - self.last_bucket_sweep > 60:
+            for other, bucket in self.ip_buckets.items():
+                if bucket.is_full(now):
+                    del self.ip_buckets[other]
+            self.last_bucket_sweep = now
+        return None
+
+    def _reject(self, sock, reason):
+        """
+        Send the rejection notice if the socket will take it right away,
+        and hang up.
+        """
+        if reason == 'full':
+            self.rejected_full += 1
+        elif reason == 'per_ip':
+            self.rejected_ip += 1
+        else:
+            self.rejected_rate += 1
+        try:
+            sock.setblocking(0)
+            sock.send(REJECT_MESSAGE)
+        except socket.error:
+            pass
+        sock.close()
+
+    def _set_keepalive(self, sock):
+        """
+        Have the kernel check up on a connection that goes quiet.
+        """
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE,
+                    KEEPALIVE_IDLE)
+            if hasattr(socket, 'TCP_KEEPINTVL'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL,
+                    KEEPALIVE_INTERVAL)
+            if hasattr(socket, 'TCP_KEEPCNT'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT,
+                    KEEPALIVE_COUNT)
+        except socket.error:
+            pass
+
+    def _release_address(self, address):
+        """
+        A connection from address has gone away.
+        """
+        count = self.ip_counts.get(address, 0) - 1
+        if count > 0:
+            self.ip_counts[address] = count
+        elif address in self.ip_counts:
+            del self.ip_counts[address]
+
+    def _admit(self, sock, addr_tup, client_class, context):
+        """
+        Start a TLS handshake for the new connection, or turn it straight
+        into a client.
+        """
+        self._set_keepalive(sock)
+
+
+        ## TLS connections have to finish their handshake first; that
+        ## happens a step at a time in later polls.
+        if context:
+            sock.setblocking(0)
+            try:
+                tls_sock = context.wrap_socket(sock, server_side=True,
+                    do_handshake_on_connect=False)
+            except (socket.error, ssl.SSLError), err:
+                self.tls_failures += 1
+                self._release_address(addr_tup[0])
+                sock.close()
+                return None
+            pending = PendingHandshake(tls_sock, addr_tup, client_class)
+            self.handshakes[pending.fileno] = pending
+            self._continue_handshake(pending.fileno)
+            return None
+
+        return self._add_client(client_class(sock, addr_tup))
+
+    def _add_client(self, new_client):
+        """
+        Start tracking a connected client and call the connect handler.
+        """
+        #print "++ Opened connection to %s" % new_client.addrport()
+        ## Add the connection to our dictionary and call handler
+        self.clients[new_client.fileno] = new_client
+        self.on_connect(new_client)
+        return new_client
+
+    def _continue_handshake(self, fileno):
+        """
+        Take the next step of a TLS handshake; on success the connection
+        becomes a client like any other.
+        """
+        pending = self.handshakes[fileno]
+        try:
+            done = pending.step()
+        except (socket.error, ssl.SSLError), err:
+            self.tls_failures += 1
+            self._drop_handshake(pending)
+            return
+
+        if done:
+            del self.handshakes[fileno]
+            self.tls_handshakes += 1
+            self._add_client(pending.client_class(pending.sock,
+                pending.addr_tup))
+
+    def _expire_handshakes(self):
+        """
+        Hang up on clients that are taking too long to shake hands.
+        """
+        now = time.time()
+        for pending in self.handshakes.values():
+            if pending.expired(now):
+                self.tls_timeouts += 1
+                self._drop_handshake(pending)
+
+    def _drop_handshake(self, pending):
+        del self.handshakes[pending.fileno]
+        self._release_address(pending.addr_tup[0])
+        self._forget_fileno(pending.fileno)
+        pending.close()
+
+    def _forget_fileno(self, fileno):
+        """
+        Called when a connection that never became a client is closed.
+        """
+        pass
+
+    def _client_recv(self, sock_fileno):
+        """
+        Call the connection's recieve method.
+        """
+        try:
+            self.clients[sock_fileno].socket_recv()
+        except BogConnectionLost:
+            self.clients[sock_fileno].deactivate()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+#   miniboa/bucket.py
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain a
+#   copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#------------------------------------------------------------------------------
+
+"""
+A token bucket, for rate limits: up to burst events at once, then rate
+events a second.
+"""
+
+import time
+
+
+class TokenBucket(object):
+    """
+    Starts full.  take() spends a token if there is one.
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'last_time')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_time = time.time()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst,
+            self.tokens + (now - self.last_time) * self.rate)
+        self.last_time = now
+
+    def take(self, now=None):
+        """
+        Returns whether one more event is allowed now, and counts it if so.
+        """
+        if now is None:
+            now = time.time()
+        self._refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def is_full(self, now=None):
+        """
+        Returns whether the bucket has refilled completely, which makes it
+        no different from a new one.
+        """
+        if now is None:
+            now = time.time()
+        return self.tokens + (now - self.last_time) * self.rate >= self.burst
@@ -0,0 +1,723 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+#   miniboa/offload.py
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain a
+#   copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#------------------------------------------------------------------------------
+
+"""
+Network I/O in worker processes.  OffloadServer forks one or more workers,
+each running an ordinary TelnetServer (or ReactorServer) on the same
+listening sockets: they accept connections, do the telnet negotiation,
+echo and line editing, and read and write the sockets.  The parent sees
+only OffloadClients, which look like TelnetClients to the application but
+just trade whole lines of input and rendered output with the workers.
+
+Each worker is joined to the parent by two one-way Links, one each way:
+a ring buffer in shared memory for the messages, and a pipe to say "there
+is something in the ring".  One wake-up byte goes down the pipe per batch
+rather than per message.
+"""
+
+import errno
+import fcntl
+import marshal
+import mmap
+import os
+import select
+import struct
+import sys
+import time
+import traceback
+from collections import deque
+
+from miniboa.async import TelnetServer
+from miniboa.xterm import colorize
+from miniboa.xterm import word_wrap
+
+
+## Bytes of message space in each ring.
+RING_SIZE = 1 << 20
+
+## Output for one client is sent in frames of about this much text, so
+## that a single frame never comes near the size of the ring.
+MAX_FRAME_TEXT = 32768
+
+## How often workers report traffic and admission counters.
+STATS_INTERVAL = 5
+
+## Message types.  Worker to parent:
+MSG_CONNECT = 1     # (type, id, address, port, protocol, cols, rows, term)
+MSG_LINE    = 2     # (type, id, line)
+MSG_INFO    = 3     # (type, id, cols, rows, term)
+MSG_GONE    = 4     # (type, id)
+MSG_STATS   = 5     # (type, admission, tls, [(id, sent, received,
+                    #    compressed in, compressed out, compress time)])
+## Parent to worker:
+MSG_OUTPUT  = 6     # (type, id, [op, ...])
+
+## Output ops:
+OP_TEXT     = 't'   # ('t', text)              send(text)
+OP_PROMPT   = 'p'   # ('p', prompt, redraw)    set (and maybe draw) prompt
+OP_CALL     = 'c'   # ('c', method)            one of CALLS, no arguments
+OP_SET      = 's'   # ('s', attribute, value)  one of SETTABLE
+
+## What the parent may ask a worker's client to do, or change, by name.
+CALLS = ('request_will_sga', 'request_will_echo', 'request_wont_echo',
+    'request_naws', 'request_terminal_type', 'request_linemode',
+    'request_compression', 'password_mode_on', 'password_mode_off',
+    'send_keepalive', 'deactivate')
+SETTABLE = ('max_commands', 'flood_disconnect')
+
+
+#------------------------------------------------------------------------Ring
+
+class Ring(object):
+    """
+    Single-producer, single-consumer ring of messages in a shared anonymous
+    mmap, so it must be made before fork().  The first 16 bytes hold the
+    head (bytes ever written) and tail (bytes ever read); only the writer
+    moves the head, and only the reader moves the tail, each after it has
+    finished with the bytes in between.  Messages are a four-byte length
+    and the data, wrapping around the end of the buffer as needed.
+    """
+    HEADER = 16
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.map = mmap.mmap(-1, self.HEADER + size)
+
+    def _copy_in(self, position, data):
+        start = position % self.size
+        first = min(len(data), self.size - start)
+        base = self.HEADER
+        self.map[base + start:base + start + first] = data[:first]
+        if first < len(data):
+            self.map[base:base + len(data) - first] = data[first:]
+
+    def _copy_out(self, position, length):
+        start = position % self.size
+        first = min(length, self.size - start)
+        base = self.HEADER
+        data = self.map[base + start:base + start + first]
+        if first < length:
+            data += self.map[base:base + length - first]
+        return data
+
+    def put(self, data):
+        """
+        Append a message; returns False, writing nothing, if there isn't
+        room for it yet.
+        """
+        head, tail = struct.unpack_from('QQ', self.map, 0)
+        needed = len(data) + 4
+        if needed > self.size - (head - tail):
+            return False
+        self._copy_in(head, struct.pack('I', len(data)) + data)
+        struct.pack_into('Q', self.map, 0, head + needed)
+        return True
+
+    def get(self):
+        """
+        Returns every message waiting, oldest first.
+        """
+        head, tail = struct.unpack_from('QQ', self.map, 0)
+        messages = []
+        while tail < head:
+            length = struct.unpack('I', self._copy_out(tail, 4))[0]
+            messages.append(self._copy_out(tail + 4, length))
+            tail += 4 + length
+        struct.pack_into('Q', self.map, 8, tail)
+        return messages
+
+
+#------------------------------------------------------------------------Link
+
+class Link(object):
+    """
+    One direction of a worker's connection: a Ring and a wake-up pipe.
+    Messages are tuples of plain values, marshalled.  After fork(), each
+    side calls writer() or reader() to drop the pipe end it doesn't use.
+    """
+    def __init__(self):
+        self.ring = Ring()
+        self.wake_read, self.wake_write = os.pipe()
+        self.backlog = deque()      # Encoded messages the ring couldn't take
+
+    def writer(self):
+        os.close(self.wake_read)
+        self.wake_read = None
+        ## A full pipe just means the reader already has a wake-up coming.
+        _set_nonblocking(self.wake_write)
+
+    def reader(self):
+        os.close(self.wake_write)
+        self.wake_write = None
+        _set_nonblocking(self.wake_read)
+
+    def fileno(self):
+        return self.wake_read
+
+    def send(self, message):
+        """
+        Queue a message; it goes into the ring at the next flush().
+        """
+        self.backlog.append(marshal.dumps(message))
+
+    def flush(self):
+        """
+        Move what we can from the backlog into the ring, and wake the
+        reader if anything went in.  Whatever doesn't fit waits for the
+        reader to catch up.
+        """
+        wrote = False
+        while self.backlog and self.ring.put(self.backlog[0]):
+            self.backlog.popleft()
+            wrote = True
+        if wrote:
+            try:
+                os.write(self.wake_write, 'x')
+            except OSError, err:
+                ## EPIPE: the reader is gone, which it will find out itself.
+                if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK,
+                        errno.EPIPE):
+                    raise
+
+    def receive(self):
+        """
+        Returns the messages waiting, or None if the writer has gone away.
+        """
+        try:
+            if not os.read(self.wake_read, 4096):
+                return None
+        except OSError, err:
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                raise
+        return [marshal.loads(data) for data in self.ring.get()]
+
+
+def _set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+#--------------------------------------------------------------Offload Client
+
+class OffloadClient(object):
+
+    """
+    The parent's end of a client connected to a worker.  Same interface
+    as TelnetClient for the application; output is colourized here and
+    sent to the worker, in order, along with any telnet requests, once per
+    poll.
+    """
+
+    def __init__(self, worker, client_id, address, port, protocol, columns,
+            rows, terminal_type):
+        self.worker = worker
+        self.client_id = client_id
+        self.protocol = protocol
+        self.active = True
+        self.address = address
+        self.port = port
+        self.terminal_type = terminal_type
+        self.use_ansi = True
+        self.columns = columns
+        self.rows = rows
+        self.send_pending = False
+        self.ops = []
+        self.cmd_ready = False
+        self.command_list = deque()
+        self.connect_time = time.time()
+        self.last_input_time = time.time()
+        self.last_output_time = time.time()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.compress_bytes_in = 0
+        self.compress_bytes_out = 0
+        self.compress_time = 0.0
+        self._max_commands = None
+        self._flood_disconnect = False
+
+    #---[ Input ]--------------------------------------------------------------
+
+    def get_command(self):
+        """
+        Get a line of text that was received from the DE.  The worker has
+        already held it to the client's command rate.
+        """
+        if not self.command_list:
+            self.cmd_ready = False
+            return None
+        cmd = self.command_list.popleft()
+        if not self.command_list:
+            self.cmd_ready = False
+        return cmd
+
+    def _got_line(self, line):
+        self.command_list.append(line)
+        self.cmd_ready = True
+        self.last_input_time = time.time()
+
+    #---[ Output ]-------------------------------------------------------------
+
+    def _op(self, op):
+        self.ops.append(op)
+        self.send_pending = True
+
+    def send(self, text):
+        """
+        Send raw text to the distant end.
+        """
+        if text:
+            self._op((OP_TEXT, text))
+
+    def send_cc(self, text):
+        """
+        Send text with caret codes converted to ansi.
+        """
+        self.send(colorize(text, self.use_ansi))
+
+    def send_wrapped(self, text):
+        """
+        Send text padded and wrapped to the user's screen width.
+        """
+        lines = word_wrap(text, self.columns)
+        for line in lines:
+            self.send_cc(line + '\n')
+
+    def send_prompt(self, text):
+        """
+        Send prompt that redraws during line editing.
+        """
+        self._op((OP_PROMPT, text, True))
+
+    def send_prompt_cc(self, text):
+        self.send_prompt(colorize(text, self.use_ansi))
+
+    def set_prompt_cc(self, text):
+        """
+        Change the prompt without redrawing it; it goes out with whatever
+        is sent next.
+        """
+        self._op((OP_PROMPT, colorize(text, self.use_ansi), False))
+
+    def _call(self, method):
+        self._op((OP_CALL, method))
+
+    def request_will_sga(self):
+        self._call('request_will_sga')
+
+    def request_will_echo(self):
+        self._call('request_will_echo')
+
+    def request_wont_echo(self):
+        self._call('request_wont_echo')
+
+    def request_naws(self):
+        self._call('request_naws')
+
+    def request_terminal_type(self):
+        self._call('request_terminal_type')
+
+    def request_linemode(self):
+        self._call('request_linemode')
+
+    def request_compression(self):
+        self._call('request_compression')
+
+    def password_mode_on(self):
+        self._call('password_mode_on')
+
+    def password_mode_off(self):
+        self._call('password_mode_off')
+
+    def send_keepalive(self):
+        self._call('send_keepalive')
+
+    def deactivate(self):
+        """
+        Set the client to disconnect.  The output queued with it reaches
+        the worker, but the worker drops the connection at its next poll
+        without writing anything still unsent, as TelnetServer does.
+        """
+        self._call('deactivate')
+        self.active = False
+
+    def _get_max_commands(self):
+        return self._max_commands
+
+    def _set_max_commands(self, value):
+        self._max_commands = value
+        self._op((OP_SET, 'max_commands', value))
+
+    max_commands = property(_get_max_commands, _set_max_commands)
+
+    def _get_flood_disconnect(self):
+        return self._flood_disconnect
+
+    def _set_flood_disconnect(self, value):
+        self._flood_disconnect = value
+        self._op((OP_SET, 'flood_disconnect', value))
+
+    flood_disconnect = property(_get_flood_disconnect, _set_flood_disconnect)
+
+    def _take_frames(self):
+        """
+        Returns the queued ops as a list of frames of no more than about
+        MAX_FRAME_TEXT of text each, and clears the queue.
+        """
+        frames = []
+        frame = []
+        size = 0
+        for op in self.ops:
+            if op[0] == OP_TEXT:
+                text = op[1]
+                while len(text) > MAX_FRAME_TEXT - size:
+                    cut = MAX_FRAME_TEXT - size
+                    frame.append((OP_TEXT, text[:cut]))
+                    frames.append(frame)
+                    frame, size = [], 0
+                    text = text[cut:]
+                if text:
+                    frame.append((OP_TEXT, text))
+                    size += len(text)
+            else:
+                frame.append(op)
+        if frame:
+            frames.append(frame)
+        self.ops = []
+        self.send_pending = False
+        self.last_output_time = time.time()
+        return frames
+
+    #---[ Information ]--------------------------------------------------------
+
+    def addrport(self):
+        """
+        Return the DE's IP address and port number as a string.
+        """
+        return "%s:%s" % (self.address, self.port)
+
+    def idle(self):
+        """
+        Returns the number of seconds since the DE last sent us a line.
+        """
+        return time.time() - self.last_input_time
+
+    def quiet(self):
+        """
+        Returns the number of seconds since any traffic went either way.
+        """
+        return time.time() - max(self.last_input_time, self.last_output_time)
+
+    def duration(self):
+        """
+        Returns the number of seconds the DE has been connected.
+        """
+        return time.time() - self.connect_time
+
+    def compression_ratio(self):
+        """
+        Returns how many bytes of text each compressed byte carried, or
+        None if the worker hasn't compressed anything (or said so yet).
+        """
+        if not self.compress_bytes_out:
+            return None
+        return float(self.compress_bytes_in) / self.compress_bytes_out
+
+
+#----------------------------------------------------------------------Worker
+
+class _Worker(object):
+    """
+    The parent's record of one worker process.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.pid = None
+        self.to_worker = Link()
+        self.from_worker = Link()
+        self.alive = True
+        self.admission = {}
+        self.tls = {}
+
+
+def _worker_main(server, to_core, from_core):
+    """
+    Runs in the worker process: serve the sockets, pass lines up, apply
+    the output that comes down, until the parent goes away.
+    """
+    by_id = {}
+    state = {'next_id': 1, 'running': True, 'stats_time': time.time()}
+
+    def on_connect(client):
+        client_id = state['next_id']
+        state['next_id'] += 1
+        client.offload_id = client_id
+        client.offload_info = (client.columns, client.rows,
+            client.terminal_type)
+        by_id[client_id] = client
+        to_core.send((MSG_CONNECT, client_id, client.address, client.port,
+            client.protocol, client.columns, client.rows,
+            client.terminal_type))
+
+    def on_disconnect(client):
+        del by_id[client.offload_id]
+        to_core.send((MSG_GONE, client.offload_id))
+
+        # Close it now; a stray reference would otherwise keep the
+        # connection open until the object is collected.
+        client.sock.close()
+
+    def on_output():
+        messages = from_core.receive()
+        if messages is None:
+            state['running'] = False
+            return
+        for message in messages:
+            client = by_id.get(message[1])
+            if client and client.active:
+                _apply_ops(client, message[2])
+
+    server.on_connect = on_connect
+    server.on_disconnect = on_disconnect
+    server.watch(from_core.fileno(), on_output)
+
+    while state['running']:
+        server.poll()
+
+        _forward_input(server, to_core)
+
+        now = time.time()
+        if now - state['stats_time'] >= STATS_INTERVAL:
+            state['stats_time'] = now
+            to_core.send((MSG_STATS, server.admission_stats(),
+                server.tls_stats(), _client_stats(server)))
+
+        to_core.flush()
+
+
+def _forward_input(server, to_core):
+    # Kept out of _worker_main so no client stays referenced from its frame.
+    for client in server.clients.itervalues():
+        while client.cmd_ready:
+            line = client.get_command()
+            if line is None:
+                break
+            to_core.send((MSG_LINE, client.offload_id, line))
+        info = (client.columns, client.rows, client.terminal_type)
+        if info != client.offload_info:
+            client.offload_info = info
+            to_core.send((MSG_INFO, client.offload_id) + info)
+
+
+def _client_stats(server):
+    return [(client.offload_id, client.bytes_sent, client.bytes_received,
+        client.compress_bytes_in, client.compress_bytes_out,
+        client.compress_time) for client in server.clients.itervalues()]
+
+
+def _apply_ops(client, ops):
+    for op in ops:
+        kind = op[0]
+        if kind == OP_TEXT:
+            client.send(op[1])
+        elif kind == OP_PROMPT:
+            if op[2]:
+                client.send_prompt(op[1])
+            else:
+                client.prompt = op[1]
+        elif kind == OP_CALL and op[1] in CALLS:
+            getattr(client, op[1])()
+        elif kind == OP_SET and op[1] in SETTABLE:
+            setattr(client, op[1], op[2])
+
+
+#--------------------------------------------------------------Offload Server
+
+class OffloadServer(object):
+    """
+    Looks like a TelnetServer to the application, but the sockets live in
+    worker processes.  server_class (TelnetServer or ReactorServer) and
+    the keyword arguments are what each worker runs; the listening
+    sockets are opened here, before forking, and shared by the workers,
+    which take turns accepting.  Note that per-address admission limits
+    are therefore per worker.
+    """
+    def __init__(self, workers=2, server_class=TelnetServer,
+            on_connect=None, on_disconnect=None, timeout=0.005, **kwargs):
+
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.timeout = timeout
+
+        ## Key = (worker index, client id), value = OffloadClient
+        self.clients = {}
+
+        server = server_class(timeout=timeout, **kwargs)
+        self.port = server.port
+        self.tls_context = server.tls_context
+
+        self.workers = []
+        for index in xrange(workers):
+            worker = _Worker(index)
+            self.workers.append(worker)
+            worker.pid = os.fork()
+            if worker.pid == 0:
+                self._run_worker(server, worker)
+            worker.to_worker.writer()
+            worker.from_worker.reader()
+
+        ## The workers have the listeners now, and we don't need anything
+        ## else the server opened either.
+        server.close()
+        self.by_fileno = dict((worker.from_worker.fileno(), worker)
+            for worker in self.workers)
+
+    def _run_worker(self, server, worker):
+        """
+        In the child: drop the other workers' pipes, run, and exit without
+        running any of the parent's cleanup.
+        """
+        status = 0
+        try:
+            for other in self.workers[:-1]:
+                os.close(other.to_worker.wake_write)
+                os.close(other.from_worker.wake_read)
+            worker.to_worker.reader()
+            worker.from_worker.writer()
+            server.after_fork()
+            _worker_main(server, worker.from_worker, worker.to_worker)
+        except KeyboardInterrupt:
+            pass
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        os._exit(status)
+
+    def client_count(self):
+        """
+        Returns the number of active connections.
+        """
+        return len(self.clients)
+
+    def client_list(self):
+        """
+        Returns a list of connected clients.
+        """
+        return self.clients.values()
+
+    def admission_stats(self):
+        """
+        Returns the workers' admission counters, added up.  They report
+        every STATS_INTERVAL seconds.
+        """
+        return _sum_stats([worker.admission for worker in self.workers],
+            ('accepted', 'full', 'per_ip', 'rate', 'addresses'))
+
+    def tls_stats(self):
+        return _sum_stats([worker.tls for worker in self.workers],
+            ('handshakes', 'failures', 'timeouts', 'pending', 'resumed'))
+
+    def poll(self):
+        """
+        Send the output queued since the last poll, wait for the workers
+        for up to the timeout, and take in what they have for us.
+        """
+        for client in self.clients.values():
+            if client.send_pending:
+                link = client.worker.to_worker
+                for frame in client._take_frames():
+                    link.send((MSG_OUTPUT, client.client_id, frame))
+        for worker in self.workers:
+            if worker.alive:
+                worker.to_worker.flush()
+
+        self._remove_inactive()
+
+        try:
+            rlist, wlist, elist = select.select(self.by_fileno.keys(), [],
+                [], self.timeout)
+        except select.error, err:
+            if err[0] == errno.EINTR:
+                return
+            print >> sys.stderr, ("!! FATAL SELECT error '%d:%s'!" %
+                (err[0], err[1]))
+            sys.exit(1)
+
+        for fileno in rlist:
+            worker = self.by_fileno[fileno]
+            messages = worker.from_worker.receive()
+            if messages is None:
+                self._lost_worker(worker)
+            else:
+                for message in messages:
+                    self._dispatch(worker, message)
+
+    def _remove_inactive(self):
+        for key, client in self.clients.items():
+            if not client.active:
+                self.on_disconnect(client)
+                del self.clients[key]
+
+    def _dispatch(self, worker, message):
+        kind = message[0]
+        if kind == MSG_STATS:
+            worker.admission, worker.tls = message[1], message[2]
+            for (client_id, sent, received, compress_in, compress_out,
+                    compress_time) in message[3]:
+                client = self.clients.get((worker.index, client_id))
+                if client:
+                    client.bytes_sent = sent
+                    client.bytes_received = received
+                    client.compress_bytes_in = compress_in
+                    client.compress_bytes_out = compress_out
+                    client.compress_time = compress_time
+            return
+
+        key = (worker.index, message[1])
+        if kind == MSG_CONNECT:
+            client = OffloadClient(worker, *message[1:])
+            self.clients[key] = client
+            self.on_connect(client)
+            return
+
+        client = self.clients.get(key)
+        if not client:
+            return
+        if kind == MSG_LINE:
+            client._got_line(message[2])
+        elif kind == MSG_INFO:
+            client.columns, client.rows, client.terminal_type = message[2:]
+        elif kind == MSG_GONE:
+            client.active = False
+
+    def _lost_worker(self, worker):
+        """
+        A worker has died; so have its connections.
+        """
+        print >> sys.stderr, "!! I/O worker %d exited." % worker.index
+        worker.alive = False
+        del self.by_fileno[worker.from_worker.fileno()]
+        for client in self.clients.values():
+            if client.worker is worker:
+                client.active = False
+        try:
+            os.waitpid(worker.pid, os.WNOHANG)
+        except OSError:
+            pass
+
+
+def _sum_stats(reports, names):
+    totals = dict((name, 0) for name in names)
+    for report in reports:
+        for name in names:
+            totals[name] += report.get(name, 0)
+    return totals
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+#   miniboa/reactor.py
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain a
+#   copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#------------------------------------------------------------------------------
+
+"""
+An event-loop flavour of TelnetServer: the same clients and callbacks, but
+sockets are watched with epoll (or poll) instead of rebuilding select()
+lists every pass, timed work runs as scheduled callbacks, and blocking work
+can be handed to worker threads.
+"""
+
+import errno
+import heapq
+import os
+import select
+import sys
+import threading
+import time
+import traceback
+import Queue
+
+from miniboa.async import TelnetServer
+
+
+#---------------------------------------------------------------------Pollers
+
+if hasattr(select, 'epoll'):
+    READ = select.EPOLLIN | select.EPOLLPRI
+    WRITE = select.EPOLLOUT
+    ERROR = select.EPOLLERR | select.EPOLLHUP
+else:
+    READ = select.POLLIN | select.POLLPRI
+    WRITE = select.POLLOUT
+    ERROR = select.POLLERR | select.POLLHUP | select.POLLNVAL
+
+## Worker threads for run_in_executor().
+EXECUTOR_THREADS = 4
+
+
+def _make_poller():
+    """
+    Returns (poller, wait), where wait(timeout) takes seconds like epoll
+    does even when we're stuck with poll(), which wants milliseconds.
+    """
+    if hasattr(select, 'epoll'):
+        poller = select.epoll()
+        return poller, poller.poll
+    elif hasattr(select, 'poll'):
+        poller = select.poll()
+        return poller, lambda timeout: poller.poll(timeout * 1000)
+    raise RuntimeError("No epoll() or poll() on this platform; "
+        "use TelnetServer instead.")
+
+
+#-----------------------------------------------------------------Timer Handle
+
+class Timer(object):
+    """
+    A scheduled callback.  Call cancel() to stop it from running (again).
+    """
+    def __init__(self, when, interval, callback, args):
+        self.when = when
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __cmp__(self, other):
+        return cmp(self.when, other.when)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+#---------------------------------------------------------------Reactor Server
+
+class ReactorServer(TelnetServer):
+    """
+    TelnetServer driven by a readiness poller and a timer queue.  poll()
+    waits for socket events or the next timer (whichever is first, but no
+    longer than the timeout), handles them, and returns, so callers can
+    keep the same loop they use with TelnetServer.
+    """
+    def __init__(self, *args, **kwargs):
+        TelnetServer.__init__(self, *args, **kwargs)
+
+        self.poller, self._wait = _make_poller()
+        for fileno in self.listeners:
+            self.poller.register(fileno, READ)
+
+        ## fileno -> event mask we last registered for each client
+        self.registered = {}
+
+        ## Heap of pending Timers
+        self.timers = []
+
+        ## Executor state; the threads start on first use.  Finished jobs
+        ## queue their callbacks here and poke the wake pipe so poll()
+        ## returns promptly to run them.
+        self.jobs = Queue.Queue()
+        self.results = Queue.Queue()
+        self.workers = []
+        self.wake_read, self.wake_write = os.pipe()
+        self.poller.register(self.wake_read, READ)
+
+    #---[ Scheduling ]---------------------------------------------------------
+
+    def call_later(self, delay, callback, *args):
+        """
+        Run callback(*args) once, delay seconds from now.
+        """
+        timer = Timer(time.time() + delay, None, callback, args)
+        heapq.heappush(self.timers, timer)
+        return timer
+
+    def call_every(self, interval, callback, *args):
+        """
+        Run callback(*args) every interval seconds, starting interval
+        seconds from now.
+        """
+        timer = Timer(time.time() + interval, interval, callback, args)
+        heapq.heappush(self.timers, timer)
+        return timer
+
+    def _run_timers(self):
+        """
+        Run every timer that has come due.
+        """
+        now = time.time()
+        while self.timers and self.timers[0].when <= now:
+            timer = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+
+            ## Reschedule repeating timers before running them, so a
+            ## callback can cancel its own timer.  If we've fallen badly
+            ## behind, skip the missed runs rather than firing them all.
+            if timer.interval:
+                timer.when += timer.interval
+                if timer.when <= now:
+                    timer.when = now + timer.interval
+                heapq.heappush(self.timers, timer)
+
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                print >> sys.stderr, ("!! Timer callback failed:\n%s" %
+                    traceback.format_exc())
+
+    def _next_timeout(self):
+        """
+        How long poll() may wait: the timeout, or less if a timer is due.
+        """
+        while self.timers and self.timers[0].cancelled:
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return self.timeout
+        return max(0, min(self.timeout, self.timers[0].when - time.time()))
+
+    #---[ Executor ]-----------------------------------------------------------
+
+    def run_in_executor(self, func, args=(), callback=None):
+        """
+        Run func(*args) on a worker thread.  When it finishes, callback
+        (if given) is called from poll() with (result, error), where error
+        is the exception raised, if any.  func must not touch clients or
+        anything else the poll loop owns.
+        """
+        if not self.workers:
+            for i in range(EXECUTOR_THREADS):
+                worker = threading.Thread(target=self._worker)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+        self.jobs.put((func, args, callback))
+
+    def _worker(self):
+        while True:
+            func, args, callback = self.jobs.get()
+            result, error = None, None
+            try:
+                result = func(*args)
+            except Exception, err:
+                error = err
+            if callback:
+                self.results.put((callback, result, error))
+                try:
+                    os.write(self.wake_write, 'x')
+                except OSError:
+                    pass
+
+    def _run_results(self):
+        """
+        Drain the wake pipe and run the callbacks of finished jobs.
+        """
+        try:
+            os.read(self.wake_read, 4096)
+        except OSError:
+            pass
+        while True:
+            try:
+                callback, result, error = self.results.get_nowait()
+            except Queue.Empty:
+                break
+            try:
+                callback(result, error)
+            except Exception:
+                print >> sys.stderr, ("!! Executor callback failed:\n%s" %
+                    traceback.format_exc())
+
+    #---[ Polling ]------------------------------------------------------------
+
+    def _remove_inactive(self):
+        for client in self.clients.values():
+            if not client.active and client.fileno in self.registered:
+                try:
+                    self.poller.unregister(client.fileno)
+                except (IOError, OSError, KeyError):
+                    pass
+                del self.registered[client.fileno]
+        TelnetServer._remove_inactive(self)
+
+    def close(self):
+        TelnetServer.close(self)
+        if hasattr(self.poller, 'close'):
+            self.poller.close()
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+
+    def after_fork(self):
+        """
+        An epoll set is shared across fork(), so the child needs its own.
+        """
+        if hasattr(self.poller, 'close'):
+            self.poller.close()
+        self.poller, self._wait = _make_poller()
+        self.registered = {}
+        for fileno in self.listeners.keys() + self.watched.keys():
+            self.poller.register(fileno, READ)
+        self.poller.register(self.wake_read, READ)
+
+    def watch(self, fileno, callback):
+        TelnetServer.watch(self, fileno, callback)
+        self.poller.register(fileno, READ)
+
+    def _forget_fileno(self, fileno):
+        if fileno in self.registered:
+            try:
+                self.poller.unregister(fileno)
+            except (IOError, OSError, KeyError):
+                pass
+            del self.registered[fileno]
+
+    def _update_interest(self):
+        """
+        Register new clients and switch write interest on or off as their
+        send_pending changes.  Only changes cost a system call.  TLS
+        handshakes wait on one direction or the other, as asked.
+        """
+        if self.handshakes:
+            self._expire_handshakes()
+        wanted = []
+        for fileno, client in self.clients.iteritems():
+            if client.send_pending:
+                wanted.append((fileno, READ | WRITE))
+            else:
+                wanted.append((fileno, READ))
+        for fileno, pending in self.handshakes.iteritems():
+            if pending.want_write:
+                wanted.append((fileno, WRITE))
+            else:
+                wanted.append((fileno, READ))
+
+        for fileno, mask in wanted:
+            current = self.registered.get(fileno)
+            if current == mask:
+                continue
+            if current is None:
+                self.poller.register(fileno, mask)
+            else:
+                self.poller.modify(fileno, mask)
+            self.registered[fileno] = mask
+
+    def poll(self):
+        """
+        Wait for socket events or the next timer, then handle both.
+        """
+        self._remove_inactive()
+        self._update_interest()
+
+        try:
+            events = self._wait(self._next_timeout())
+        except (IOError, OSError, select.error), err:
+            if err.args and err.args[0] == errno.EINTR:
+                events = []
+            else:
+                print >> sys.stderr, ("!! FATAL POLL error '%s'!" % (err,))
+                sys.exit(1)
+
+        for fileno, event in events:
+            if fileno in self.listeners:
+                self._accept_connection(fileno)
+
+            elif fileno == self.wake_read:
+                self._run_results()
+
+            elif fileno in self.handshakes:
+                self._continue_handshake(fileno)
+
+            elif fileno in self.watched:
+                self.watched[fileno]()
+
+            elif fileno in self.clients:
+                client = self.clients[fileno]
+                if event & (READ | ERROR):
+                    self._client_recv(fileno)
+                if event & WRITE and client.active:
+                    client.socket_send()
+
+        self._run_timers()
@@ -22,7 +22,10 @@ Manage one Telnet client connected via a TCP/IP socket.
 
 import socket
 import time
+import zlib
+from collections import deque
 
+from miniboa.bucket import TokenBucket
 from miniboa.error import BogConnectionLost
 from miniboa.xterm import colorize
 from miniboa.xterm import word_wrap
@@ -98,6 +101,45 @@ SGA     = chr(  3)      # Suppress Go-Ahead
 TTYPE   = chr( 24)      # Terminal Type
 NAWS    = chr( 31)      # Negotiate About Window Size
 LINEMO  = chr( 34)      # Line Mode
+MCCP2   = chr( 86)      # Mud Client Compression Protocol, version 2
+
+#--[ Line Mode Sub-options ]---------------------------------------------------
+# (See RFC 1184)
+
+LM_MODE         = chr(1)    # IAC SB LINEMO LM_MODE <mask> IAC SE
+LM_FORWARDMASK  = chr(2)    # Preceded by DO/DONT/WILL/WONT
+LM_SLC          = chr(3)    # Set Local Characters
+
+MODE_EDIT       = 1         # DE edits lines locally and sends them whole
+MODE_TRAPSIG    = 2         # DE turns ^C and friends into IP and so on
+MODE_ACK        = 4         # DE agrees with the mode we sent
+
+## Longest sub-negotiation we'll buffer.  SLC lists from line mode clients
+## run to sixty-odd bytes before any IAC escaping, so leave some room.
+MAX_SB_LENGTH = 256
+
+#--[ Compression ]-------------------------------------------------------------
+
+## Settings for the per-client MCCP zlib stream.  Each compressor costs
+## roughly (1 << (WBITS + 2)) + (1 << (MEMLEVEL + 9)) bytes, so the
+## defaults (15 and 8) would be over a quarter of a megabyte per player;
+## a 4K window still covers a full board redraw, which is where the
+## repetition is.
+MCCP_LEVEL = 6
+MCCP_WBITS = 12
+MCCP_MEMLEVEL = 5
+
+#--[ Input Flood Control ]-----------------------------------------------------
+
+## Lines waiting to be read are capped at MAX_COMMAND_QUEUE; past that they
+## are dropped (or, with flood_disconnect set, the client is cut off).
+## get_command() hands them out no faster than COMMAND_RATE a second after
+## an initial burst of COMMAND_BURST, so a paste or a runaway bot is paced
+## rather than run all at once.
+MAX_COMMAND_QUEUE = 64
+COMMAND_RATE = 4.0
+COMMAND_BURST = 10
+FLOOD_NOTICE = "\n[Input discarded; you are typing faster than we can read.]\n"
 
 
 #-----------------------------------------------------------------Telnet Option
@@ -136,13 +178,24 @@ class TelnetClient(object):
         self.rows = 24
         self.send_pending = False
         self.send_buffer = ''
+        self.wire_buffer = ''       # Bytes ready for the socket as-is
+        self.compressor = None      # zlib stream once MCCP is running
+        self.compress_bytes_in = 0  # Text fed to the compressor
+        self.compress_bytes_out = 0 # Compressed bytes it produced
+        self.compress_time = 0.0    # CPU seconds spent compressing
         self.recv_buffer = ''
         self.bytes_sent = 0
         self.bytes_received = 0
         self.cmd_ready = False
-        self.command_list = []
+        self.command_list = deque()
+        self.max_commands = MAX_COMMAND_QUEUE
+        self.command_bucket = TokenBucket(COMMAND_RATE, COMMAND_BURST)
+        self.flood_disconnect = False   # Hang up on overflow, not drop?
+        self.flood_warned = False       # Told them about dropped input?
+        self.commands_dropped = 0
         self.connect_time = time.time()
         self.last_input_time = time.time()
+        self.last_output_time = time.time()
         self.prompt = ''
 
         ## State variables for interpreting incoming telnet commands
@@ -152,7 +205,9 @@ class TelnetClient(object):
         self.telnet_opt_dict = {}   # Mapping for up to 256 TelnetOptions
         self.telnet_echo = False    # Echo input back to the client?
         self.telnet_echo_password = False  # Echo back '*' for passwords?
+        self.telnet_linemode = False # Is the DE editing lines locally?
         self.telnet_sb_buffer = ''  # Buffer for sub-negotiations
+        self.telnet_sb_overflow = False # Did the sub-negotiation run long?
         self.telnet_got_cr = False  # Ignore LF/NUL if last char was CR
         self.ansi_got_esc = False   # Did ESC begin an ANSI/VT100+ code?
         self.ansi_buffer = ''       # Buffer for keyboard escape codes
@@ -160,17 +215,40 @@ class TelnetClient(object):
     def get_command(self):
         """
         Get a line of text that was received from the DE. The class's
-        cmd_ready attribute will be true if lines are available.
+        cmd_ready attribute will be true if lines are available.  Returns
+        None if there are none, or if the client is being held to its
+        command rate; cmd_ready stays true in that case.
         """
-        cmd = None
-        count = len(self.command_list)
-        if count > 0:
-            cmd = self.command_list.pop(0)
+        if not self.command_list:
+            self.cmd_ready = False
+            return None
+
+        ## Hold the line back if they're over their command rate.
+        if not self.command_bucket.take():
+            return None
+
+        cmd = self.command_list.popleft()
         ## If that was the last line, turn off lines_pending
-        if count == 1:
+        if not self.command_list:
             self.cmd_ready = False
+            self.flood_warned = False
         return cmd
 
+    def _queue_command(self, cmd):
+        """
+        Queue a received line for get_command(), unless the queue is full.
+        """
+        if len(self.command_list) >= self.max_commands:
+            if self.flood_disconnect:
+                raise BogConnectionLost()
+            self.commands_dropped += 1
+            if not self.flood_warned:
+                self.send(FLOOD_NOTICE)
+                self.flood_warned = True
+            return
+        self.command_list.append(cmd)
+        self.cmd_ready = True
+
     def _send(self, text):
         """
         Send raw text to the distant end.
@@ -183,15 +261,20 @@ class TelnetClient(object):
         """
         Send raw text to the distant end. Redraw prompt if in char mode.
         """
-        ## Erase current line with prompt and input if in char mode
-        if self.prompt and self.telnet_echo:
+        ## Erase current line with prompt and input if in char mode.  In
+        ## line mode the DE holds the input, so we can only clear the line
+        ## and put the prompt back; the DE keeps whatever was typed.
+        redraw = self.prompt and (self.telnet_echo or self.telnet_linemode)
+        if redraw:
             self.send_buffer += colorize('^l\r')
 
         self._send(text)
 
         ## Draw a new prompt and redraw pending input in char mode
-        if self.prompt and self.telnet_echo:
-            self.send_buffer += self.prompt + self.recv_buffer
+        if redraw:
+            self.send_buffer += self.prompt
+            if self.telnet_echo:
+                self.send_buffer += self.recv_buffer
 
     def send_cc(self, text):
         """
@@ -214,6 +297,13 @@ class TelnetClient(object):
         text = colorize(text, self.use_ansi)
         self.send_prompt(text)
 
+    def set_prompt_cc(self, text):
+        """
+        Change the prompt without redrawing it; it goes out with whatever
+        is sent next.
+        """
+        self.prompt = colorize(text, self.use_ansi)
+
     def send_wrapped(self, text):
         """
         Send text padded and wrapped to the user's screen width.
@@ -241,6 +331,12 @@ class TelnetClient(object):
         """
         return time.time() - self.last_input_time
 
+    def quiet(self):
+        """
+        Returns the number of seconds since any traffic went either way.
+        """
+        return time.time() - max(self.last_input_time, self.last_output_time)
+
     def duration(self):
         """
         Returns the number of seconds the DE has been connected.
@@ -292,6 +388,13 @@ class TelnetClient(object):
         self._iac_do(NAWS)
         self._note_reply_pending(NAWS, True)
 
+    def send_keepalive(self):
+        """
+        Send an IAC NOP.  The DE ignores it, but it makes the connection
+        carry something, so a dead one gets noticed.
+        """
+        self._send('%c%c' % (IAC, NOP))
+
     def request_terminal_type(self):
         """
         Begins the Telnet negotiations to request the terminal type from
@@ -300,34 +403,151 @@ class TelnetClient(object):
         self._iac_do(TTYPE)
         self._note_reply_pending(TTYPE, True)
 
+    def request_linemode(self):
+        """
+        Ask the DE to edit lines locally and send them whole.  See RFC
+        1184.  If it refuses (or never answers) we stay in char mode.
+        """
+        self._iac_do(LINEMO)
+        self._note_reply_pending(LINEMO, True)
+
+    def _send_linemode_mode(self):
+        """
+        Tell the DE which line mode we want: local editing, with signals
+        trapped into telnet commands.
+        """
+        self._send('%c%c%c%c%c%c%c' % (IAC, SB, LINEMO, LM_MODE,
+            chr(MODE_EDIT | MODE_TRAPSIG), IAC, SE))
+
+    def _linemode_on(self):
+        """
+        The DE has agreed to edit lines.  Stop echoing; it does that now.
+        """
+        if not self.telnet_linemode:
+            self.telnet_linemode = True
+            if self.telnet_echo:
+                self.request_wont_echo()
+
+    def _linemode_off(self):
+        """
+        Back to char mode: we echo and edit again.
+        """
+        if self.telnet_linemode:
+            self.telnet_linemode = False
+            self.request_will_echo()
+
+    def request_compression(self):
+        """
+        Offer to compress everything we send.  See the MCCP v2 spec.
+        """
+        self._iac_will(MCCP2)
+        self._note_reply_pending(MCCP2, True)
+
+    def compression_ratio(self):
+        """
+        Returns how many bytes of text each compressed byte carried, or
+        None if we haven't compressed anything.
+        """
+        if not self.compress_bytes_out:
+            return None
+        return float(self.compress_bytes_in) / self.compress_bytes_out
+
+    def _start_compression(self):
+        """
+        Tell the DE the compressed stream starts now, and start it.
+        """
+        if self.compressor:
+            return
+        self._send('%c%c%c%c%c' % (IAC, SB, MCCP2, IAC, SE))
+        ## Everything up to and including the marker goes out as-is.
+        self.wire_buffer += self.send_buffer
+        self.send_buffer = ''
+        self.compressor = zlib.compressobj(MCCP_LEVEL, zlib.DEFLATED,
+            MCCP_WBITS, MCCP_MEMLEVEL)
+
+    def _stop_compression(self):
+        """
+        End the compressed stream; the DE goes back to reading raw bytes.
+        """
+        if not self.compressor:
+            return
+        self._compress_pending()
+        start = time.clock()
+        end = self.compressor.flush(zlib.Z_FINISH)
+        self.compress_time += time.clock() - start
+        self.compress_bytes_out += len(end)
+        self.wire_buffer += end
+        self.compressor = None
+        self.send_pending = True
+
+    def _compress_pending(self):
+        """
+        Run whatever text is waiting through the compressor, flushing so
+        the DE can display all of it.  Done once per poll cycle, so a
+        burst of sends costs one flush rather than one each.
+        """
+        if self.send_buffer:
+            start = time.clock()
+            data = (self.compressor.compress(self.send_buffer) +
+                self.compressor.flush(zlib.Z_SYNC_FLUSH))
+            self.compress_time += time.clock() - start
+            self.compress_bytes_in += len(self.send_buffer)
+            self.compress_bytes_out += len(data)
+            self.wire_buffer += data
+            self.send_buffer = ''
+
     def socket_send(self):
         """
         Called by TelnetServer when send data is ready.
         """
-        if len(self.send_buffer):
+        if self.compressor:
+            self._compress_pending()
+        elif self.send_buffer:
+            self.wire_buffer += self.send_buffer
+            self.send_buffer = ''
+
+        if len(self.wire_buffer):
             try:
-                sent = self.sock.send(self.send_buffer)
+                sent = self._sock_send(self.wire_buffer)
             except socket.error, err:
                 print("!! SEND error '%d:%s' from %s" % (err[0], err[1],
                     self.addrport()))
                 self.active = False
                 return
             self.bytes_sent += sent
-            self.send_buffer = self.send_buffer[sent:]
+            self.wire_buffer = self.wire_buffer[sent:]
+            if sent:
+                self.last_output_time = time.time()
         else:
             self.send_pending = False
 
+    def _sock_send(self, data):
+        """
+        Write what the socket will take; returns how much that was.
+        """
+        return self.sock.send(data)
+
+    def _sock_recv(self):
+        """
+        Read what's waiting on the socket; '' means the client hung up, and
+        None that there turned out to be nothing to read after all.
+        """
+        return self.sock.recv(2048)
+
     def socket_recv(self):
         """
         Called by TelnetServer when recv data is ready.
         """
         try:
-            data = self.sock.recv(2048)
+            data = self._sock_recv()
         except socket.error, ex:
             print ("?? socket.recv() error '%d:%s' from %s" %
                 (ex[0], ex[1], self.addrport()))
             raise BogConnectionLost()
 
+        if data is None:
+            return
+
         ## Did they close the connection?
         size = len(data)
         if size == 0:
@@ -347,8 +567,7 @@ class TelnetClient(object):
             if mark == -1:
                 break
             cmd = self.recv_buffer[:mark].strip()
-            self.command_list.append(cmd)
-            self.cmd_ready = True
+            self._queue_command(cmd)
             self.recv_buffer = self.recv_buffer[mark+1:]
             self.prompt = ''
 
@@ -451,12 +670,12 @@ class TelnetClient(object):
 
             ## Are we currenty in a sub-negotion?
             elif self.telnet_got_sb is True:
-                ## Sanity check on length
-                if len(self.telnet_sb_buffer) < 64:
+                ## Sanity check on length; past it, throw the rest of the
+                ## sub-negotiation away rather than treating it as input.
+                if len(self.telnet_sb_buffer) < MAX_SB_LENGTH:
                     self.telnet_sb_buffer += byte
                 else:
-                    self.telnet_got_sb = False
-                    self.telnet_sb_buffer = ""
+                    self.telnet_sb_overflow = True
                 return
 
             ## Just a normal NVT character
@@ -522,11 +741,16 @@ class TelnetClient(object):
             ## Begin capturing a sub-negotiation string
             self.telnet_got_sb = True
             self.telnet_sb_buffer = ''
+            self.telnet_sb_overflow = False
 
         elif cmd == SE:
             ## Stop capturing a sub-negotiation string
             self.telnet_got_sb = False
-            self._sb_decoder()
+            if self.telnet_sb_overflow:
+                self.telnet_sb_buffer = ''
+                self.telnet_sb_overflow = False
+            else:
+                self._sb_decoder()
 
         elif cmd == NOP:
             pass
@@ -607,6 +831,18 @@ class TelnetClient(object):
                     self._iac_will(SGA)
                     ## Just nod
 
+            elif option == MCCP2:
+
+                ## Only ever start compressing in answer to our own offer.
+                if self._check_reply_pending(MCCP2):
+                    self._note_reply_pending(MCCP2, False)
+                    self._note_local_option(MCCP2, True)
+                    self._start_compression()
+
+                elif self._check_local_option(MCCP2) is UNKNOWN:
+                    self._note_local_option(MCCP2, False)
+                    self._iac_wont(MCCP2)
+
             else:
 
                 ## ALL OTHER OTHERS = Default to refusing once
@@ -656,6 +892,13 @@ class TelnetClient(object):
                     self._iac_will(SGA)
                     ## Just nod
 
+            elif option == MCCP2:
+
+                ## Either a refusal or the DE asking us to stop.
+                self._note_reply_pending(MCCP2, False)
+                self._note_local_option(MCCP2, False)
+                self._stop_compression()
+
             else:
 
                 ## ALL OTHER OPTIONS = Default to ignoring
@@ -701,6 +944,19 @@ class TelnetClient(object):
                     self._iac_do(SGA)
                     ## Just nod
 
+            elif option == LINEMO:
+
+                if self._check_reply_pending(LINEMO):
+                    self._note_reply_pending(LINEMO, False)
+                    self._note_remote_option(LINEMO, True)
+                    self._send_linemode_mode()
+
+                elif (self._check_remote_option(LINEMO) is False or
+                        self._check_remote_option(LINEMO) is UNKNOWN):
+                    self._note_remote_option(LINEMO, True)
+                    self._iac_do(LINEMO)
+                    self._send_linemode_mode()
+
             elif option == TTYPE:
 
                 if self._check_reply_pending(TTYPE):
@@ -719,7 +975,15 @@ class TelnetClient(object):
 
         elif cmd == WONT:
 
-            if option == ECHO:
+            if option == LINEMO:
+
+                ## Either a refusal or the DE giving up on line mode; both
+                ## leave us in (or put us back in) char mode.
+                self._note_reply_pending(LINEMO, False)
+                self._note_remote_option(LINEMO, False)
+                self._linemode_off()
+
+            elif option == ECHO:
 
                 ## DE states it wont echo us -- good, they're not suppose to.
                 if self._check_remote_option(ECHO) is UNKNOWN:
@@ -773,8 +1037,33 @@ class TelnetClient(object):
 
                 #print "Screen is %d x %d" % (self.columns, self.rows)
 
+            if bloc[0] == LINEMO:
+                self._linemode_decoder(bloc[1:])
+
         self.telnet_sb_buffer = ''
 
+    def _linemode_decoder(self, bloc):
+        """
+        Handles the body of a LINEMODE sub-negotiation.
+        """
+        if bloc[0] == LM_MODE:
+            mask = ord(bloc[1])
+            ## Only an acknowledgement counts, and only with local editing;
+            ## anything else is the DE proposing a mode we don't want.
+            if mask & MODE_ACK:
+                if mask & MODE_EDIT:
+                    self._linemode_on()
+                else:
+                    self._linemode_off()
+
+        elif bloc[0] == DO and bloc[1] == LM_FORWARDMASK:
+            ## We have no use for forwarding on special characters.
+            self._send('%c%c%c%c%c%c%c' % (IAC, SB, LINEMO, WONT,
+                LM_FORWARDMASK, IAC, SE))
+
+        ## SLC lists are fine as the DE has them, and anything else (WILL
+        ## FORWARDMASK and so on) needs no answer from us.
+
 
     #---[ State Juggling for Telnet Options ]----------------------------------
 
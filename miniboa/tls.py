@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+#   miniboa/tls.py
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain a
+#   copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#------------------------------------------------------------------------------
+
+"""
+Telnet over TLS.  Handshakes are done a step at a time from the server's
+poll loop (see PendingHandshake), so a slow or hostile client can never
+block it; once one finishes, the connection becomes a TLSTelnetClient,
+which is a TelnetClient that knows non-blocking TLS sockets sometimes have
+nothing to say.
+"""
+
+import ssl
+import time
+
+from miniboa.telnet import TelnetClient
+
+
+## Seconds a client gets to finish its handshake before we hang up.
+TLS_HANDSHAKE_TIMEOUT = 10
+
+
+def make_server_context(certfile, keyfile=None):
+    """
+    Returns an SSLContext for the listening side.  Session tickets are
+    left on (OpenSSL's default for servers, but make sure), so returning
+    clients can resume without a full handshake.
+    """
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(certfile, keyfile)
+    if hasattr(ssl, 'OP_NO_TICKET'):
+        context.options &= ~ssl.OP_NO_TICKET
+    return context
+
+
+#-----------------------------------------------------------Pending Handshake
+
+class PendingHandshake(object):
+    """
+    A freshly accepted TLS connection that hasn't finished its handshake.
+    """
+    def __init__(self, sock, addr_tup, client_class):
+        self.sock = sock
+        self.addr_tup = addr_tup
+        self.client_class = client_class
+        self.fileno = sock.fileno()
+        self.deadline = time.time() + TLS_HANDSHAKE_TIMEOUT
+        self.want_write = False
+
+    def step(self):
+        """
+        Push the handshake along.  Returns True when it's done, False if
+        we're waiting on the client (want_write says which way), and
+        raises ssl.SSLError or socket.error if it failed.
+        """
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self.want_write = False
+            return False
+        except ssl.SSLWantWriteError:
+            self.want_write = True
+            return False
+        return True
+
+    def expired(self, now):
+        return now >= self.deadline
+
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+#----------------------------------------------------------------TLS Client
+
+class TLSTelnetClient(TelnetClient):
+
+    """
+    A TelnetClient on a non-blocking TLS socket.
+    """
+
+    def __init__(self, sock, addr_tup):
+        TelnetClient.__init__(self, sock, addr_tup)
+        self.protocol = 'telnet+tls'
+
+    def _sock_send(self, data):
+        """
+        A TLS write can stall on either direction; try again next pass.
+        """
+        try:
+            return self.sock.send(data)
+        except (ssl.SSLWantWriteError, ssl.SSLWantReadError):
+            self.send_pending = True
+            return 0
+
+    def _sock_recv(self):
+        """
+        Readable doesn't always mean a whole record is in, and a whole
+        record can decrypt to more than we asked for; OpenSSL holds on to
+        the rest where select() can't see it, so take all of it now.
+        """
+        try:
+            data = self.sock.recv(2048)
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return None
+        try:
+            while data and self.sock.pending():
+                data += self.sock.recv(self.sock.pending())
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            pass
+        return data
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+#------------------------------------------------------------------------------
+#   miniboa/websocket.py
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain a
+#   copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#------------------------------------------------------------------------------
+
+"""
+Manage one browser client connected via a WebSocket (RFC 6455).  It looks
+just like a TelnetClient to the server and the application: text goes out
+through send() and friends, and whole lines come back via get_command().
+"""
+
+import base64
+import hashlib
+import socket
+import struct
+import time
+import urlparse
+
+from miniboa.error import BogConnectionLost
+from miniboa.telnet import TelnetClient
+
+
+#---[ WebSocket Notes ]--------------------------------------------------------
+#
+# The browser opens with an HTTP GET carrying "Upgrade: websocket" and a
+# Sec-WebSocket-Key; we answer 101 with that key hashed against a fixed
+# GUID.  After that, both ends exchange frames:
+#
+#    byte 0:   FIN bit, opcode (1 text, 2 binary, 0 continuation, 8 close,
+#              9 ping, 10 pong)
+#    byte 1:   MASK bit, 7-bit length (126 = 16-bit length follows, 127 =
+#              64-bit length follows)
+#    then:     4-byte mask key (client frames always have one), payload
+#
+# Each text or binary message from the browser is taken as one or more
+# lines of input.  Output is sent as text frames when it is valid UTF-8
+# (it nearly always is; it's ASCII plus ANSI codes) and binary otherwise.
+#
+# Browsers can pass their screen size and terminal type on the URL, as in
+# ws://host:port/?cols=100&rows=40&term=xterm.
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC11B85'
+
+OP_CONTINUATION = 0x0
+OP_TEXT         = 0x1
+OP_BINARY       = 0x2
+OP_CLOSE        = 0x8
+OP_PING         = 0x9
+OP_PONG         = 0xA
+
+CLOSE_NORMAL        = 1000
+CLOSE_PROTOCOL      = 1002
+CLOSE_TOO_BIG       = 1009
+
+## Caps on what we'll buffer from a browser.
+MAX_HANDSHAKE_LENGTH = 8192
+MAX_MESSAGE_LENGTH = 65536
+
+
+def accept_key(key):
+    """
+    Returns the Sec-WebSocket-Accept value for a Sec-WebSocket-Key.
+    """
+    return base64.b64encode(hashlib.sha1(key + WS_GUID).digest())
+
+def encode_frame(opcode, payload):
+    """
+    Returns a single unmasked (server) frame.
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+def unmask(mask, payload):
+    """
+    XOR the payload with the four-byte mask key.
+    """
+    data = bytearray(payload)
+    mask = bytearray(mask)
+    for i in xrange(len(data)):
+        data[i] ^= mask[i & 3]
+    return str(data)
+
+
+#---------------------------------------------------------------WebSocket Client
+
+class WebSocketClient(TelnetClient):
+
+    """
+    Represents a browser connection via WebSocket.  Same interface as
+    TelnetClient; the telnet option requests are accepted and ignored.
+    """
+
+    def __init__(self, sock, addr_tup):
+        TelnetClient.__init__(self, sock, addr_tup)
+        self.protocol = 'websocket'
+        self.handshake_done = False
+        self.handshake_buffer = ''
+        self.frame_buffer = ''
+        self.message_buffer = ''    # Fragments of an unfinished message
+        self.message_opcode = None
+        self.closing = False
+
+    #---[ Telnet Negotiation ]-------------------------------------------------
+
+    ## Browsers do their own echoing and line editing, and don't speak
+    ## telnet, so there is nothing to negotiate.
+
+    def request_will_sga(self):
+        pass
+
+    def request_will_echo(self):
+        pass
+
+    def request_wont_echo(self):
+        pass
+
+    def password_mode_on(self):
+        pass
+
+    def password_mode_off(self):
+        pass
+
+    def request_naws(self):
+        pass
+
+    def request_terminal_type(self):
+        pass
+
+    def request_linemode(self):
+        pass
+
+    def request_compression(self):
+        pass
+
+    #---[ Sending ]------------------------------------------------------------
+
+    def send_keepalive(self):
+        """
+        Browsers answer pings on their own, so that's our probe.
+        """
+        if self.handshake_done and not self.closing:
+            self._send_control(OP_PING)
+
+    def send_prompt(self, text):
+        """
+        Browsers keep their own input line, so there's nothing to redraw
+        around; the prompt just goes out after whatever came before it.
+        """
+        self.prompt = text
+        self._send(text)
+
+    def socket_send(self):
+        """
+        Called by TelnetServer when send data is ready.  Anything queued
+        since the last pass goes out as a single frame.
+        """
+        if not self.handshake_done:
+            ## Hold everything until the browser has upgraded.  A refused
+            ## upgrade hangs up once the 400 has gone out.
+            if not self.wire_buffer:
+                self.send_pending = False
+                if self.closing:
+                    self.active = False
+                return
+
+        elif self.send_buffer:
+            data = self.send_buffer
+            self.send_buffer = ''
+            try:
+                data.decode('utf-8')
+                opcode = OP_TEXT
+            except UnicodeDecodeError:
+                opcode = OP_BINARY
+            self.wire_buffer += encode_frame(opcode, data)
+
+        if len(self.wire_buffer):
+            try:
+                sent = self.sock.send(self.wire_buffer)
+            except socket.error, err:
+                print("!! SEND error '%d:%s' from %s" % (err[0], err[1],
+                    self.addrport()))
+                self.active = False
+                return
+            self.bytes_sent += sent
+            self.wire_buffer = self.wire_buffer[sent:]
+            if sent:
+                self.last_output_time = time.time()
+        else:
+            self.send_pending = False
+            if self.closing:
+                self.active = False
+
+    def _send_control(self, opcode, payload=''):
+        """
+        Queue a control frame ahead of any text not yet framed.
+        """
+        self.wire_buffer += encode_frame(opcode, payload)
+        self.send_pending = True
+
+    def close(self, code=CLOSE_NORMAL):
+        """
+        Start a clean close; we disconnect once it has gone out.
+        """
+        if not self.closing:
+            self._send_control(OP_CLOSE, struct.pack('!H', code))
+            self.closing = True
+
+    #---[ Receiving ]----------------------------------------------------------
+
+    def socket_recv(self):
+        """
+        Called by TelnetServer when recv data is ready.
+        """
+        try:
+            data = self.sock.recv(4096)
+        except socket.error, ex:
+            print ("?? socket.recv() error '%d:%s' from %s" %
+                (ex[0], ex[1], self.addrport()))
+            raise BogConnectionLost()
+
+        ## Did they close the connection?
+        size = len(data)
+        if size == 0:
+            raise BogConnectionLost()
+
+        self.last_input_time = time.time()
+        self.bytes_received += size
+
+        if not self.handshake_done:
+            self.handshake_buffer += data
+            mark = self.handshake_buffer.find('\r\n\r\n')
+            if mark == -1:
+                if len(self.handshake_buffer) > MAX_HANDSHAKE_LENGTH:
+                    raise BogConnectionLost()
+                return
+            data = self.handshake_buffer[mark + 4:]
+            request = self.handshake_buffer[:mark]
+            self.handshake_buffer = ''
+            if not self._handshake(request):
+                return
+
+        if self.closing:
+            return
+
+        self.frame_buffer += data
+        while self.frame_buffer and not self.closing:
+            if not self._read_frame():
+                break
+
+    def _handshake(self, request):
+        """
+        Answer the browser's upgrade request.  Returns whether it worked.
+        """
+        lines = request.split('\r\n')
+        bits = lines[0].split()
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if (len(bits) != 3 or bits[0] != 'GET' or
+                'websocket' not in headers.get('upgrade', '').lower() or
+                'sec-websocket-key' not in headers):
+            self.wire_buffer += ('HTTP/1.1 400 Bad Request\r\n'
+                'Content-Length: 0\r\nConnection: close\r\n\r\n')
+            self.send_pending = True
+            self.closing = True
+            return False
+
+        ## Pick up the screen size and terminal type, if given.
+        query = urlparse.parse_qs(urlparse.urlparse(bits[1]).query)
+        try:
+            if 'cols' in query:
+                self.columns = max(20, min(500, int(query['cols'][0])))
+            if 'rows' in query:
+                self.rows = max(5, min(500, int(query['rows'][0])))
+        except ValueError:
+            pass
+        if 'term' in query:
+            self.terminal_type = query['term'][0][:40]
+
+        ## The handshake goes out first, then whatever was queued before
+        ## the browser finished upgrading.
+        self.wire_buffer = ('HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\nConnection: Upgrade\r\n'
+            'Sec-WebSocket-Accept: %s\r\n\r\n' %
+            accept_key(headers['sec-websocket-key'])) + self.wire_buffer
+        self.handshake_done = True
+        self.send_pending = True
+        return True
+
+    def _read_frame(self):
+        """
+        Decode one frame from the buffer.  Returns False if we need more
+        data first.
+        """
+        buf = self.frame_buffer
+        if len(buf) < 2:
+            return False
+        byte0, byte1 = ord(buf[0]), ord(buf[1])
+        fin = byte0 & 0x80
+        opcode = byte0 & 0x0F
+        length = byte1 & 0x7F
+        offset = 2
+
+        if length == 126:
+            if len(buf) < 4:
+                return False
+            length = struct.unpack('!H', buf[2:4])[0]
+            offset = 4
+        elif length == 127:
+            if len(buf) < 10:
+                return False
+            length = struct.unpack('!Q', buf[2:10])[0]
+            offset = 10
+
+        ## Browsers must mask everything they send.
+        if not byte1 & 0x80:
+            self.close(CLOSE_PROTOCOL)
+            return False
+        if length + len(self.message_buffer) > MAX_MESSAGE_LENGTH:
+            self.close(CLOSE_TOO_BIG)
+            return False
+
+        if len(buf) < offset + 4 + length:
+            return False
+        mask = buf[offset:offset + 4]
+        payload = unmask(mask, buf[offset + 4:offset + 4 + length])
+        self.frame_buffer = buf[offset + 4 + length:]
+
+        if opcode == OP_PING:
+            self._send_control(OP_PONG, payload)
+
+        elif opcode == OP_PONG:
+            pass
+
+        elif opcode == OP_CLOSE:
+            ## Echo the close back and hang up once it's sent.
+            self.close(CLOSE_NORMAL)
+
+        elif opcode in (OP_TEXT, OP_BINARY, OP_CONTINUATION):
+            if opcode != OP_CONTINUATION:
+                self.message_buffer = ''
+            self.message_buffer += payload
+            if fin:
+                self._got_message(self.message_buffer)
+                self.message_buffer = ''
+
+        else:
+            self.close(CLOSE_PROTOCOL)
+            return False
+
+        return True
+
+    def _got_message(self, message):
+        """
+        Each message is one line of input (or several, if it has line
+        breaks in it).
+        """
+        message = message.replace('\r\n', '\n').replace('\r', '\n')
+        if message.endswith('\n'):
+            message = message[:-1]
+        for line in message.split('\n'):
+            ## Drop control characters, as char mode telnet does.
+            cmd = ''.join([c for c in line if ord(c) >= 0x20 and c != '\x7F'])
+            self._queue_command(cmd.strip())
+        self.prompt = ''
@@ -60,6 +60,32 @@ _ANSI_CODES = (
     )
 
 
+#--[ Cursor Addressing ]-------------------------------------------------------
+
+SAVE_CURSOR = '\x1b7'
+RESTORE_CURSOR = '\x1b8'
+CLEAR_SCREEN = '\x1b[2J'
+CLEAR_TO_EOL = '\x1b[K'
+
+
+def cursor_to(row, col=1):
+    """
+    Return the sequence that moves the cursor to the given (1-based)
+    row and column.
+    """
+    return '\x1b[%d;%dH' % (row, col)
+
+
+def scroll_region(top=None, bottom=None):
+    """
+    Return the sequence that limits scrolling to the rows from top to
+    bottom inclusive, or resets it to the whole screen if either is None.
+    """
+    if top is None or bottom is None:
+        return '\x1b[r'
+    return '\x1b[%d;%dr' % (top, bottom)
+
+
 def strip_caret_codes(text):
     """
     Strip out any caret codes from a string.
@@ -71,21 +97,177 @@ def strip_caret_codes(text):
     return text.replace('\x00', '^')
 
 
-def colorize(text, ansi=True):
+def colorize(text, ansi=True, optimize=False):
     """
     If the client wants ansi, replace the tokens with ansi sequences --
-    otherwise, simply strip them out.
+    otherwise, simply strip them out.  If optimize is set, the result is
+    also run through optimize_sgr(); worth it for text that gets cached.
     """
     if ansi:
         text = text.replace('^^', '\x00')
         for token, code in _ANSI_CODES:
             text = text.replace(token, code)
         text = text.replace('\x00', '^')
+        if optimize:
+            text = optimize_sgr(text)
     else:
         text = strip_caret_codes(text)
     return text
 
 
+#--[ SGR Optimizer ]-----------------------------------------------------------
+
+## Tokens: an SGR sequence, any other escape sequence, or a run of text.
+_SGR_TOKENS = re.compile(r"\x1b\[([0-9;]*)m|(\x1b\[[0-9;?]*[@-~]|\x1b.?)|([^\x1b]+)")
+
+## Attribute slots in an SGR state tuple.
+_BOLD, _FG, _BG, _INVERSE, _UNDERLINE = range(5)
+_UNKNOWN = None
+_DEFAULT_STATE = (False, 39, 49, False, False)
+_UNKNOWN_STATE = (_UNKNOWN,) * 5
+
+## Characters that don't show a foreground colour.
+_BLANKS = ' \t\r\n'
+
+
+def _apply_sgr(state, params):
+    """
+    Return the state after applying an SGR parameter string, or None if
+    the string contains something we don't model.
+    """
+    state = list(state)
+    for param in params.split(';'):
+        if not param or param == '0':
+            state = list(_DEFAULT_STATE)
+            continue
+        code = int(param)
+        if code == 1:
+            state[_BOLD] = True
+        elif code == 22:
+            state[_BOLD] = False
+        elif 30 <= code <= 37 or code == 39:
+            state[_FG] = code
+        elif 40 <= code <= 47 or code == 49:
+            state[_BG] = code
+        elif code == 7:
+            state[_INVERSE] = True
+        elif code == 27:
+            state[_INVERSE] = False
+        elif code == 4:
+            state[_UNDERLINE] = True
+        elif code == 24:
+            state[_UNDERLINE] = False
+        else:
+            return None
+    return tuple(state)
+
+
+def _sgr_params(slot, value):
+    if slot == _BOLD:
+        return value and '1' or '22'
+    elif slot == _INVERSE:
+        return value and '7' or '27'
+    elif slot == _UNDERLINE:
+        return value and '4' or '24'
+    return str(value)
+
+
+def _sgr_transition(current, desired):
+    """
+    Return the shortest single SGR sequence that takes the terminal from
+    the current state to the desired one.
+    """
+    diff = [_sgr_params(i, desired[i]) for i in range(5)
+            if desired[i] != current[i] and desired[i] is not _UNKNOWN]
+    best = ';'.join(diff)
+    ## A reset plus the non-default attributes may be shorter, but only if
+    ## we know what every attribute is supposed to be.
+    if _UNKNOWN not in desired:
+        reset = ['0'] + [_sgr_params(i, desired[i]) for i in range(5)
+                         if desired[i] != _DEFAULT_STATE[i]]
+        if desired == _DEFAULT_STATE:
+            reset = ['0']
+        if len(';'.join(reset)) < len(best):
+            best = ';'.join(reset)
+    return '\x1b[%sm' % best
+
+
+def _blank_safe(current, desired):
+    """
+    True if blank characters look the same in both states, in which case
+    a state change can wait until something visible comes along.
+    """
+    if (current[_BG] != desired[_BG] or
+        current[_INVERSE] != desired[_INVERSE] or
+        current[_UNDERLINE] != desired[_UNDERLINE]):
+        return False
+    ## In inverse video the foreground colour is what fills a blank.
+    if current[_INVERSE] is not False:
+        return (current[_FG] == desired[_FG] and
+                current[_BOLD] == desired[_BOLD])
+    return True
+
+
+def optimize_sgr(text):
+    """
+    Collapse redundant SGR (colour/attribute) sequences in colorized text.
+    The current attribute state is tracked, runs of sequences are merged
+    into the single shortest one that gets the same result, changes that
+    alter nothing are dropped, and changes that only affect the foreground
+    are held back across blanks.  Nothing is assumed about the state the
+    terminal is in beforehand, and the terminal is left in the same state
+    as the original text would have left it, so optimized chunks can be
+    concatenated freely.
+    """
+    if '\x1b[' not in text:
+        return text
+
+    out = []
+    current = desired = _UNKNOWN_STATE
+    for match in _SGR_TOKENS.finditer(text):
+        params, escape, run = match.groups()
+
+        if run is not None:
+            if desired != current:
+                if _blank_safe(current, desired):
+                    stripped = run.lstrip(_BLANKS)
+                    if stripped:
+                        out.append(run[:len(run) - len(stripped)])
+                        out.append(_sgr_transition(current, desired))
+                        out.append(stripped)
+                        current = desired
+                    else:
+                        out.append(run)
+                    continue
+                out.append(_sgr_transition(current, desired))
+                current = desired
+            out.append(run)
+
+        elif escape is not None:
+            ## Some other escape (cursor movement, clearing); those can
+            ## depend on the current colours, so bring the state up to date.
+            if desired != current:
+                out.append(_sgr_transition(current, desired))
+                current = desired
+            out.append(escape)
+
+        else:
+            new_state = _apply_sgr(desired, params)
+            if new_state is None:
+                ## Something we don't understand; pass it along untouched
+                ## and stop assuming anything about the state.
+                if desired != current:
+                    out.append(_sgr_transition(current, desired))
+                out.append(match.group(0))
+                current = desired = _UNKNOWN_STATE
+            else:
+                desired = new_state
+
+    if desired != current:
+        out.append(_sgr_transition(current, desired))
+    return ''.join(out)
+
+
 def word_wrap(text, columns=80, indent=4, padding=2):
     """
     Given a block of text, breaks into a list of lines wrapped to